@@ -0,0 +1,137 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # Optional: a faster JSON parser for large activity sets
+    orjson = None
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+class Activity:
+    """
+    The parts of a Direct Line activity the clients use.
+
+    Everything else in the activity (channel data, attachments, entities, ...) is dropped at parse
+    time, so a turn's activities cost a single small object each instead of a tree of dicts.
+
+    Attributes:
+        id (str): The activity id.
+        type (str): The activity type, e.g. ``message`` or ``typing``.
+        role (str): The sender's role, ``bot`` or ``user``.
+        text (str): The message text.
+        reply_to_id (str): The id of the activity this one answers.
+        timestamp (str): The ISO 8601 time Direct Line stamped on the activity.
+        input_hint (str): The bot's input hint, e.g. ``expectingInput``.
+        suggested_actions (Tuple[str, ...]): The titles of the suggested actions; untitled ones are skipped.
+    """
+
+    __slots__ = ('id', 'type', 'role', 'text', 'reply_to_id', 'timestamp', 'input_hint', 'suggested_actions')
+
+    def __init__(self, id: Optional[str] = None, type: Optional[str] = None, role: Optional[str] = None,
+                 text: Optional[str] = None, reply_to_id: Optional[str] = None, timestamp: Optional[str] = None,
+                 input_hint: Optional[str] = None, suggested_actions: Tuple[str, ...] = ()):
+        self.id = id
+        self.type = type
+        self.role = role
+        self.text = text
+        self.reply_to_id = reply_to_id
+        self.timestamp = timestamp
+        self.input_hint = input_hint
+        self.suggested_actions = suggested_actions
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Activity':
+        """Build an Activity from a decoded activity JSON object."""
+        suggested = data.get('suggestedActions')
+        actions = suggested.get('actions') if suggested else None
+        return cls(data.get('id'), data.get('type'), (data.get('from') or {}).get('role'), data.get('text'),
+                   data.get('replyToId'), data.get('timestamp'), data.get('inputHint'),
+                   tuple(action['title'] for action in actions if action.get('title')) if actions else ())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the kept fields, under their Direct Line names, omitting empty ones."""
+        data = {'id': self.id, 'type': self.type, 'role': self.role, 'text': self.text,
+                'replyToId': self.reply_to_id, 'timestamp': self.timestamp, 'inputHint': self.input_hint,
+                'suggestedActions': list(self.suggested_actions)}
+        return {name: value for name, value in data.items() if value}
+
+    @property
+    def is_bot_message(self) -> bool:
+        """Whether this is a message sent by the bot."""
+        return self.type == 'message' and self.role == 'bot'
+
+    def __repr__(self) -> str:
+        return f'Activity(id={self.id!r}, type={self.type!r}, role={self.role!r}, text={self.text!r})'
+
+
+class ActivitySet:
+    """
+    One activity set from the Direct Line stream.
+
+    Attributes:
+        activities (List[Activity]): The activities, in order.
+        watermark (str): The watermark to resume the stream after this set.
+    """
+
+    __slots__ = ('activities', 'watermark')
+
+    def __init__(self, activities: Optional[List[Activity]] = None, watermark: Optional[str] = None):
+        self.activities = activities if activities is not None else []
+        self.watermark = watermark
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ActivitySet':
+        """Build an ActivitySet from a decoded activity set JSON object."""
+        return cls([Activity.from_dict(activity) for activity in data.get('activities') or ()], data.get('watermark'))
+
+    def responses(self) -> List[str]:
+        """
+        The bot's message texts, each followed by its suggested action titles.
+
+        Returns:
+            List[str]: The responses in the form ``BotClient.receive()`` has always returned.
+        """
+        responses = []
+        for activity in self.activities:
+            if activity.is_bot_message:
+                responses.append(activity.text if activity.text is not None else '')
+                responses.extend(activity.suggested_actions)
+        return responses
+
+
+class BotReply(list):
+    """
+    The bot's reply to one turn: the list of response strings, carrying the activities as well.
+
+    It compares and iterates like the plain list of strings ``receive()`` used to return, while
+    ``activities`` keeps the ids, ``replyToId`` and timestamps for correlation and latency.
+
+    Attributes:
+        activities (List[Activity]): The bot activities of the turn.
+    """
+
+    __slots__ = ('activities',)
+
+    def __init__(self, activity_set: ActivitySet):
+        super().__init__(activity_set.responses())
+        self.activities = activity_set.activities
+
+
+def parse_activity_set(text: str) -> ActivitySet:
+    """
+    Decode one activity set document, with orjson if it is installed.
+
+    Suitable as the ``loads`` of an ``ActivityStreamDecoder``.
+
+    Args:
+        text (str): The JSON document.
+
+    Returns:
+        ActivitySet: The decoded activity set.
+
+    Raises:
+        ValueError: If the document is not valid JSON.
+    """
+    return ActivitySet.from_dict(_loads(text))
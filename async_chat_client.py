@@ -0,0 +1,261 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+import requests
+import websockets
+
+import latency
+import metrics
+from activity import ActivitySet, BotReply, parse_activity_set
+from copilot_chat_client import DIRECT_LINE_BASE_URL, HEADERS_CONTENT_TYPE
+from frame_decoder import ActivityStreamDecoder
+from http_pool import DEFAULT_POOL_MAXSIZE, get_session
+from latency import LatencyRecorder, PROCESS_LATENCY
+from rate_limiter import AdaptiveRateLimiter, timed_request
+from turn_tracker import DEFAULT_QUIET_PERIOD, TurnTracker
+
+logger = logging.getLogger(__name__)
+
+# Constants
+# Adaptive card activity sets can be far larger than the 1 MiB websockets default.
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+# More HTTP threads than pooled keep-alive connections would only queue on the pool.
+HTTP_WORKERS = DEFAULT_POOL_MAXSIZE
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Get the process-wide executor running the blocking HTTP calls of ``AsyncBotClient``.
+
+    It is created on first use with ``HTTP_WORKERS`` threads, so the clients neither compete with
+    other users of the event loop's default executor nor depend on its size.
+
+    Returns:
+        ThreadPoolExecutor: The shared executor.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HTTP_WORKERS, thread_name_prefix='async-bot-http')
+        return _executor
+
+
+class AsyncBotClient:
+    """
+    An asyncio client to interact with a bot using Direct Line API and WebSocket for real-time communication.
+
+    It mirrors the connect/send/receive/disconnect shape of ``BotClient`` but never blocks the event loop
+    while waiting for the bot, so a single process can keep thousands of conversations open at once.
+    The short HTTP calls (token, conversation create, activity POST) run on a dedicated thread pool
+    (``get_executor()`` unless one is passed) sized to the pooled HTTP connections; the long waits for bot activities are awaited natively on the ``websockets`` connection.
+
+    Attributes:
+        endpoint (str): The endpoint URL to obtain the bot token.
+        conversation_id (str): The ID of the conversation with the bot.
+        conversation_token (str): The token for the conversation.
+        ws (websockets.ClientConnection): The WebSocket connection to the bot.
+        last_activity_id (str): The id Direct Line assigned to the last message sent.
+        base_url (str): The Direct Line API base URL.
+        latency (LatencyRecorder): Connect and turn timings of this conversation, also aggregated
+            into ``latency.PROCESS_LATENCY``.
+        limiter (AdaptiveRateLimiter): The rate limiter shared with other clients, if any.
+        executor (Executor): The thread pool running the blocking HTTP calls.
+    """
+
+    def __init__(self, endpoint: str, base_url: str = DIRECT_LINE_BASE_URL, limiter: AdaptiveRateLimiter = None,
+                 executor: Executor = None):
+        """
+        Initialize the AsyncBotClient with the given endpoint.
+
+        Args:
+            endpoint (str): The endpoint URL to obtain the bot token.
+            base_url (str): The Direct Line API base URL, e.g. a local ``DirectLineEmulator``'s.
+            limiter (AdaptiveRateLimiter): A rate limiter to share with other clients; see ``BotClient``.
+            executor (Executor): The thread pool for the blocking HTTP calls. Defaults to ``get_executor()``;
+                size it to the HTTP connection pool when passing your own.
+        """
+        self.endpoint = endpoint
+        self.base_url = base_url.rstrip('/')
+        self.limiter = limiter
+        self.executor = executor or get_executor()
+        self.conversation_id: Optional[str] = None
+        self.conversation_token: Optional[str] = None
+        self.ws = None
+        self.last_activity_id: Optional[str] = None
+        self.latency = LatencyRecorder(parent=PROCESS_LATENCY)
+        self._sent_at: Optional[float] = None
+        self._decoder = ActivityStreamDecoder(parse_activity_set)
+
+    async def __aenter__(self) -> 'AsyncBotClient':
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.disconnect()
+
+    async def _timed_request(self, request: Callable[[], Any], metric: str):
+        # Run timed_request() on the client's executor, with the caller's context (e.g. trace attributes).
+        call = functools.partial(timed_request, request, self.latency, metric, self.limiter)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, contextvars.copy_context().run, call)
+
+    async def connect(self) -> None:
+        """
+        Establish a connection with the bot by obtaining a token and starting a WebSocket connection.
+
+        Raises:
+            requests.RequestException: If there is an error in the HTTP request.
+        """
+        try:
+            response, _, _ = await self._timed_request(lambda: get_session().get(self.endpoint),
+                                                       latency.CONNECT_TOKEN)
+            token = response.json()['token']
+
+            headers = {'Authorization': f'Bearer {token}', **HEADERS_CONTENT_TYPE}
+            response, _, _ = await self._timed_request(
+                lambda: get_session().post(f'{self.base_url}/conversations', headers=headers),
+                latency.CONNECT_CONVERSATION)
+
+            conversation_data = response.json()
+            self.conversation_id = conversation_data['conversationId']
+            self.conversation_token = conversation_data['token']
+            stream_url = conversation_data['streamUrl']
+
+            with self.latency.time(latency.CONNECT_WEBSOCKET):
+                self.ws = await websockets.connect(stream_url, max_size=MAX_MESSAGE_SIZE)
+            self._decoder.reset()
+            logger.info("Successfully connected to the bot.")
+
+        except requests.RequestException as e:
+            logger.error(f"Failed to connect to bot: {e}")
+            raise
+
+    async def disconnect(self) -> None:
+        """
+        Close the WebSocket connection with the bot.
+        """
+        if self.ws:
+            await self.ws.close()
+            logger.info("WebSocket connection closed.")
+        else:
+            logger.warning("WebSocket connection is not established.")
+
+    async def send(self, message: str) -> Optional[str]:
+        """
+        Send a message to the bot.
+
+        Args:
+            message (str): The message to send to the bot.
+
+        Returns:
+            str: The activity id assigned by Direct Line, used to correlate the bot's replies.
+
+        Raises:
+            requests.RequestException: If there is an error in the HTTP request.
+        """
+        headers = {'Authorization': f'Bearer {self.conversation_token}', **HEADERS_CONTENT_TYPE}
+        payload = {
+            'locale': 'en-EN',
+            'type': 'message',
+            'from': {'id': 'user1'},
+            'text': message
+        }
+        url = f'{self.base_url}/conversations/{self.conversation_id}/activities'
+
+        try:
+            response, self._sent_at, _ = await self._timed_request(
+                lambda: get_session().post(url, headers=headers, json=payload), latency.SEND_ACK)
+            logger.info("Message sent successfully.")
+        except requests.RequestException as e:
+            logger.error(f"Failed to send message: {e}")
+            raise
+        metrics.SENDS.inc()
+        self.last_activity_id = response.json().get('id')
+        return self.last_activity_id
+
+    async def receive(self, timeout: float = 20, quiet_period: float = DEFAULT_QUIET_PERIOD,
+                      reply_to_id: Optional[str] = None) -> BotReply:
+        """
+        Receive the bot's complete reply to the last message over WebSocket.
+
+        All bot activities of the turn are collected; see ``TurnTracker`` for when a turn ends.
+
+        Args:
+            timeout (float): The maximum time to wait for the turn in seconds. Default is 20 seconds.
+            quiet_period (float): Seconds of silence after a bot reply that end the turn.
+            reply_to_id (str): The user activity to collect replies for. Defaults to the last one sent.
+
+        Returns:
+            BotReply: The messages received from the bot as a list of strings, empty if it did not reply
+            in time. Its ``activities`` hold the full bot activities of the turn.
+
+        Raises:
+            Exception: If the WebSocket connection is closed unexpectedly.
+        """
+        tracker = TurnTracker(reply_to_id or self.last_activity_id, quiet_period)
+        deadline = time.monotonic() + timeout
+
+        while True:
+            wait = tracker.wait_time(deadline)
+            if wait <= 0:
+                break
+            try:
+                frame = await asyncio.wait_for(self.ws.recv(), wait)
+                for parsed_message in self._decoder.feed(frame):
+                    tracker.observe(parsed_message)
+            except asyncio.TimeoutError:
+                continue
+            except websockets.ConnectionClosed:
+                metrics.CONNECTION_CLOSED.inc()
+                logger.error("WebSocket connection closed unexpectedly.")
+                raise Exception('WebSocket connection closed')
+
+        if not tracker.replied:
+            metrics.RECEIVE_TIMEOUTS.inc()
+            logger.warning("WebSocket timeout occurred.")
+            return BotReply(ActivitySet())
+        metrics.ACTIVITIES_RECEIVED.inc(len(tracker.activities))
+        if self._sent_at is not None:
+            latency.record_turn(self.latency, self._sent_at, tracker.first_reply_at, tracker.last_reply_at)
+            self._sent_at = None
+        logger.info("Bot response received.")
+        return BotReply(tracker.activity_set())
+
+
+async def run_conversation(endpoint: str, messages: List[str], timeout: float = 20,
+                           base_url: str = DIRECT_LINE_BASE_URL) -> List[List[str]]:
+    """
+    Drive a single conversation through the given messages and collect the bot replies.
+
+    Args:
+        endpoint (str): The endpoint URL to obtain the bot token.
+        messages (List[str]): The user messages to send, in order.
+        timeout (float): The per-turn receive timeout in seconds.
+        base_url (str): The Direct Line API base URL.
+
+    Returns:
+        List[List[str]]: The bot replies for each message.
+    """
+    replies = []
+    async with AsyncBotClient(endpoint, base_url) as bot:
+        for message in messages:
+            await bot.send(message)
+            replies.append(await bot.receive(timeout))
+    return replies
+
+
+if __name__ == "__main__":
+    async def main():
+        conversations = [run_conversation("your_endpoint_here", ["Hello, bot!"]) for _ in range(100)]
+        for replies in await asyncio.gather(*conversations, return_exceptions=True):
+            print(replies)
+
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+from frame_decoder import ActivityStreamDecoder
+
+
+def make_activity_set(n_activities: int = 4, card_kb: int = 128, n_actions: int = 5) -> Dict[str, Any]:
+    """
+    Build a synthetic Direct Line activity set shaped like a large adaptive-card reply.
+
+    Args:
+        n_activities (int): The number of bot message activities.
+        card_kb (int): The approximate size of each adaptive card attachment in KiB.
+        n_actions (int): The number of suggested actions on each activity.
+
+    Returns:
+        Dict[str, Any]: The activity set.
+    """
+    body = [{'type': 'TextBlock', 'text': f'Row {i}: "quoted" {{braces}} and \\ escapes', 'wrap': True}
+            for i in range(card_kb * 1024 // 80)]
+    return {
+        'activities': [{
+            'type': 'message',
+            'id': f'conv|{i:07d}',
+            'from': {'id': 'bot', 'role': 'bot'},
+            'text': f'Reply {i}',
+            'attachments': [{'contentType': 'application/vnd.microsoft.card.adaptive',
+                             'content': {'type': 'AdaptiveCard', 'body': body}}],
+            'suggestedActions': {'actions': [{'type': 'imBack', 'title': f'Option {j}', 'value': f'Option {j}'}
+                                             for j in range(n_actions)]},
+        } for i in range(n_activities)],
+        'watermark': str(n_activities),
+    }
+
+
+def split_frames(text: str, frame_size: int) -> List[str]:
+    """Split a serialized activity set into WebSocket-sized frames."""
+    return [text[i:i + frame_size] for i in range(0, len(text), frame_size)]
+
+
+def decode_with_buffer(frames: List[str]) -> List[Dict[str, Any]]:
+    """The previous receive() strategy: append every frame and re-parse the whole buffer."""
+    documents = []
+    message_buffer = ''
+    for frame in frames:
+        message_buffer += frame
+        try:
+            documents.append(json.loads(message_buffer))
+            message_buffer = ''
+        except json.JSONDecodeError:
+            continue
+    return documents
+
+
+def decode_incrementally(frames: List[str]) -> List[Dict[str, Any]]:
+    """The ActivityStreamDecoder strategy: consume each frame once."""
+    decoder = ActivityStreamDecoder()
+    documents = []
+    for frame in frames:
+        documents.extend(decoder.feed(frame))
+    return documents
+
+
+def _best_of(func, frames: List[str], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(frames)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compare buffer-and-reparse with incremental frame decoding.')
+    parser.add_argument('--frame-size', type=int, default=4096, help='Frame size in characters.')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of timed runs; the best is reported.')
+    args = parser.parse_args()
+
+    print(f"{'payload':>10} {'frames':>7} {'reparse ms':>11} {'incremental ms':>15} {'speedup':>8}")
+    for card_kb in (32, 64, 128, 256):
+        text = json.dumps(make_activity_set(card_kb=card_kb))
+        frames = split_frames(text, args.frame_size)
+        assert decode_with_buffer(frames) == decode_incrementally(frames)
+
+        legacy = _best_of(decode_with_buffer, frames, args.repeat)
+        incremental = _best_of(decode_incrementally, frames, args.repeat)
+        print(f"{len(text) // 1024:>8}KB {len(frames):>7} {legacy * 1000:>11.1f} {incremental * 1000:>15.1f} "
+              f"{legacy / incremental:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
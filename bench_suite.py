@@ -0,0 +1,341 @@
+import argparse
+import gc
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import websocket
+
+from activity import parse_activity_set
+from bench_frame_decoder import make_activity_set, split_frames
+from copilot_chat_client import BotClient
+from frame_decoder import ActivityStreamDecoder
+from semantic_assertion import SemanticSimilarityClient
+from transcript import FRAME, read_transcript
+from turn_tracker import TurnTracker
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Constants
+DEFAULT_MIN_TIME = 0.2  # Seconds per timed run
+DEFAULT_REPEAT = 5  # Timed runs per benchmark; the fastest is reported
+DEFAULT_TOLERANCE = 0.2  # Allowed relative drop in ops/sec when comparing with a previous report
+FRAME_SIZE = 4096
+VERDICT = json.dumps({'score': 0.9, 'reason': 'Both statements give the same forecast.', 'decision': 'Similar'})
+
+Benchmark = Tuple[str, Callable[[], Any]]
+
+
+class _ScriptedSocket:
+    """A stand-in for ``websocket.WebSocket`` that returns the same frames on every turn."""
+
+    def __init__(self, frames: List[str]):
+        self.frames = frames
+        self._position = 0
+
+    def settimeout(self, timeout: float) -> None:
+        pass
+
+    def recv(self) -> str:
+        if self._position == len(self.frames):
+            self._position = 0
+            raise websocket.WebSocketTimeoutException('no more frames')
+        frame = self.frames[self._position]
+        self._position += 1
+        return frame
+
+
+class _StubResponse:
+    status_code = 200
+    headers: Dict[str, str] = {}
+
+    def __init__(self, body: Dict[str, Any]):
+        self._body = body
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self) -> Dict[str, Any]:
+        return self._body
+
+
+class _StubSession:
+    """A stand-in for ``requests.Session`` that serializes the request like requests does and answers at once."""
+
+    def __init__(self):
+        self._response = _StubResponse({'id': 'bench|0000001'})
+
+    def post(self, url: str, **kwargs: Any) -> _StubResponse:
+        json.dumps(kwargs['json']).encode('utf-8')  # The request body requests would build
+        return self._response
+
+
+class _StubCompletions:
+    """A stand-in for the OpenAI ``beta.chat.completions`` API returning canned verdicts."""
+
+    def __init__(self, batch_size: int):
+        batch = {'scores': [dict(json.loads(VERDICT), index=i) for i in range(batch_size)]}
+        self._single = self._response(VERDICT)
+        self._batch = self._response(json.dumps(batch))
+
+    @staticmethod
+    def _response(content: str) -> Any:
+        message = type('Message', (), {'content': content})
+        choice = type('Choice', (), {'message': message})
+        return type('Completion', (), {'choices': [choice]})
+
+    def parse(self, model: str, messages: List[Dict[str, str]], response_format: Any) -> Any:
+        return self._batch if 'Pair 1:' in messages[-1]['content'] else self._single
+
+
+def _stub_client(batch_size: int) -> Any:
+    completions = _StubCompletions(batch_size)
+    chat = type('Chat', (), {'completions': completions})
+    return type('Client', (), {'beta': type('Beta', (), {'chat': chat})})
+
+
+def _offline_bot_client(frames: List[str]) -> BotClient:
+    client = BotClient('http://bench.invalid/token', session=_StubSession(), base_url='http://bench.invalid')
+    client.conversation_id = 'bench'
+    client.conversation_token = 'token'
+    client.ws = _ScriptedSocket(frames)
+    client.latency.parent = None  # Keep benchmark timings out of PROCESS_LATENCY
+    return client
+
+
+def receive_benchmarks(transcript: Optional[str] = None) -> List[Benchmark]:
+    """
+    Benchmarks of ``BotClient.receive()``: frame assembly, decoding and turn tracking of one turn.
+
+    Args:
+        transcript (str): A recorded transcript to also replay the frames of, if any.
+
+    Returns:
+        List[Benchmark]: The benchmarks.
+    """
+    benchmarks = []
+    for card_kb in (1, 32, 256):
+        frames = split_frames(json.dumps(make_activity_set(card_kb=card_kb)), FRAME_SIZE)
+        client = _offline_bot_client(frames)
+        benchmarks.append((f'receive[card={card_kb}KiB,frames={len(frames)}]',
+                           lambda client=client: client.receive(timeout=5, quiet_period=0)))
+    if transcript:
+        frames = [record['d'] for record in read_transcript(transcript) if record.get('k') == FRAME]
+
+        def assemble(frames=frames):
+            decoder, tracker = ActivityStreamDecoder(parse_activity_set), TurnTracker()
+            for frame in frames:
+                for activity_set in decoder.feed(frame):
+                    tracker.observe(activity_set, 0.0)
+
+        benchmarks.append((f'frame_assembly[recorded,frames={len(frames)}]', assemble))
+    return benchmarks
+
+
+def extract_benchmarks() -> List[Benchmark]:
+    """
+    Benchmarks of ``BotClient._extract_bot_responses()`` on activity sets of growing size and
+    suggested action count, both decoded and as plain JSON.
+
+    Returns:
+        List[Benchmark]: The benchmarks.
+    """
+    benchmarks = []
+    for n_activities, n_actions in ((1, 0), (10, 5), (100, 5), (100, 50)):
+        data = make_activity_set(n_activities=n_activities, card_kb=0, n_actions=n_actions)
+        activity_set = parse_activity_set(json.dumps(data))
+        label = f'activities={n_activities},actions={n_actions}'
+        benchmarks.append((f'extract[{label}]',
+                           lambda s=activity_set: BotClient._extract_bot_responses(s)))
+        benchmarks.append((f'extract_dict[{label}]', lambda d=data: BotClient._extract_bot_responses(d)))
+    return benchmarks
+
+
+def send_benchmarks() -> List[Benchmark]:
+    """
+    Benchmarks of ``BotClient.send()``: payload, header and URL construction and serialization,
+    against a session that answers immediately.
+
+    Returns:
+        List[Benchmark]: The benchmarks.
+    """
+    client = _offline_bot_client([])
+    return [('send[short]', lambda: client.send('Hello')),
+            ('send[4KiB]', lambda: client.send('Forecast ' * 455))]
+
+
+def semantic_benchmarks(batch_size: int = 20) -> List[Benchmark]:
+    """
+    Benchmarks of ``SemanticSimilarityClient`` prompt building and verdict parsing, with the
+    OpenAI client stubbed out.
+
+    Args:
+        batch_size (int): The number of pairs scored by ``score_many()``.
+
+    Returns:
+        List[Benchmark]: The benchmarks.
+    """
+    client = SemanticSimilarityClient('https://bench.invalid', 'key', 'deployment', '2024-08-01-preview')
+    client.client = _stub_client(batch_size)
+    expected, actual = 'Tomorrow will be rainy in Hyderabad.', 'Expect rain in Hyderabad tomorrow.'
+    pairs = [(f'{expected} ({i})', actual) for i in range(batch_size)]
+    return [('semantic.assert', lambda: client.assert_semantically(expected, actual)),
+            (f'semantic.score_many[pairs={batch_size}]', lambda: client.score_many(pairs))]
+
+
+def measure(func: Callable[[], Any], min_time: float = DEFAULT_MIN_TIME,
+            repeat: int = DEFAULT_REPEAT) -> Dict[str, float]:
+    """
+    Time a benchmark and measure its memory use.
+
+    The call count is calibrated so one timed run takes at least ``min_time``; the fastest of
+    ``repeat`` runs is reported. Memory is traced over separate calls, so tracing does not slow
+    the timed runs.
+
+    Args:
+        func (Callable[[], Any]): The operation to benchmark.
+        min_time (float): Seconds per timed run.
+        repeat (int): The number of timed runs.
+
+    Returns:
+        Dict[str, float]: ``ops_per_sec``, ``mean_us``, ``alloc_kib`` (the most memory one call
+        held at once) and ``retained_kib`` (memory one call left allocated).
+    """
+    func()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - start >= min_time:
+            break
+        number *= 2
+    best = float('inf')
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        calls = min(number, 100)
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1] - base
+        for _ in range(calls - 1):
+            func()
+        retained = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    return {'ops_per_sec': number / best, 'mean_us': best / number * 1e6, 'iterations': number,
+            'alloc_kib': peak / 1024, 'retained_kib': retained / calls / 1024}
+
+
+def peak_rss_kib() -> Optional[float]:
+    """The peak resident memory of this process in KiB, where the platform reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 if sys.platform == 'darwin' else float(peak)  # Bytes on macOS, KiB on Linux
+
+
+def compare(report: Dict[str, Any], previous: Dict[str, Any], tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    Find benchmarks that got slower than a previous report.
+
+    Args:
+        report (Dict[str, Any]): The current report.
+        previous (Dict[str, Any]): The earlier report.
+        tolerance (float): The allowed relative drop in ops/sec.
+
+    Returns:
+        List[str]: A description of each regressed benchmark.
+    """
+    before = {result['name']: result for result in previous['results']}
+    regressions = []
+    for result in report['results']:
+        old = before.get(result['name'])
+        if old and result['ops_per_sec'] < old['ops_per_sec'] * (1 - tolerance):
+            regressions.append(f"{result['name']}: {result['ops_per_sec']:,.0f} ops/s, "
+                               f"was {old['ops_per_sec']:,.0f} ops/s")
+    return regressions
+
+
+def run(benchmarks: List[Benchmark], min_time: float = DEFAULT_MIN_TIME, repeat: int = DEFAULT_REPEAT,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Run benchmarks and build the machine-readable report.
+
+    Args:
+        benchmarks (List[Benchmark]): The benchmarks by name.
+        min_time (float): Seconds per timed run.
+        repeat (int): The number of timed runs.
+        progress (Callable[[Dict[str, Any]], None]): Called with each result as it is measured.
+
+    Returns:
+        Dict[str, Any]: The environment, each benchmark's result and the process's peak memory.
+    """
+    results = []
+    for name, func in benchmarks:
+        result = {'name': name, **measure(func, min_time, repeat)}
+        results.append(result)
+        if progress:
+            progress(result)
+    return {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+            'machine': platform.machine(), 'time': time.time(), 'results': results, 'peak_rss_kib': peak_rss_kib()}
+
+
+def _format(result: Dict[str, Any]) -> str:
+    return (f"{result['name']:<44} {result['ops_per_sec']:>12,.0f} {result['mean_us']:>10.1f} "
+            f"{result['alloc_kib']:>10.1f} {result['retained_kib']:>10.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the client's hot paths offline.")
+    parser.add_argument('-k', '--filter', default='', help='Only run benchmarks whose name contains this.')
+    parser.add_argument('--transcript', help='A recorded transcript to also benchmark frame assembly on.')
+    parser.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME, help='Seconds per timed run.')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Timed runs; the best is reported.')
+    parser.add_argument('--json', help='Write the report as JSON to this file.')
+    parser.add_argument('--compare', help='A previous JSON report; exit with 1 if a benchmark got slower.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed relative drop in ops/sec for --compare.')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)  # The clients log every send and receive
+    benchmarks = (receive_benchmarks(args.transcript) + extract_benchmarks() + send_benchmarks()
+                  + semantic_benchmarks())
+    benchmarks = [(name, func) for name, func in benchmarks if args.filter in name]
+
+    print(f"{'benchmark':<44} {'ops/s':>12} {'mean us':>10} {'alloc KiB':>10} {'kept KiB':>10}")
+    report = run(benchmarks, args.min_time, args.repeat, progress=lambda result: print(_format(result)))
+    print(f"peak RSS: {report['peak_rss_kib'] or 0:,.0f} KiB")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"SLOWER {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
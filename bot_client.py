@@ -1,7 +1,8 @@
-import json
-import requests
 import websocket
 
+from frame_decoder import ActivityStreamDecoder
+from http_pool import get_session
+
 # Constants
 HEADERS_CONTENT_TYPE = {'Content-Type': 'application/json'}
 
@@ -15,12 +16,12 @@ class BotClient:
 
     def connect(self):
         """Establish a connection with the bot."""
-        response = requests.get(self.endpoint)
+        response = get_session().get(self.endpoint)
         response.raise_for_status()
         token = response.json()['token']
 
         headers = {'Authorization': f'Bearer {token}', **HEADERS_CONTENT_TYPE}
-        response = requests.post('https://directline.botframework.com/v3/directline/conversations', headers=headers)
+        response = get_session().post('https://directline.botframework.com/v3/directline/conversations', headers=headers)
         response.raise_for_status()
         #print(response.json())
 
@@ -42,29 +43,21 @@ class BotClient:
             'text': message
         }
         url = f'https://directline.botframework.com/v3/directline/conversations/{self.conversation_id}/activities'
-        response = requests.post(url, headers=headers, json=payload)
+        response = get_session().post(url, headers=headers, json=payload)
         response.raise_for_status()
 
     def receive(self):
         """Receive messages from the bot over WebSocket."""
         self.ws.settimeout(20)
-        message_buffer = ''
+        decoder = ActivityStreamDecoder()
 
         while True:
             try:
                 frame = self.ws.recv()
-                message_buffer += frame
-                try:
-                    parsed_message = json.loads(message_buffer)
-                    # print(parsed_message)
+                for parsed_message in decoder.feed(frame):
                     ls: list = self._extract_bot_responses(parsed_message)
                     if len(ls) > 0:
                         return ls
-                    else:
-                        message_buffer = ''
-                        raise json.JSONDecodeError('No bot responses found', '', 0)
-                except json.JSONDecodeError:
-                    pass  # Continue accumulating
             except websocket.WebSocketTimeoutException:
                 return None
             except websocket.WebSocketConnectionClosedException:
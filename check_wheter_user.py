@@ -1,8 +1,18 @@
-import json
+import os
+import time
 
 import requests
 import websocket
 
+from activity import parse_activity_set
+from frame_decoder import ActivityStreamDecoder
+from scenario import ANY_BRANCH, load_scenarios
+from turn_tracker import TurnTracker
+
+# The messages come from the weather conversation flow, which test_bot.py also runs with its expectations
+SCENARIO_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios', 'weather.json')
+SCENARIO_NAME = 'weather-conversation-flow'
+
 copilot_token_endpoint = ('https://default90474664dbca4de489503382fc4737.e4.environment.api.powerplatform.com'
                           '/powervirtualagents/botsbyschema/cr437_weather/directline/token?api-version=2022-03-01'
                           '-preview')
@@ -23,23 +33,19 @@ conversation_token = response.json()['token']
 stream_url = response.json()['streamUrl']
 
 
-def print_only_text_and_suggestions_for_bot(json_str):
-    data = json.loads(json_str)
-
-    for activity in data.get('activities', []):
+def print_only_text_and_suggestions_for_bot(data):
+    for activity in data.activities:
         # Check if the activity is from a bot and type is message
-        if activity.get('type') == 'message' and activity.get('from', {}).get('role') == 'bot':
-            # if activity.get('from', {}).get('role') == 'bot':
+        if activity.is_bot_message:
             print('Received message from bot:')
-            print(f"Activity type: {activity['type']}")
+            print(f"Activity type: {activity.type}")
             # Print the text if it exists
-            if 'text' in activity:
-                print(f"{activity['text']}")
+            if activity.text is not None:
+                print(f"{activity.text}")
 
             # Print suggested actions if they exist
-            if 'suggestedActions' in activity and 'actions' in activity['suggestedActions']:
-                for action in activity['suggestedActions']['actions']:
-                    print(f"{action['title']}")
+            for title in activity.suggested_actions:
+                print(f"{title}")
 
 
 def send_http_messsage_to_bot(message):
@@ -63,41 +69,49 @@ def send_http_messsage_to_bot(message):
     return response.json()
 
 
-def receive_websocket_message(ws):
-    ws.settimeout(20)  # Set a 5-second timeout for each recv operation
-    last_s = None
-    message_received = ''
+def receive_websocket_message(ws, reply_to_id=None):
+    # Stop as soon as the bot has finished its turn instead of always waiting out the 20-second timeout
+    tracker = TurnTracker(reply_to_id)
+    deadline = time.monotonic() + 20
+    decoder = ActivityStreamDecoder(parse_activity_set)
     while True:
+        wait = tracker.wait_time(deadline)
+        if wait <= 0:
+            break
         try:
+            ws.settimeout(wait)
             frame = ws.recv()
-            message_received += frame
-            try:
-                # Attempt to parse the accumulated message as JSON
-                s = json.loads(message_received)
-
-                print_only_text_and_suggestions_for_bot(message_received)
-                # Reset message_received for the next message
-                last_s = s
-                message_received = ''
-            except json.JSONDecodeError:
-                # If not complete JSON yet, continue accumulating
-                pass
+            # Each frame is consumed once; complete activity sets come out as soon as they close
+            for s in decoder.feed(frame):
+                tracker.observe(s)
         except websocket.WebSocketTimeoutException:
-            # Optional: Decide what to do after a timeout, for now, just continue waiting
-            return last_s
+            continue
         except websocket.WebSocketConnectionClosedException:
             raise Exception('WebSocket connection closed')
+    print_only_text_and_suggestions_for_bot(tracker.activity_set())
+    return tracker.activity_set()
 
 
 # open a websocket connection to the stream URL
 ws = websocket.WebSocket()
 ws.connect(stream_url)
-messages = ['hi', 'weather', 'hyderabad', 'tomorrow', 'Rainy', 'Get Forecast For Tomorrow', 'Mumbai', 'Ok  Bye', 'Yes',
-            'No']
-for message in messages:
-    # send a message to the bot
-    send_http_messsage_to_bot(message)
-    print('Message sent to bot:', message)
-
-    # receive the response from the bot
-    response = receive_websocket_message(ws)
+
+
+def walk(turns):
+    for turn in turns:
+        # send a message to the bot
+        activity = send_http_messsage_to_bot(turn.send)
+        print('Message sent to bot:', turn.send)
+
+        # receive the response from the bot and follow the branch for the suggested actions it offered
+        response = receive_websocket_message(ws, activity.get('id'))
+        offered = [title for reply in response.activities for title in reply.suggested_actions]
+        choice = next((choice for choice in turn.branch if choice in offered), None)
+        if choice is None and ANY_BRANCH in turn.branch:
+            choice = ANY_BRANCH
+        if choice is not None:
+            walk(turn.branch[choice])
+
+
+scenario = next(scenario for scenario in load_scenarios(SCENARIO_FILE) if scenario.name == SCENARIO_NAME)
+walk(scenario.turns)
@@ -0,0 +1,135 @@
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+import metrics
+import tracing
+from directline_emulator import DirectLineEmulator, ScriptedBot
+from semantic_assertion import ComparisonScoreBatch, SemanticSimilarityClient
+from similarity_cache import LRUCache, VerdictCache
+
+# Latency regression checks for tests marked with @pytest.mark.latency_baseline
+pytest_plugins = ['latency_baseline']
+
+# The bot behind the shared emulator fixture
+WEATHER_BOT = ScriptedBot({
+    'hi': ['Hello, I am the weather bot.', {'text': 'What can I help with?', 'suggested_actions': ['Weather', 'Bye']}],
+    'weather': [{'text': 'Which city?', 'suggested_actions': ['Hyderabad', 'Mumbai']}],
+    'bye': ['Goodbye!'],
+    'quiet': [],
+})
+# Small frames and typing activities exercise the clients' frame decoding and turn tracking.
+EMULATOR_DEFAULTS = {'bot': WEATHER_BOT, 'fragment_size': 16, 'typing': True}
+
+
+class StubCompletions:
+    """
+    Stands in for ``client.beta.chat.completions`` of the LLM judge and counts the calls.
+
+    A single comparison scores 0.9 with reason 'single'. A batch scores every pair 0.8 with reason
+    'batch', except the pair positions in ``drop``, which are left for the single-call fallback.
+    """
+
+    def __init__(self, drop=()):
+        self.drop = set(drop)
+        self.calls = 0
+        self.batch_sizes = []
+
+    def parse(self, **kwargs):
+        self.calls += 1
+        if kwargs['response_format'] is ComparisonScoreBatch:
+            count = kwargs['messages'][1]['content'].count('Text 1:')
+            self.batch_sizes.append(count)
+            content = json.dumps({'scores': [{'index': n, 'score': 0.8, 'reason': 'batch', 'decision': 'Similar'}
+                                             for n in range(count) if n not in self.drop]})
+        else:
+            content = json.dumps({'score': 0.9, 'reason': 'single', 'decision': 'Similar'})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def pytest_addoption(parser) -> None:
+    parser.addoption('--trace-file', default=os.getenv('TRACE_FILE'),
+                     help='write trace spans of the bot and judge calls to this Chrome trace file '
+                          '(default: $TRACE_FILE); open it in https://ui.perfetto.dev')
+    parser.addoption('--metrics-port', type=int, default=os.getenv('METRICS_PORT'),
+                     help='serve live Prometheus metrics of the run on this local port (default: $METRICS_PORT)')
+
+
+def pytest_configure(config) -> None:
+    path = config.getoption('trace_file')
+    if path:
+        tracing.set_tracer(tracing.Tracer(tracing.ChromeTraceExporter(path)))
+    port = config.getoption('metrics_port')
+    if port is not None:
+        config._metrics_server = metrics.MetricsServer(int(port))
+
+
+def pytest_unconfigure(config) -> None:
+    if config.getoption('trace_file'):
+        tracing.get_tracer().close()
+        tracing.set_tracer(None)
+    server = getattr(config, '_metrics_server', None)
+    if server is not None:
+        server.close()
+
+
+@pytest.fixture(scope="module")
+def emulator_options():
+    """Fixture for the emulator options of a test module; override it there, e.g. to add a response_delay."""
+    return {}
+
+
+@pytest.fixture(scope="module")
+def emulator(request, emulator_options):
+    """
+    Fixture for a local Direct Line emulator running the weather bot, shared by the tests of a module.
+
+    Options from ``emulator_options``, or from indirect parametrization, replace ``EMULATOR_DEFAULTS``.
+    """
+    options = {**EMULATOR_DEFAULTS, **emulator_options, **getattr(request, 'param', {})}
+    with DirectLineEmulator(**options) as server:
+        yield server
+
+
+@pytest.fixture
+def make_response():
+    """Fixture for a builder of bare HTTP responses: ``make_response(status_code, body=None, retry_after=None)``."""
+    def build(status_code, body=None, retry_after=None):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps(body or {}).encode()
+        if retry_after is not None:
+            response.headers['Retry-After'] = retry_after
+        return response
+    return build
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Fixture for a verdict cache in a temporary directory with a private memory LRU."""
+    verdicts = VerdictCache(str(tmp_path / 'verdicts.sqlite3'), memory=LRUCache())
+    yield verdicts
+    verdicts.close()
+
+
+@pytest.fixture
+def judge_completions():
+    """Fixture for the LLM judge's completions stub; set its ``drop`` to leave batch pairs unscored."""
+    return StubCompletions()
+
+
+@pytest.fixture
+def judge_client(cache, judge_completions):
+    """Fixture for a SemanticSimilarityClient answered by the completions stub, caching its verdicts."""
+    client = SemanticSimilarityClient('https://example.openai.azure.com', 'key', 'gpt', cache=cache)
+    client.client = SimpleNamespace(beta=SimpleNamespace(chat=SimpleNamespace(completions=judge_completions)))
+    return client
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    with tracing.span(tracing.TEST, test=item.nodeid):
+        yield
@@ -0,0 +1,261 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+import requests
+
+from copilot_chat_client import BotClient
+from http_pool import get_session
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_TOKEN_TTL = 3600  # Seconds, used when the token endpoint does not report expires_in
+TOKEN_REFRESH_MARGIN = 300  # Refresh tokens this many seconds before they expire
+MAX_IDLE_SECONDS = 1800  # Ready conversations older than this are recycled
+RETRY_DELAY = 5  # Seconds to wait before retrying a failed background connect
+
+
+class TokenCache:
+    """
+    Caches the Direct Line token from a bot's token endpoint and refreshes it before it expires.
+
+    Some token endpoints (e.g. Power Virtual Agents) issue tokens that are bound to a single
+    conversation; their responses carry a ``conversationId``. Such tokens are never cached: every
+    ``get()`` fetches its own, so two conversations never share a token.
+
+    Attributes:
+        endpoint (str): The endpoint URL to obtain the bot token.
+        refresh_margin (float): Seconds before expiry at which the token is refreshed.
+    """
+
+    def __init__(self, endpoint: str, session: requests.Session = None, refresh_margin: float = TOKEN_REFRESH_MARGIN):
+        """
+        Initialize the TokenCache.
+
+        Args:
+            endpoint (str): The endpoint URL to obtain the bot token.
+            session (requests.Session): The HTTP session to use. Defaults to the pooled session.
+            refresh_margin (float): Seconds before expiry at which the token is refreshed.
+        """
+        self.endpoint = endpoint
+        self.session = session or get_session()
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._single_use = False
+
+    def refresh(self) -> str:
+        """
+        Fetch a new token from the endpoint, caching it unless it is single-use.
+
+        A single-use token is never cached: it belongs to the caller alone.
+
+        Returns:
+            str: The new token.
+
+        Raises:
+            requests.RequestException: If there is an error in the HTTP request.
+        """
+        response = self.session.get(self.endpoint)
+        response.raise_for_status()
+        data = response.json()
+        with self._lock:
+            self._single_use = 'conversationId' in data
+            if self._single_use:
+                self._token = None
+            else:
+                self._token = data['token']
+                self._expires_at = time.monotonic() + data.get('expires_in', DEFAULT_TOKEN_TTL)
+                logger.info("Bot token refreshed.")
+        return data['token']
+
+    def needs_refresh(self) -> bool:
+        """
+        Whether the cached token is missing or within ``refresh_margin`` of expiring.
+
+        Always False for single-use endpoints, whose tokens are fetched by each ``get()``.
+        """
+        return not self._single_use and (self._token is None
+                                         or time.monotonic() >= self._expires_at - self.refresh_margin)
+
+    def get(self) -> str:
+        """
+        Get a valid token, fetching one only if the cached token is missing or expiring.
+
+        Single-use tokens are fetched anew for every call and never cached, so each one is handed
+        out exactly once.
+
+        Returns:
+            str: The token.
+        """
+        with self._lock:
+            token = self._token
+            if token is not None and time.monotonic() < self._expires_at - self.refresh_margin:
+                return token
+        return self.refresh()
+
+
+class ConversationPool:
+    """
+    Keeps a number of connected bot conversations ready so tests do not pay the connect latency.
+
+    Conversations are opened in the background and handed out by ``acquire()``. A released
+    conversation is disconnected (its history would leak into the next test) and a replacement
+    is opened in the background.
+
+    Attributes:
+        endpoint (str): The endpoint URL to obtain the bot token.
+        size (int): The number of ready conversations to keep open.
+        tokens (TokenCache): The token cache shared by all conversations of the pool.
+    """
+
+    def __init__(self, endpoint: str, size: int = 4, session: requests.Session = None,
+                 client_factory: Callable[..., BotClient] = BotClient, max_idle: float = MAX_IDLE_SECONDS):
+        """
+        Initialize the ConversationPool. Call ``start()`` (or use it as a context manager) to fill it.
+
+        Args:
+            endpoint (str): The endpoint URL to obtain the bot token.
+            size (int): The number of ready conversations to keep open.
+            session (requests.Session): The HTTP session to use. Defaults to the pooled session.
+            client_factory (Callable[..., BotClient]): Creates an unconnected client for the endpoint.
+            max_idle (float): Seconds after which an unused ready conversation is recycled.
+        """
+        self.endpoint = endpoint
+        self.size = size
+        self.session = session or get_session()
+        self.client_factory = client_factory
+        self.max_idle = max_idle
+        self.tokens = TokenCache(endpoint, self.session)
+        self._ready: 'queue.Queue[tuple]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._opening = 0
+        self._last_error: Optional[Exception] = None
+        self._wakeup = threading.Event()
+        self._closed = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._maintainer: Optional[threading.Thread] = None
+
+    def __enter__(self) -> 'ConversationPool':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """
+        Start opening conversations and the background maintenance thread.
+        """
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='conversation-pool')
+        self._maintainer = threading.Thread(target=self._maintain, name='conversation-pool-maintainer', daemon=True)
+        self._maintainer.start()
+
+    def acquire(self, timeout: float = 60) -> BotClient:
+        """
+        Take a connected conversation out of the pool.
+
+        Args:
+            timeout (float): Seconds to wait for a conversation if none is ready.
+
+        Returns:
+            BotClient: A connected client that is not shared with anyone else.
+
+        Raises:
+            TimeoutError: If no conversation became ready in time.
+            Exception: The error of the last failed background connect, if nothing is ready.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            self._wakeup.set()
+            try:
+                opened_at, client = self._ready.get(timeout=min(max(deadline - time.monotonic(), 0), 0.5))
+            except queue.Empty:
+                error, self._last_error = self._last_error, None
+                if error is not None:
+                    raise error
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f'No bot conversation became ready within {timeout} seconds')
+                continue
+            if client.ws.connected and time.monotonic() - opened_at < self.max_idle:
+                return client
+            logger.info("Discarding stale pooled conversation.")
+            client.disconnect()
+
+    def release(self, client: BotClient) -> None:
+        """
+        Return a conversation to the pool. It is closed and replaced in the background.
+
+        Args:
+            client (BotClient): A client previously returned by ``acquire()``.
+        """
+        client.disconnect()
+        self._wakeup.set()
+
+    @contextmanager
+    def conversation(self, timeout: float = 60) -> Iterator[BotClient]:
+        """
+        Acquire a conversation for the duration of a ``with`` block.
+
+        Args:
+            timeout (float): Seconds to wait for a conversation if none is ready.
+        """
+        client = self.acquire(timeout)
+        try:
+            yield client
+        finally:
+            self.release(client)
+
+    def close(self) -> None:
+        """
+        Stop the background threads and disconnect all ready conversations.
+        """
+        self._closed.set()
+        self._wakeup.set()
+        if self._maintainer is not None:
+            self._maintainer.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        while True:
+            try:
+                _, client = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            client.disconnect()
+
+    def _maintain(self) -> None:
+        while not self._closed.is_set():
+            try:
+                if self.tokens.needs_refresh():
+                    self.tokens.refresh()
+            except requests.RequestException as e:
+                logger.error(f"Failed to refresh bot token: {e}")
+            with self._lock:
+                missing = self.size - self._ready.qsize() - self._opening
+                self._opening += max(missing, 0)
+            for _ in range(missing):
+                self._executor.submit(self._open_one)
+            self._wakeup.wait(timeout=RETRY_DELAY)
+            self._wakeup.clear()
+
+    def _open_one(self) -> None:
+        try:
+            client = self.client_factory(self.endpoint, session=self.session)
+            client.connect(token=self.tokens.get())
+        except Exception as e:
+            logger.error(f"Failed to open pooled conversation: {e}")
+            self._last_error = e
+            return
+        finally:
+            with self._lock:
+                self._opening -= 1
+        if self._closed.is_set():
+            client.disconnect()
+        else:
+            self._ready.put((time.monotonic(), client))
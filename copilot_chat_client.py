@@ -1,15 +1,32 @@
-import json
 import logging
-from typing import List, Dict, Any
+import time
+from typing import Callable, List, Dict, Any, Optional, Tuple, Union
 import requests
 import websocket
 
+import latency
+import metrics
+import tracing
+from activity import ActivitySet, BotReply, parse_activity_set
+from frame_decoder import ActivityStreamDecoder
+from http_pool import get_session
+from latency import LatencyRecorder, PROCESS_LATENCY
+from long_poll import ActivityPoller
+from rate_limiter import AdaptiveRateLimiter, timed_request
+from reconnect import Backoff
+from transcript import TranscriptRecorder
+from transport import Channel
+from turn_log import TurnLog
+from turn_tracker import DEFAULT_QUIET_PERIOD, TurnTracker
+from ws_reactor import WebSocketReactor
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Constants
 HEADERS_CONTENT_TYPE = {'Content-Type': 'application/json'}
+DIRECT_LINE_BASE_URL = 'https://directline.botframework.com/v3/directline'
 
 
 class BotClient:
@@ -20,67 +37,238 @@ class BotClient:
         endpoint (str): The endpoint URL to obtain the bot token.
         conversation_id (str): The ID of the conversation with the bot.
         conversation_token (str): The token for the conversation.
-        ws (websocket.WebSocket): The WebSocket connection to the bot.
+        ws (websocket.WebSocket): The WebSocket connection to the bot, or the ``transport.Channel``
+            standing in for it when the stream is read by a reactor or a poller.
+        last_activity_id (str): The id Direct Line assigned to the last message sent.
+        latency (LatencyRecorder): Connect and turn timings of this conversation, also aggregated
+            into ``latency.PROCESS_LATENCY``.
+        session (requests.Session): The HTTP session used for token, conversation and activity requests.
+        base_url (str): The Direct Line API base URL.
+        recorder (TranscriptRecorder): Records all traffic of the conversation, if recording is enabled.
+        reactor (WebSocketReactor): The shared reactor that reads the stream, if any; ``ws`` is then
+            its ``ReactorChannel``.
+        poller (ActivityPoller): The shared poller that reads the conversation instead of a WebSocket,
+            if any; ``ws`` is then its ``PollingChannel``.
+        backoff (Backoff): The retry state used to reopen a dropped stream.
+        limiter (AdaptiveRateLimiter): The rate limiter shared with other clients, if any.
+        turn_log (TurnLog): The sink every turn is written to, if any.
+        last_message (str): The text of the last message sent.
+        turn_index (int): The number of messages sent in this conversation, used to label trace spans.
+        turn_timings (Dict[str, float]): The latencies of the last turn in seconds by metric name.
+        watermark (str): The watermark of the last activity set received.
+        bytes_received (int): Stream bytes received in this conversation.
+        reconnects (int): How often a dropped stream was reopened.
+        bytes_saved (int): Stream bytes that reconnecting from the watermark did not have to redeliver.
     """
 
-    def __init__(self, endpoint: str):
+    def __init__(self, endpoint: str, session: requests.Session = None, base_url: str = DIRECT_LINE_BASE_URL,
+                 record_to: str = None, reactor: WebSocketReactor = None, backoff: Backoff = None,
+                 limiter: AdaptiveRateLimiter = None, turn_log: TurnLog = None, poller: ActivityPoller = None):
         """
         Initialize the BotClient with the given endpoint.
 
         Args:
             endpoint (str): The endpoint URL to obtain the bot token.
+            session (requests.Session): The HTTP session to use. Defaults to the pooled, process-wide
+                session from ``http_pool`` so connections are kept alive across turns and clients.
+            base_url (str): The Direct Line API base URL, e.g. a local ``DirectLineEmulator``'s.
+            record_to (str): A transcript file to append every sent activity and received frame to,
+                for later replay with ``replay.ReplayBotClient``. Clients open at the same time need
+                different files.
+            reactor (WebSocketReactor): A reactor to hand the stream to, e.g. ``ws_reactor.get_reactor()``,
+                so many conversations share one reading thread instead of each blocking on its socket.
+            backoff (Backoff): The retry policy for reopening a dropped stream. Pass
+                ``Backoff(max_attempts=0)`` to report dropped streams immediately instead.
+            limiter (AdaptiveRateLimiter): A rate limiter to share with other clients. The token,
+                conversation and activity calls then wait for it, are retried when Direct Line
+                throttles them, and the time held back is recorded as ``latency.THROTTLE_WAIT``.
+            turn_log (TurnLog): A sink to stream every turn to: the message, the bot activities and
+                the turn's timings.
+            poller (ActivityPoller): A poller to read the conversation through Direct Line's
+                ``GET /conversations/{id}/activities`` endpoint instead of a WebSocket, e.g.
+                ``long_poll.get_poller()``, for networks that block WebSockets. Overrides ``reactor``.
         """
         self.endpoint = endpoint
+        self.session = session or get_session()
+        self.base_url = base_url.rstrip('/')
+        self.recorder: Optional[TranscriptRecorder] = TranscriptRecorder(record_to) if record_to else None
+        self.reactor = reactor
+        self.poller = poller
+        self.backoff = backoff or Backoff()
+        self.limiter = limiter
+        self.turn_log = turn_log
+        self.last_message: Optional[str] = None
+        self.turn_index = 0
+        self.turn_timings: Dict[str, float] = {}
+        self.watermark: Optional[str] = None
+        self.bytes_received = 0
+        self.reconnects = 0
+        self.bytes_saved = 0
         self.conversation_id: str = None
         self.conversation_token: str = None
         self.ws: websocket.WebSocket = None
+        self.last_activity_id: Optional[str] = None
+        self.latency = LatencyRecorder(parent=PROCESS_LATENCY)
+        self._sent_at: Optional[float] = None
+        self._decoder = ActivityStreamDecoder(parse_activity_set)
+        self._clock = time.monotonic
+
+    def fetch_token(self) -> Dict[str, Any]:
+        """
+        Obtain a Direct Line token from the bot's token endpoint.
+
+        Returns:
+            Dict[str, Any]: The token response, containing at least ``token`` and usually ``expires_in``.
 
-    def connect(self) -> None:
+        Raises:
+            requests.RequestException: If there is an error in the HTTP request.
+        """
+        with tracing.span(tracing.CONNECT_TOKEN):
+            response, _, _ = self._request(lambda: self.session.get(self.endpoint), latency.CONNECT_TOKEN)
+        return response.json()
+
+    def connect(self, token: str = None) -> None:
         """
         Establish a connection with the bot by obtaining a token and starting a WebSocket connection.
 
+        Args:
+            token (str): A previously fetched Direct Line token. If omitted, a new one is fetched.
+
         Raises:
             requests.RequestException: If there is an error in the HTTP request.
         """
         try:
-            response = requests.get(self.endpoint)
-            response.raise_for_status()
-            token = response.json()['token']
+            with tracing.span(tracing.CONNECT) as span:
+                if token is None:
+                    token = self.fetch_token()['token']
 
-            headers = {'Authorization': f'Bearer {token}', **HEADERS_CONTENT_TYPE}
-            response = requests.post('https://directline.botframework.com/v3/directline/conversations', headers=headers)
-            response.raise_for_status()
+                headers = {'Authorization': f'Bearer {token}', **HEADERS_CONTENT_TYPE}
+                with tracing.span(tracing.CONNECT_CONVERSATION):
+                    response, _, _ = self._request(lambda: self.session.post(f'{self.base_url}/conversations',
+                                                                             headers=headers),
+                                                   latency.CONNECT_CONVERSATION)
 
-            conversation_data = response.json()
-            self.conversation_id = conversation_data['conversationId']
-            self.conversation_token = conversation_data['token']
-            stream_url = conversation_data['streamUrl']
+                conversation_data = response.json()
+                self.conversation_id = conversation_data['conversationId']
+                self.conversation_token = conversation_data['token']
+                self.watermark = None
+                stream_url = conversation_data.get('streamUrl')
+                span.set_attribute('conversation_id', self.conversation_id)
 
-            self.ws = websocket.WebSocket()
-            self.ws.connect(stream_url)
+                with tracing.span(tracing.CONNECT_WEBSOCKET, conversation_id=self.conversation_id):
+                    with self.latency.time(latency.CONNECT_WEBSOCKET):
+                        self._open_stream(stream_url)
+            self.turn_index = 0
+            self.bytes_received = 0
+            if self.recorder:
+                self.recorder.connect(self.conversation_id)
             logger.info("Successfully connected to the bot.")
 
         except requests.RequestException as e:
             logger.error(f"Failed to connect to bot: {e}")
             raise
 
+    def resume(self) -> None:
+        """
+        Reopen the stream of the current conversation, e.g. after the connection dropped.
+
+        The stream is reconnected from ``watermark``, so Direct Line redelivers only the activities
+        that were not received yet, including replies sent while the stream was down.
+
+        Raises:
+            requests.RequestException: If there is an error in the HTTP request.
+            websocket.WebSocketException: If the WebSocket cannot be opened.
+        """
+        headers = {'Authorization': f'Bearer {self.conversation_token}'}
+        params = {'watermark': self.watermark} if self.watermark is not None else {}
+        url = f'{self.base_url}/conversations/{self.conversation_id}'
+        with tracing.span(tracing.CONNECT_RESUME, conversation_id=self.conversation_id, watermark=self.watermark):
+            response, started, _ = self._request(lambda: self.session.get(url, headers=headers, params=params))
+            conversation_data = response.json()
+            self.conversation_token = conversation_data.get('token', self.conversation_token)
+            self._open_stream(conversation_data.get('streamUrl'))
+        self.latency.record(latency.CONNECT_RESUME, self._clock() - started)
+        self.reconnects += 1
+        self.bytes_saved += self.bytes_received
+        logger.info(f"Resumed conversation {self.conversation_id} from watermark {self.watermark}.")
+
+    def _request(self, send: Callable[[], requests.Response],
+                 name: Optional[str] = None) -> Tuple[requests.Response, float, float]:
+        return timed_request(send, self.latency, name, self.limiter, self._clock)
+
+    def _open_stream(self, stream_url: Optional[str]) -> None:
+        self._decoder.reset()
+        if self.poller:
+            self.ws = self.poller.register(self.base_url, self.conversation_id, self.conversation_token,
+                                           self.watermark)
+            return
+        ws = websocket.WebSocket()
+        ws.connect(stream_url)
+        self.ws = self.reactor.register(ws) if self.reactor else ws
+
+    def _reconnect(self) -> bool:
+        """
+        Reopen a dropped stream, retrying with backoff.
+
+        Returns:
+            bool: Whether the stream was reopened before the retries ran out.
+        """
+        if isinstance(self.ws, Channel):
+            self.ws.close()
+        else:
+            self.ws.shutdown()
+        while not self.backoff.exhausted:
+            time.sleep(self.backoff.next_delay())
+            try:
+                self.resume()
+            except (requests.RequestException, websocket.WebSocketException, OSError) as e:
+                logger.warning(f"Reconnect attempt {self.backoff.attempts} failed: {e}")
+                continue
+            self.backoff.reset()
+            return True
+        return False
+
     def disconnect(self) -> None:
         """
         Close the WebSocket connection with the bot.
         """
+        if self.recorder:
+            self.recorder.close()
         if self.ws:
             self.ws.close()
             logger.info("WebSocket connection closed.")
         else:
             logger.warning("WebSocket connection is not established.")
 
-    def send(self, message: str) -> None:
+    def send(self, message: str) -> Optional[str]:
         """
         Send a message to the bot.
 
         Args:
             message (str): The message to send to the bot.
 
+        Returns:
+            str: The activity id assigned by Direct Line, used to correlate the bot's replies.
+
+        Raises:
+            requests.RequestException: If there is an error in the HTTP request.
+        """
+        self.last_activity_id, self._sent_at, acked_at = self._post_message(message)
+        self.last_message = message
+        self.turn_timings = {latency.SEND_ACK: acked_at - self._sent_at}
+        return self.last_activity_id
+
+    def _post_message(self, message: str) -> Tuple[Optional[str], float, float]:
+        """
+        Post one message activity to the conversation.
+
+        Args:
+            message (str): The message to send to the bot.
+
+        Returns:
+            Tuple[Optional[str], float, float]: The activity id assigned by Direct Line and the times
+            the POST started and returned.
+
         Raises:
             requests.RequestException: If there is an error in the HTTP request.
         """
@@ -91,73 +279,159 @@ class BotClient:
             'from': {'id': 'user1'},
             'text': message
         }
-        url = f'https://directline.botframework.com/v3/directline/conversations/{self.conversation_id}/activities'
+        url = f'{self.base_url}/conversations/{self.conversation_id}/activities'
+        self.turn_index += 1
 
         try:
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
+            with tracing.span(tracing.SEND, conversation_id=self.conversation_id, turn_index=self.turn_index):
+                response, sent_at, acked_at = self._request(
+                    lambda: self.session.post(url, headers=headers, json=payload), latency.SEND_ACK)
             logger.info("Message sent successfully.")
         except requests.RequestException as e:
             logger.error(f"Failed to send message: {e}")
             raise
+        metrics.SENDS.inc()
+        if isinstance(self.ws, Channel):
+            self.ws.sent()
+        activity_id = response.json().get('id')
+        if self.recorder:
+            self.recorder.send(payload, activity_id, sent_at, acked_at)
+        return activity_id, sent_at, acked_at
 
-    def receive(self, timeout: int = 20) -> List[str]:
+    def receive(self, timeout: float = 20, quiet_period: float = DEFAULT_QUIET_PERIOD,
+                reply_to_id: Optional[str] = None) -> BotReply:
         """
-        Receive messages from the bot over WebSocket.
+        Receive the bot's complete reply to the last message over WebSocket.
+
+        All bot activities of the turn are collected; see ``TurnTracker`` for when a turn ends. If the
+        stream drops, it is reopened with ``resume()`` according to ``backoff``.
 
         Args:
-            timeout (int): The timeout for receiving messages in seconds. Default is 20 seconds.
+            timeout (float): The maximum time to wait for the turn in seconds. Default is 20 seconds.
+            quiet_period (float): Seconds of silence after a bot reply that end the turn.
+            reply_to_id (str): The user activity to collect replies for. Defaults to the last one sent.
 
         Returns:
-            List[str]: A list of messages received from the bot.
+            BotReply: The messages received from the bot as a list of strings, empty if it did not reply
+            in time. Its ``activities`` hold the full bot activities of the turn.
 
         Raises:
-            Exception: If the WebSocket connection is closed unexpectedly.
+            Exception: If the WebSocket connection closed and could not be reopened.
         """
-        self.ws.settimeout(timeout)
-        message_buffer = ''
+        tracker = TurnTracker(reply_to_id or self.last_activity_id, quiet_period)
+        deadline = self._clock() + timeout
 
-        while True:
-            try:
-                frame = self.ws.recv()
-                message_buffer += frame
-                try:
-                    parsed_message = json.loads(message_buffer)
-                    responses = self._extract_bot_responses(parsed_message)
-                    if responses:
-                        logger.info("Bot response received.")
-                        return responses
-                    else:
-                        message_buffer = ''
-                except json.JSONDecodeError:
-                    # Continue accumulating data
-                    continue
-            except websocket.WebSocketTimeoutException:
-                logger.warning("WebSocket timeout occurred.")
-                return []
-            except websocket.WebSocketConnectionClosedException:
+        with tracing.span(tracing.RECEIVE, conversation_id=self.conversation_id, turn_index=self.turn_index) as span:
+            while True:
+                wait = tracker.wait_time(deadline, self._clock())
+                if wait <= 0:
+                    break
+                received_at, activity_sets = self._read_stream(wait)
+                for activity_set in activity_sets:
+                    tracker.observe(activity_set, received_at)
+            span.set_attribute('activities', len(tracker.activities))
+
+        reply = self._finish_turn(tracker, self._sent_at, self.last_message, self.turn_timings)
+        if tracker.replied:
+            self._sent_at = None
+        return reply
+
+    def _read_stream(self, timeout: float) -> Tuple[float, List[ActivitySet]]:
+        """
+        Wait for the next frame of the stream and account for it, reopening the stream if it dropped.
+
+        Args:
+            timeout (float): The maximum time to wait in seconds.
+
+        Returns:
+            Tuple[float, List[ActivitySet]]: The arrival time and the activity sets the frame
+            completed; no sets if nothing arrived in time.
+
+        Raises:
+            Exception: If the WebSocket connection closed and could not be reopened.
+        """
+        try:
+            received_at, frame, activity_sets = self._next_frame(timeout)
+        except websocket.WebSocketTimeoutException:
+            return self._clock(), []
+        except (websocket.WebSocketConnectionClosedException, ConnectionError):
+            metrics.CONNECTION_CLOSED.inc()
+            logger.warning("WebSocket connection dropped, reconnecting.")
+            if not self._reconnect():
                 logger.error("WebSocket connection closed unexpectedly.")
                 raise Exception('WebSocket connection closed')
+            return self._clock(), []
+        self.bytes_received += len(frame)
+        if self.recorder:
+            self.recorder.frame(frame, received_at)
+        for activity_set in activity_sets:
+            if activity_set.watermark is not None:
+                self.watermark = activity_set.watermark
+        return received_at, activity_sets
+
+    def _finish_turn(self, tracker: TurnTracker, sent_at: Optional[float], message: Optional[str],
+                     timings: Dict[str, float]) -> BotReply:
+        """
+        Record a finished turn: its metrics, latencies and turn log entry.
+
+        Args:
+            tracker (TurnTracker): The tracker that collected the turn.
+            sent_at (float): The time the message was sent, or None if its latency is not recorded.
+            message (str): The message the turn answers.
+            timings (Dict[str, float]): The turn's timings so far; the turn latencies are added to it.
+
+        Returns:
+            BotReply: The bot's reply.
+        """
+        if not tracker.replied:
+            metrics.RECEIVE_TIMEOUTS.inc()
+            logger.warning("WebSocket timeout occurred.")
+        else:
+            metrics.ACTIVITIES_RECEIVED.inc(len(tracker.activities))
+            if sent_at is not None:
+                timings.update(latency.record_turn(self.latency, sent_at, tracker.first_reply_at,
+                                                   tracker.last_reply_at))
+            logger.info("Bot response received.")
+        reply = BotReply(tracker.activity_set())
+        if self.turn_log:
+            self.turn_log.record_turn(self.conversation_id, message, reply.activities, timings)
+        return reply
+
+    def _next_frame(self, timeout: float) -> Tuple[float, str, List[ActivitySet]]:
+        """
+        Wait for the next frame of the stream and decode it.
+
+        Args:
+            timeout (float): The maximum time to wait in seconds.
+
+        Returns:
+            Tuple[float, str, List[ActivitySet]]: The arrival time, the raw frame text and the
+            activity sets it completed.
+
+        Raises:
+            websocket.WebSocketTimeoutException: If no frame arrived in time.
+            websocket.WebSocketConnectionClosedException: If the connection was closed.
+        """
+        if isinstance(self.ws, Channel):
+            return self.ws.get(timeout)
+        self.ws.settimeout(timeout)
+        frame = self.ws.recv()
+        return self._clock(), frame, self._decoder.feed(frame)
 
     @staticmethod
-    def _extract_bot_responses(data: Dict[str, Any]) -> List[str]:
+    def _extract_bot_responses(data: Union[ActivitySet, Dict[str, Any]]) -> List[str]:
         """
-        Extract bot responses from JSON data.
+        Extract bot responses from an activity set.
 
         Args:
-            data (Dict[str, Any]): The JSON data containing bot responses.
+            data (ActivitySet): The activity set containing bot responses, or its plain JSON form.
 
         Returns:
             List[str]: A list of bot responses.
         """
-        responses = []
-        for activity in data.get('activities', []):
-            if activity.get('type') == 'message' and activity.get('from', {}).get('role') == 'bot':
-                responses.append(activity.get('text', ''))
-                if 'suggestedActions' in activity:
-                    for action in activity['suggestedActions'].get('actions', []):
-                        responses.append(action['title'])
-        return responses
+        if isinstance(data, dict):
+            data = ActivitySet.from_dict(data)
+        return data.responses()
 
 
 if __name__ == "__main__":
@@ -1,9 +1,11 @@
-import json
 import logging
 from typing import List, Dict, Any
 import requests
 import websocket
 
+from frame_decoder import ActivityStreamDecoder
+from http_pool import get_session
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -22,12 +24,12 @@ class BotClient:
     def connect(self) -> None:
         """Establish a connection with the bot."""
         try:
-            response = requests.get(self.endpoint)
+            response = get_session().get(self.endpoint)
             response.raise_for_status()
             token = response.json()['token']
 
             headers = {'Authorization': f'Bearer {token}', **HEADERS_CONTENT_TYPE}
-            response = requests.post('https://directline.botframework.com/v3/directline/conversations', headers=headers)
+            response = get_session().post('https://directline.botframework.com/v3/directline/conversations', headers=headers)
             response.raise_for_status()
 
             conversation_data = response.json()
@@ -55,7 +57,7 @@ class BotClient:
         url = f'https://directline.botframework.com/v3/directline/conversations/{self.conversation_id}/activities'
 
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = get_session().post(url, headers=headers, json=payload)
             response.raise_for_status()
             logger.info("Message sent successfully.")
         except requests.RequestException as e:
@@ -65,23 +67,16 @@ class BotClient:
     def receive(self, timeout: int = 20) -> List[str]:
         """Receive messages from the bot over WebSocket."""
         self.ws.settimeout(timeout)
-        message_buffer = ''
+        decoder = ActivityStreamDecoder()
 
         while True:
             try:
                 frame = self.ws.recv()
-                message_buffer += frame
-                try:
-                    parsed_message = json.loads(message_buffer)
+                for parsed_message in decoder.feed(frame):
                     responses = self._extract_bot_responses(parsed_message)
                     if responses:
                         logger.info("Bot response received.")
                         return responses
-                    else:
-                        message_buffer = ''
-                except json.JSONDecodeError:
-                    # Continue accumulating data
-                    continue
             except websocket.WebSocketTimeoutException:
                 logger.warning("WebSocket timeout occurred.")
                 return []
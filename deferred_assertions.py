@@ -0,0 +1,105 @@
+import contextvars
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_JUDGE_WORKERS = 4
+
+
+class SemanticAssertionError(AssertionError):
+    """
+    A semantic assertion that failed because the similarity score was below its threshold.
+
+    Attributes:
+        score (float): The similarity score the reply got.
+    """
+
+    def __init__(self, message: str, score: float):
+        super().__init__(message)
+        self.score = score
+
+
+class DeferredSemanticAssertions:
+    """
+    Collects semantic assertions during a conversation and judges them in the background.
+
+    Each ``expect()`` call is handed to a bounded thread pool right away, so the LLM judge works on
+    earlier answers while the conversation carries on with the bot. ``verify()`` (or leaving the
+    ``with`` block) waits for all verdicts and reports every failed assertion at once.
+
+    Attributes:
+        evaluator: Anything with an ``assert_semantically(expected, actual, threshold)`` method,
+            e.g. ``SemanticSimilarityClient`` or ``TieredSimilarityEvaluator``. It should raise
+            ``SemanticAssertionError`` for a score below the threshold, so the score is not lost.
+    """
+
+    def __init__(self, evaluator, max_workers: int = DEFAULT_JUDGE_WORKERS):
+        """
+        Initialize the DeferredSemanticAssertions.
+
+        Args:
+            evaluator: The evaluator used to judge each assertion.
+            max_workers (int): The maximum number of judge calls in flight.
+        """
+        self.evaluator = evaluator
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='semantic-judge')
+        self._pending: List[Tuple[str, str, Future]] = []
+
+    def __enter__(self) -> 'DeferredSemanticAssertions':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                self.verify()
+        finally:
+            self._executor.shutdown(wait=exc_type is None, cancel_futures=exc_type is not None)
+
+    def expect(self, expected: str, actual: str, threshold: float = 0.75, label: Optional[str] = None) -> Future:
+        """
+        Register a semantic assertion to be judged in the background.
+
+        Args:
+            expected (str): The expected text.
+            actual (str): The actual text.
+            threshold (float): The minimum similarity score.
+            label (str): A name for the assertion in the failure report. Defaults to its position.
+
+        Returns:
+            Future: Resolves to the similarity score, or raises the assertion's failure; a
+            ``SemanticAssertionError`` carries the score that was too low.
+        """
+        label = label or f'assertion {len(self._pending) + 1}'
+        # Run in a copy of the caller's context, so trace attributes such as the turn carry over to the judge.
+        future = self._executor.submit(contextvars.copy_context().run, self.evaluator.assert_semantically,
+                                       expected, actual, threshold)
+        self._pending.append((label, actual, future))
+        return future
+
+    def verify(self) -> List[float]:
+        """
+        Wait for all registered assertions and report their outcome together.
+
+        Returns:
+            List[float]: The similarity scores, in registration order.
+
+        Raises:
+            AssertionError: Listing every failed assertion, if any failed.
+        """
+        scores, failures = [], []
+        for label, actual, future in self._pending:
+            try:
+                scores.append(future.result())
+            except AssertionError as e:
+                failures.append(f"{label}: {e}")
+            except Exception as e:
+                failures.append(f"{label}: judge error {type(e).__name__}: {e} Actual: {actual}")
+        self._pending = []
+        if failures:
+            raise AssertionError(f"{len(failures)} of {len(scores) + len(failures)} semantic assertions failed:\n"
+                                 + '\n'.join(failures))
+        logger.info(f"All {len(scores)} semantic assertions passed.")
+        return scores
@@ -0,0 +1,408 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import secrets
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+# Constants
+TOKEN_TTL = 3600  # Seconds reported as expires_in
+MAX_REQUEST_BODY = 1024 * 1024
+CLOSE_TIMEOUT = 1.0  # Seconds to wait for clients to answer the close handshake on shutdown
+
+# A bot reply is either plain text or activity fields, optionally with a 'suggested_actions' list of titles.
+Reply = Union[str, Dict[str, Any]]
+Bot = Callable[[str], List[Reply]]
+
+
+def echo_bot(text: str) -> List[Reply]:
+    """A bot that repeats every message back."""
+    return [f'You said: {text}']
+
+
+class ScriptedBot:
+    """
+    A bot whose replies are looked up by the (case-insensitive) text of the user message.
+
+    Attributes:
+        script (Dict[str, List[Reply]]): The replies by lower-cased user message.
+        default (Bot): The bot answering messages that are not in the script.
+    """
+
+    def __init__(self, script: Dict[str, List[Reply]], default: Bot = echo_bot):
+        """
+        Initialize the ScriptedBot.
+
+        Args:
+            script (Dict[str, List[Reply]]): The replies by user message.
+            default (Bot): The bot answering messages that are not in the script.
+        """
+        self.script = {text.lower(): replies for text, replies in script.items()}
+        self.default = default
+
+    def __call__(self, text: str) -> List[Reply]:
+        replies = self.script.get(text.strip().lower())
+        return list(replies) if replies is not None else self.default(text)
+
+
+class _Conversation:
+    __slots__ = ('id', 'token', 'activities', 'streams', 'sequence', 'starts')
+
+    def __init__(self, conversation_id: str, token: str):
+        self.id = conversation_id
+        self.token = token
+        self.activities: List[Dict[str, Any]] = []
+        self.streams: Dict[Any, asyncio.Queue] = {}
+        self.sequence = itertools.count()
+        self.starts = 0  # POST /conversations calls that returned this conversation
+
+
+class DirectLineEmulator:
+    """
+    A local stand-in for the Direct Line 3.0 service and a bot's token endpoint.
+
+    It serves the token endpoint, ``POST /conversations``, ``POST /conversations/{id}/activities``,
+    ``GET /conversations/{id}?watermark=`` for reconnecting, ``GET /conversations/{id}/activities?watermark=``
+    for polling clients and a WebSocket ``streamUrl`` that pushes activity sets, first redelivering
+    any after the watermark. Everything runs on one asyncio event
+    loop in a background thread, so it can hold thousands of conversations. Point a ``BotClient`` at it with
+    ``BotClient(emulator.token_endpoint, base_url=emulator.base_url)``.
+
+    Attributes:
+        bot (Bot): Produces the replies to each user message.
+        response_delay (float): Seconds to wait before each bot reply.
+        fragment_size (int): If set, each activity set is sent as several WebSocket messages of at most
+            this many characters, as a proxy splitting large payloads would.
+        typing (bool): Whether to send a typing activity before the replies.
+        single_use_tokens (bool): Whether the token endpoint issues tokens bound to a new conversation,
+            as Power Virtual Agents does; starting a conversation with one joins that conversation.
+        tokens_issued (int): Tokens handed out by the token endpoint.
+        conversations (Dict[str, _Conversation]): The open conversations by id.
+    """
+
+    def __init__(self, bot: Bot = echo_bot, response_delay: float = 0.0, fragment_size: Optional[int] = None,
+                 typing: bool = False, single_use_tokens: bool = False, host: str = '127.0.0.1', port: int = 0,
+                 ws_port: int = 0):
+        """
+        Initialize the DirectLineEmulator. Call ``start()`` (or use it as a context manager) to serve.
+
+        Args:
+            bot (Bot): Produces the replies to each user message.
+            response_delay (float): Seconds to wait before each bot reply.
+            fragment_size (int): If set, split each activity set into WebSocket messages of this size.
+            typing (bool): Whether to send a typing activity before the replies.
+            single_use_tokens (bool): Whether the token endpoint issues tokens bound to a new conversation.
+            host (str): The interface to listen on.
+            port (int): The HTTP port; 0 picks a free one.
+            ws_port (int): The WebSocket port; 0 picks a free one.
+        """
+        self.bot = bot
+        self.response_delay = response_delay
+        self.fragment_size = fragment_size
+        self.typing = typing
+        self.single_use_tokens = single_use_tokens
+        self.host = host
+        self.port = port
+        self.ws_port = ws_port
+        self.conversations: Dict[str, _Conversation] = {}
+        self.tokens_issued = 0
+        self._bound: Dict[str, _Conversation] = {}  # Single-use tokens by the conversation they belong to
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._stop: Optional[asyncio.Event] = None
+        self._startup_error: Optional[BaseException] = None
+
+    def __enter__(self) -> 'DirectLineEmulator':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    @property
+    def base_url(self) -> str:
+        """The Direct Line API base URL to pass to the clients."""
+        return f'http://{self.host}:{self.port}/v3/directline'
+
+    @property
+    def token_endpoint(self) -> str:
+        """The token endpoint URL to pass to the clients."""
+        return f'http://{self.host}:{self.port}/directline/token'
+
+    def start(self) -> None:
+        """
+        Start serving in a background thread and wait until both servers listen.
+        """
+        self._thread = threading.Thread(target=self._run, name='directline-emulator', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._startup_error is not None:
+            raise self._startup_error
+        logger.info(f"Direct Line emulator listening on {self.base_url}")
+
+    def stop(self) -> None:
+        """
+        Close all connections and stop the servers.
+        """
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join()
+
+    def drop_streams(self) -> None:
+        """
+        Abort every open stream without a close handshake, as a network failure would.
+        """
+        async def drop():
+            for conversation in self.conversations.values():
+                for stream in list(conversation.streams):
+                    stream.transport.abort()
+
+        asyncio.run_coroutine_threadsafe(drop(), self._loop).result()
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._serve())
+        except BaseException as e:
+            self._startup_error = e
+            self._ready.set()
+        finally:
+            # Keep-alive HTTP connections and replies still in flight are abandoned on shutdown.
+            pending = asyncio.all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self._loop.close()
+
+    async def _serve(self) -> None:
+        self._stop = asyncio.Event()
+        http_server = await asyncio.start_server(self._handle_http, self.host, self.port, backlog=4096)
+        self.port = http_server.sockets[0].getsockname()[1]
+        async with websockets.serve(self._handle_stream, self.host, self.ws_port, max_size=None,
+                                    backlog=4096, close_timeout=CLOSE_TIMEOUT) as ws_server:
+            self.ws_port = next(iter(ws_server.sockets)).getsockname()[1]
+            async with http_server:
+                self._ready.set()
+                await self._stop.wait()
+
+    # HTTP
+
+    async def _handle_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                method, target, _ = request_line.split(' ', 2)
+                headers = {}
+                for line in header_lines:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+                length = min(int(headers.get('content-length', 0)), MAX_REQUEST_BODY)
+                body = await reader.readexactly(length) if length else b''
+
+                try:
+                    status, payload = self._route(method, target, headers, body)
+                except Exception as e:
+                    logger.exception(f"Emulator failed to handle {method} {target}")
+                    status, payload = '500 Internal Server Error', {'error': {'code': 'ServiceError',
+                                                                              'message': str(e)}}
+                data = json.dumps(payload).encode('utf-8')
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(f'HTTP/1.1 {status}\r\nContent-Type: application/json; charset=utf-8\r\n'
+                             f'Content-Length: {len(data)}\r\n'
+                             f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.CancelledError):
+            # Returning instead of re-raising on shutdown keeps asyncio's stream callback quiet.
+            return
+        finally:
+            writer.close()
+
+    def _route(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Tuple[str, Dict[str, Any]]:
+        url = urlsplit(target)
+        parts = [part for part in url.path.split('/') if part]
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        auth = headers.get('authorization', '')
+        token = auth[len('Bearer '):] if auth.startswith('Bearer ') else None
+
+        if method == 'GET' and parts == ['directline', 'token']:
+            self.tokens_issued += 1
+            if self.single_use_tokens:
+                conversation = self._new_conversation()
+                self._bound[conversation.token] = conversation
+                return '200 OK', {'token': conversation.token, 'conversationId': conversation.id,
+                                  'expires_in': TOKEN_TTL}
+            return '200 OK', {'token': secrets.token_urlsafe(24), 'expires_in': TOKEN_TTL}
+        if parts[:3] != ['v3', 'directline', 'conversations']:
+            return '404 Not Found', {'error': {'code': 'NotFound', 'message': url.path}}
+        if token is None:
+            return '403 Forbidden', {'error': {'code': 'BadArgument', 'message': 'Missing token'}}
+
+        if method == 'POST' and len(parts) == 3:
+            conversation = self._bound.get(token) or self._new_conversation()
+            conversation.starts += 1
+            return '201 Created', {
+                'conversationId': conversation.id,
+                'token': conversation.token,
+                'expires_in': TOKEN_TTL,
+                'streamUrl': self._stream_url(conversation),
+            }
+
+        conversation = self.conversations.get(parts[3]) if len(parts) > 3 else None
+        if conversation is None:
+            return '404 Not Found', {'error': {'code': 'BadArgument', 'message': 'Conversation not found'}}
+        if token != conversation.token:
+            return '403 Forbidden', {'error': {'code': 'TokenInvalid', 'message': 'Token not valid'}}
+        if method == 'GET' and len(parts) == 4:
+            return '200 OK', {
+                'conversationId': conversation.id,
+                'token': conversation.token,
+                'expires_in': TOKEN_TTL,
+                'streamUrl': self._stream_url(conversation, query.get('watermark')),
+            }
+        if method == 'GET' and parts[4:] == ['activities']:
+            return '200 OK', self._activities_since(conversation, query.get('watermark'))
+        if method == 'POST' and parts[4:] == ['activities']:
+            try:
+                activity = json.loads(body)
+            except ValueError:
+                return '400 Bad Request', {'error': {'code': 'BadArgument', 'message': 'Invalid JSON'}}
+            return '200 OK', {'id': self._post_activity(conversation, activity)}
+        return '405 Method Not Allowed', {'error': {'code': 'BadArgument', 'message': f'{method} {url.path}'}}
+
+    def _new_conversation(self) -> _Conversation:
+        conversation = _Conversation(secrets.token_hex(12), secrets.token_urlsafe(24))
+        self.conversations[conversation.id] = conversation
+        return conversation
+
+    def _stream_url(self, conversation: _Conversation, watermark: Optional[str] = None) -> str:
+        query = f't={conversation.token}' + (f'&watermark={watermark}' if watermark is not None else '')
+        return f'ws://{self.host}:{self.ws_port}/v3/directline/conversations/{conversation.id}/stream?{query}'
+
+    # Activities
+
+    def _new_activity(self, conversation: _Conversation, activity: Dict[str, Any]) -> Dict[str, Any]:
+        activity = dict(activity)
+        activity['id'] = f'{conversation.id}|{next(conversation.sequence):07d}'
+        activity['timestamp'] = datetime.now(timezone.utc).isoformat()
+        activity['conversation'] = {'id': conversation.id}
+        activity['channelId'] = 'directline'
+        conversation.activities.append(activity)
+        return activity
+
+    def _post_activity(self, conversation: _Conversation, activity: Dict[str, Any]) -> str:
+        activity = self._new_activity(conversation, {**activity, 'from': {**activity.get('from', {}), 'role': 'user'}})
+        self._broadcast(conversation, [activity])
+        if activity.get('type') == 'message':
+            asyncio.get_running_loop().create_task(self._reply(conversation, activity))
+        return activity['id']
+
+    async def _reply(self, conversation: _Conversation, activity: Dict[str, Any]) -> None:
+        bot_from = {'id': 'bot', 'name': 'Emulated Bot', 'role': 'bot'}
+        if self.typing:
+            typing = self._new_activity(conversation, {'type': 'typing', 'from': bot_from,
+                                                       'replyToId': activity['id']})
+            self._broadcast(conversation, [typing])
+        for reply in self.bot(activity.get('text', '')):
+            if self.response_delay:
+                await asyncio.sleep(self.response_delay)
+            fields = {'text': reply} if isinstance(reply, str) else dict(reply)
+            actions = fields.pop('suggested_actions', None)
+            if actions:
+                fields['suggestedActions'] = {'actions': [{'type': 'imBack', 'title': title, 'value': title}
+                                                          for title in actions]}
+            message = self._new_activity(conversation, {'type': 'message', 'from': bot_from,
+                                                        'replyToId': activity['id'], **fields})
+            self._broadcast(conversation, [message])
+
+    def _activities_since(self, conversation: _Conversation, watermark: Optional[str]) -> Dict[str, Any]:
+        start = int(watermark) + 1 if watermark is not None and watermark.lstrip('-').isdigit() else 0
+        if not conversation.activities:
+            return {'activities': [], 'watermark': watermark}
+        return {'activities': conversation.activities[start:], 'watermark': str(len(conversation.activities) - 1)}
+
+    def _frames(self, conversation: _Conversation, activities: List[Dict[str, Any]]) -> List[str]:
+        text = json.dumps({'activities': activities, 'watermark': str(len(conversation.activities) - 1)})
+        if self.fragment_size:
+            return [text[i:i + self.fragment_size] for i in range(0, len(text), self.fragment_size)]
+        return [text]
+
+    def _broadcast(self, conversation: _Conversation, activities: List[Dict[str, Any]]) -> None:
+        frames = self._frames(conversation, activities)
+        for outbox in conversation.streams.values():
+            outbox.put_nowait(frames)
+
+    # WebSocket
+
+    async def _handle_stream(self, stream) -> None:
+        url = urlsplit(stream.request.path)
+        parts = [part for part in url.path.split('/') if part]
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        conversation = self.conversations.get(parts[3]) if len(parts) == 5 and parts[4] == 'stream' else None
+        if conversation is None or query.get('t') != conversation.token:
+            await stream.close(code=1008, reason='Unknown conversation or invalid token')
+            return
+
+        # One outbox per stream keeps the frames of consecutive activity sets from interleaving.
+        outbox: asyncio.Queue = asyncio.Queue()
+        watermark = query.get('watermark', '')
+        if watermark.lstrip('-').isdigit():
+            missed = conversation.activities[int(watermark) + 1:]
+            if missed:
+                outbox.put_nowait(self._frames(conversation, missed))
+        conversation.streams[stream] = outbox
+        closed = asyncio.ensure_future(stream.wait_closed())
+        try:
+            while True:
+                pending = asyncio.ensure_future(outbox.get())
+                await asyncio.wait({pending, closed}, return_when=asyncio.FIRST_COMPLETED)
+                if not pending.done():
+                    pending.cancel()
+                    return
+                for frame in pending.result():
+                    await stream.send(frame)
+        except websockets.ConnectionClosed:
+            return
+        finally:
+            closed.cancel()
+            conversation.streams.pop(stream, None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Run a local Direct Line emulator with an echo bot.')
+    parser.add_argument('--port', type=int, default=3978, help='HTTP port.')
+    parser.add_argument('--ws-port', type=int, default=3979, help='WebSocket port.')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds before each bot reply.')
+    parser.add_argument('--fragment-size', type=int, default=None, help='Split activity sets into messages.')
+    parser.add_argument('--typing', action='store_true', help='Send a typing activity before replies.')
+    args = parser.parse_args()
+
+    emulator = DirectLineEmulator(response_delay=args.delay, fragment_size=args.fragment_size, typing=args.typing,
+                                  port=args.port, ws_port=args.ws_port)
+    emulator.start()
+    print(f"Token endpoint: {emulator.token_endpoint}\nDirect Line base URL: {emulator.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        emulator.stop()
+
+
+if __name__ == "__main__":
+    main()
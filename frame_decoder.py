@@ -0,0 +1,113 @@
+import json
+import logging
+import re
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Structural characters outside of a JSON string: containers open/close, strings start.
+_STRUCTURAL = re.compile(r'[{}\[\]"]')
+# The remainder of a JSON string body up to (not including) its closing quote or a trailing backslash.
+_STRING_BODY = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+
+
+class ActivityStreamDecoder:
+    """
+    Incrementally decode Direct Line activity sets from WebSocket frames.
+
+    Every frame is scanned exactly once (with C-level regex searches that skip over string bodies),
+    so a document split over many frames costs one join and one ``json.loads`` instead of a re-parse
+    of the whole buffer after every frame. Several documents in one frame are emitted in order.
+
+    Attributes:
+        loads (Callable[[str], Any]): The function used to parse a complete document.
+    """
+
+    def __init__(self, loads: Callable[[str], Any] = json.loads):
+        """
+        Initialize the decoder.
+
+        Args:
+            loads (Callable[[str], Any]): The function used to parse a complete document.
+        """
+        self.loads = loads
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Drop any partially received document.
+        """
+        self._parts: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._pending_escape = False
+
+    @property
+    def pending(self) -> bool:
+        """Whether a document has been started but not yet completed."""
+        return bool(self._parts)
+
+    def feed(self, frame: str) -> List[Dict[str, Any]]:
+        """
+        Consume one WebSocket frame.
+
+        Args:
+            frame (str): The raw frame text. Empty keep-alive frames are allowed.
+
+        Returns:
+            List[Dict[str, Any]]: The documents completed by this frame, in arrival order.
+        """
+        documents = []
+        length = len(frame)
+        start = 0 if self._parts else None
+        pos = 0
+
+        if self._pending_escape and length:
+            # The previous frame ended on a backslash inside a string; skip the escaped character.
+            self._pending_escape = False
+            pos = 1
+
+        while pos < length:
+            if self._in_string:
+                end = _STRING_BODY.match(frame, pos).end()
+                if end == length:
+                    break
+                if frame[end] == '\\':
+                    # Only a backslash at the very end of the frame is left unmatched.
+                    self._pending_escape = True
+                    break
+                self._in_string = False
+                pos = end + 1
+                continue
+
+            match = _STRUCTURAL.search(frame, pos)
+            if match is None:
+                break
+            char = match.group()
+            pos = match.end()
+            if start is None:
+                if char not in '{[':
+                    continue  # Ignore anything outside of a document.
+                start = match.start()
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(frame[start:pos])
+                    self._emit(documents)
+                    start = None
+
+        if start is not None:
+            self._parts.append(frame[start:])
+        return documents
+
+    def _emit(self, documents: List[Dict[str, Any]]) -> None:
+        text = ''.join(self._parts)
+        self._parts = []
+        try:
+            documents.append(self.loads(text))
+        except ValueError as e:
+            logger.warning(f"Dropping malformed activity set: {e}")
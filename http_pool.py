@@ -0,0 +1,96 @@
+import logging
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_POOL_CONNECTIONS = 10  # Number of per-host pools kept alive
+DEFAULT_POOL_MAXSIZE = 50  # Keep-alive connections per host
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_settings = {
+    'pool_connections': DEFAULT_POOL_CONNECTIONS,
+    'pool_maxsize': DEFAULT_POOL_MAXSIZE,
+    'pool_block': False,
+    'host_limits': {},
+}
+
+
+def _mount_adapters(session: requests.Session) -> None:
+    # New adapters are mounted before stale ones are removed, so concurrent requests always find one.
+    old = dict(session.adapters)
+    adapter = HTTPAdapter(pool_connections=_settings['pool_connections'], pool_maxsize=_settings['pool_maxsize'],
+                          pool_block=_settings['pool_block'])
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    for prefix, limit in _settings['host_limits'].items():
+        # requests picks the adapter with the longest matching prefix, so these win over the defaults.
+        session.mount(prefix, HTTPAdapter(pool_connections=1, pool_maxsize=limit, pool_block=True))
+    for prefix in old.keys() - {'https://', 'http://'} - _settings['host_limits'].keys():
+        del session.adapters[prefix]
+    for old_adapter in {id(adapter): adapter for adapter in old.values()}.values():
+        old_adapter.close()
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    _mount_adapters(session)
+    return session
+
+
+def configure_pool(pool_connections: int = DEFAULT_POOL_CONNECTIONS, pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                   pool_block: bool = False, host_limits: Optional[Dict[str, int]] = None) -> None:
+    """
+    Configure the process-wide HTTP connection pool shared by all bot clients.
+
+    An existing shared session is reconfigured in place, so clients already holding it use the new
+    pools on their next request. The connections of the old pools are closed.
+
+    Args:
+        pool_connections (int): The number of distinct hosts to keep connection pools for.
+        pool_maxsize (int): The maximum number of keep-alive connections per host.
+        pool_block (bool): Whether to wait for a free connection instead of opening an extra, unpooled one.
+        host_limits (Dict[str, int]): Hard per-host connection limits keyed by URL prefix,
+            e.g. ``{'https://directline.botframework.com': 100}``.
+    """
+    with _lock:
+        _settings.update(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block,
+                         host_limits=dict(host_limits or {}))
+        if _session is not None:
+            _mount_adapters(_session)
+    logger.info(f"HTTP pool configured: {pool_maxsize} connections per host across {pool_connections} hosts.")
+
+
+def get_session() -> requests.Session:
+    """
+    Get the process-wide pooled HTTP session, creating it on first use.
+
+    Returns:
+        requests.Session: The shared session with keep-alive connection pools.
+    """
+    global _session
+    session = _session
+    if session is None:
+        with _lock:
+            if _session is None:
+                _session = _build_session()
+            session = _session
+    return session
+
+
+def close_pool() -> None:
+    """
+    Close all pooled connections. A new pool is created on the next ``get_session()`` call.
+
+    Clients still holding the old session keep working; it opens new connections as needed.
+    """
+    global _session
+    with _lock:
+        old, _session = _session, None
+    if old is not None:
+        old.close()
@@ -0,0 +1,315 @@
+import bisect
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# Metric names recorded by the bot clients
+CONNECT_TOKEN = 'connect.token'
+CONNECT_CONVERSATION = 'connect.conversation'
+CONNECT_WEBSOCKET = 'connect.websocket'
+CONNECT_RESUME = 'connect.resume'
+SEND_ACK = 'send.ack'
+THROTTLE_WAIT = 'throttle.wait'  # Time held back by rate limiting or service throttling
+TURN_FIRST_ACTIVITY = 'turn.first_activity'
+TURN_COMPLETE = 'turn.complete'
+
+# Histogram resolution: bucket bounds grow by 2% so any percentile is within 2% of the true value.
+_MIN_VALUE = 1e-6  # Seconds; smaller durations share the lowest bucket
+_GROWTH = 1.02
+_LOG_GROWTH = math.log(_GROWTH)
+
+
+class LatencyHistogram:
+    """
+    A mergeable, log-bucketed histogram of durations in seconds.
+
+    Buckets are sparse and their bounds grow geometrically, so memory stays small for any range
+    of values while percentiles keep a bounded relative error. Histograms from different
+    conversations, threads or processes are combined with ``merge()``.
+
+    Attributes:
+        count (int): The number of recorded values.
+        total (float): The sum of recorded values.
+        min (float): The smallest recorded value.
+        max (float): The largest recorded value.
+    """
+
+    __slots__ = ('buckets', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    @staticmethod
+    def _index(value: float) -> int:
+        return int(math.log(max(value, _MIN_VALUE) / _MIN_VALUE) / _LOG_GROWTH)
+
+    def record(self, seconds: float) -> None:
+        """
+        Record one duration.
+
+        Args:
+            seconds (float): The duration in seconds.
+        """
+        index = self._index(seconds)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        """
+        Add the values of another histogram to this one.
+
+        Args:
+            other (LatencyHistogram): The histogram to merge in.
+        """
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def difference(self, earlier: 'LatencyHistogram') -> 'LatencyHistogram':
+        """
+        The values recorded since an earlier copy of this histogram was taken.
+
+        Args:
+            earlier (LatencyHistogram): A copy of this histogram from before.
+
+        Returns:
+            LatencyHistogram: The newer values, with min and max estimated from their buckets.
+        """
+        histogram = LatencyHistogram()
+        for index, count in self.buckets.items():
+            count -= earlier.buckets.get(index, 0)
+            if count > 0:
+                histogram.buckets[index] = count
+        if histogram.buckets:
+            histogram.count = self.count - earlier.count
+            histogram.total = self.total - earlier.total
+            histogram.min = max(self.min, _MIN_VALUE * _GROWTH ** min(histogram.buckets))
+            histogram.max = min(self.max, _MIN_VALUE * _GROWTH ** (max(histogram.buckets) + 1))
+        return histogram
+
+    def percentile(self, percent: float) -> float:
+        """
+        Estimate a percentile.
+
+        Args:
+            percent (float): The percentile between 0 and 100.
+
+        Returns:
+            float: The estimated duration in seconds, or 0.0 if the histogram is empty.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                # Report the bucket midpoint, clamped to the exact extremes.
+                value = _MIN_VALUE * _GROWTH ** (index + 0.5)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def cumulative_counts(self, bounds: List[float]) -> List[int]:
+        """
+        Count the values at or below each bound, as in a Prometheus histogram.
+
+        Each log bucket is counted at its midpoint, so the counts are exact to within the 2% bucket
+        resolution.
+
+        Args:
+            bounds (List[float]): Upper bounds in seconds, in increasing order.
+
+        Returns:
+            List[int]: The number of values at or below each bound.
+        """
+        counts = [0] * len(bounds)
+        for index, count in self.buckets.items():
+            value = min(max(_MIN_VALUE * _GROWTH ** (index + 0.5), self.min), self.max)
+            position = bisect.bisect_left(bounds, value)
+            if position < len(bounds):
+                counts[position] += count
+        return list(itertools.accumulate(counts))
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Summarize the histogram.
+
+        Returns:
+            Dict[str, float]: The count, mean, p50, p90, p99 and max in seconds.
+        """
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the histogram to plain JSON-compatible data."""
+        return {'buckets': {str(k): v for k, v in self.buckets.items()}, 'count': self.count,
+                'total': self.total, 'min': self.min if self.count else None, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LatencyHistogram':
+        """Rebuild a histogram serialized by ``to_dict()``."""
+        histogram = cls()
+        histogram.buckets = {int(k): v for k, v in data['buckets'].items()}
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = math.inf if data['min'] is None else data['min']
+        histogram.max = data['max']
+        return histogram
+
+
+class LatencyRecorder:
+    """
+    A thread-safe set of named latency histograms.
+
+    A recorder can forward every value to a parent, which is how per-conversation timings are
+    also aggregated into the process-wide ``PROCESS_LATENCY`` recorder.
+
+    Attributes:
+        histograms (Dict[str, LatencyHistogram]): The histograms by metric name.
+        parent (LatencyRecorder): The recorder that also receives every value, if any.
+    """
+
+    def __init__(self, parent: Optional['LatencyRecorder'] = None):
+        """
+        Initialize the LatencyRecorder.
+
+        Args:
+            parent (LatencyRecorder): The recorder that also receives every value, if any.
+        """
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.parent = parent
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Record one duration under a metric name.
+
+        Args:
+            name (str): The metric name, e.g. ``latency.SEND_ACK``.
+            seconds (float): The duration in seconds.
+        """
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.record(seconds)
+        if self.parent is not None:
+            self.parent.record(name, seconds)
+
+    @contextmanager
+    def time(self, name: str) -> Iterator[None]:
+        """
+        Record the duration of a ``with`` block. Nothing is recorded if the block raises.
+
+        Args:
+            name (str): The metric name.
+        """
+        start = time.perf_counter()
+        yield
+        self.record(name, time.perf_counter() - start)
+
+    def merge(self, other: 'LatencyRecorder') -> None:
+        """
+        Add all histograms of another recorder to this one (without forwarding to the parent).
+
+        Args:
+            other (LatencyRecorder): The recorder to merge in.
+        """
+        with other._lock:
+            items = [(name, histogram.to_dict()) for name, histogram in other.histograms.items()]
+        with self._lock:
+            for name, data in items:
+                self.histograms.setdefault(name, LatencyHistogram()).merge(LatencyHistogram.from_dict(data))
+
+    def difference(self, earlier: 'LatencyRecorder') -> 'LatencyRecorder':
+        """
+        The values recorded since an earlier snapshot of this recorder.
+
+        Args:
+            earlier (LatencyRecorder): A snapshot taken with ``LatencyRecorder.from_dict(recorder.to_dict())``.
+
+        Returns:
+            LatencyRecorder: The newer values by metric name, without metrics that got none.
+        """
+        recorder = LatencyRecorder()
+        for name, histogram in LatencyRecorder.from_dict(self.to_dict()).histograms.items():
+            newer = histogram.difference(earlier.histograms.get(name, LatencyHistogram()))
+            if newer.count:
+                recorder.histograms[name] = newer
+        return recorder
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarize every metric.
+
+        Returns:
+            Dict[str, Dict[str, float]]: The histogram summaries by metric name.
+        """
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize all histograms to plain JSON-compatible data."""
+        with self._lock:
+            return {name: histogram.to_dict() for name, histogram in self.histograms.items()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LatencyRecorder':
+        """Rebuild a recorder serialized by ``to_dict()``."""
+        recorder = cls()
+        recorder.histograms = {name: LatencyHistogram.from_dict(h) for name, h in data.items()}
+        return recorder
+
+    def format(self) -> str:
+        """Render the summary as a table in milliseconds."""
+        lines = [f"{'metric':<22} {'count':>7} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}"]
+        for name, s in self.summary().items():
+            lines.append(f"{name:<22} {s['count']:>7} {s['p50'] * 1000:>7.1f}ms {s['p90'] * 1000:>7.1f}ms "
+                         f"{s['p99'] * 1000:>7.1f}ms {s['max'] * 1000:>7.1f}ms")
+        return '\n'.join(lines)
+
+
+def record_turn(recorder: LatencyRecorder, sent_at: float, first_reply_at: float,
+                last_reply_at: float) -> Dict[str, float]:
+    """
+    Record the send-to-first-reply and send-to-turn-complete latencies of one turn.
+
+    The turn is timed to its last bot message; any quiet period spent detecting the end of the
+    turn is not bot latency and is excluded.
+
+    Args:
+        recorder (LatencyRecorder): The recorder of the conversation.
+        sent_at (float): The monotonic time the user message was sent.
+        first_reply_at (float): The monotonic arrival time of the first bot message.
+        last_reply_at (float): The monotonic arrival time of the last bot message.
+
+    Returns:
+        Dict[str, float]: The recorded durations by metric name.
+    """
+    timings = {TURN_FIRST_ACTIVITY: first_reply_at - sent_at, TURN_COMPLETE: last_reply_at - sent_at}
+    for name, seconds in timings.items():
+        recorder.record(name, seconds)
+    return timings
+
+
+# Aggregate of every bot client's timings in this process.
+PROCESS_LATENCY = LatencyRecorder()
@@ -0,0 +1,251 @@
+import json
+import logging
+import os
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from latency import PROCESS_LATENCY, LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_BASELINE_FILE = '.latency_baselines.json'
+DEFAULT_TOLERANCE = 0.2  # Allowed relative slowdown over the baseline median
+DEFAULT_HISTORY = 10  # Runs kept per test and metric
+DEFAULT_MIN_RUNS = 3  # Runs needed before a test is compared with its baseline
+NOISE_SIGMAS = 3.0  # Regressions must also exceed the run-to-run noise by this many deviations
+MAD_TO_SIGMA = 1.4826  # Scales a median absolute deviation to a standard deviation for normal data
+PERCENTILES = {'p50': 50, 'p95': 95}
+MARKER = 'latency_baseline'
+CONNECT_PREFIX = 'connect.'  # Metrics of opening a conversation, which pooled suites do in the background
+
+_LATENCY_KEY = pytest.StashKey[LatencyRecorder]()
+_SNAPSHOT_KEY = pytest.StashKey[LatencyRecorder]()
+
+
+class LatencyRegressionWarning(pytest.PytestWarning):
+    """Warns about a test whose latency regressed past the tolerance."""
+
+
+def run_statistics(recorder: LatencyRecorder) -> Dict[str, Dict[str, float]]:
+    """
+    Reduce a test run's timings to the statistics stored in the baseline.
+
+    Args:
+        recorder (LatencyRecorder): The timings of one test in one run.
+
+    Returns:
+        Dict[str, Dict[str, float]]: The sample count and percentiles by metric name.
+    """
+    stats = {}
+    for name, histogram in recorder.histograms.items():
+        if histogram.count:
+            stats[name] = {'count': histogram.count,
+                           **{key: histogram.percentile(percent) for key, percent in PERCENTILES.items()}}
+    return stats
+
+
+def regression_limit(history: List[float], tolerance: float) -> float:
+    """
+    The largest value of a statistic that is not a regression over its past runs.
+
+    The limit is the median of the past runs raised by ``tolerance``, and never below the median
+    plus ``NOISE_SIGMAS`` robust standard deviations, so a test whose latency varies a lot between
+    runs is not failed by its ordinary noise.
+
+    Args:
+        history (List[float]): The statistic in past runs.
+        tolerance (float): The allowed relative slowdown.
+
+    Returns:
+        float: The limit.
+    """
+    median = statistics.median(history)
+    spread = MAD_TO_SIGMA * statistics.median(abs(value - median) for value in history)
+    return max(median * (1 + tolerance), median + NOISE_SIGMAS * spread)
+
+
+class LatencyBaselines:
+    """
+    Past latency statistics by test and metric, kept in a JSON file.
+
+    Each test keeps the ``p50``/``p95`` of every metric over its last ``history`` runs. A run is
+    compared against the distribution of those runs, not against a single earlier sample.
+
+    Attributes:
+        path (str): The baseline file.
+        tolerance (float): The allowed relative slowdown over the baseline median.
+        history (int): The number of runs kept per test and metric.
+        min_runs (int): The number of runs needed before a test is compared.
+        runs (Dict[str, Dict[str, List[Dict[str, float]]]]): The stored runs by test id and metric.
+    """
+
+    def __init__(self, path: str = DEFAULT_BASELINE_FILE, tolerance: float = DEFAULT_TOLERANCE,
+                 history: int = DEFAULT_HISTORY, min_runs: int = DEFAULT_MIN_RUNS):
+        """
+        Initialize the LatencyBaselines, loading the file if it exists.
+
+        Args:
+            path (str): The baseline file.
+            tolerance (float): The allowed relative slowdown over the baseline median.
+            history (int): The number of runs kept per test and metric.
+            min_runs (int): The number of runs needed before a test is compared.
+        """
+        self.path = path
+        self.tolerance = tolerance
+        self.history = history
+        self.min_runs = min_runs
+        self.runs: Dict[str, Dict[str, List[Dict[str, float]]]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self.runs = json.load(f).get('runs', {})
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable latency baseline file {path}: {e}")
+
+    def compare(self, test_id: str, stats: Dict[str, Dict[str, float]]) -> List[str]:
+        """
+        Compare one run of a test with its baseline.
+
+        Args:
+            test_id (str): The test's node id.
+            stats (Dict[str, Dict[str, float]]): The run's statistics, from ``run_statistics()``.
+
+        Returns:
+            List[str]: A description of each regressed statistic; empty if nothing regressed.
+        """
+        regressions = []
+        for name, current in sorted(stats.items()):
+            past = self.runs.get(test_id, {}).get(name, [])
+            if len(past) < self.min_runs:
+                continue
+            for key in PERCENTILES:
+                limit = regression_limit([run[key] for run in past], self.tolerance)
+                if current[key] > limit:
+                    baseline = statistics.median(run[key] for run in past)
+                    regressions.append(f"{name} {key} {current[key] * 1000:.1f}ms > limit {limit * 1000:.1f}ms "
+                                       f"(baseline {baseline * 1000:.1f}ms over {len(past)} runs)")
+        return regressions
+
+    def add(self, test_id: str, stats: Dict[str, Dict[str, float]]) -> None:
+        """
+        Store one run of a test, dropping its oldest runs beyond ``history``.
+
+        Args:
+            test_id (str): The test's node id.
+            stats (Dict[str, Dict[str, float]]): The run's statistics, from ``run_statistics()``.
+        """
+        metrics = self.runs.setdefault(test_id, {})
+        for name, current in stats.items():
+            metrics[name] = (metrics.get(name, []) + [dict(current, time=time.time())])[-self.history:]
+
+    def save(self) -> None:
+        """
+        Write the baselines, replacing the file atomically.
+        """
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'runs': self.runs}, f, indent=1, sort_keys=True)
+        os.replace(temporary, self.path)
+
+
+def pytest_addoption(parser) -> None:
+    group = parser.getgroup('latency-baseline', 'latency regression checks against stored baselines')
+    group.addoption('--latency-baseline-file', default=DEFAULT_BASELINE_FILE,
+                    help=f'file storing past latencies (default: {DEFAULT_BASELINE_FILE})')
+    group.addoption('--latency-tolerance', type=float, default=DEFAULT_TOLERANCE,
+                    help=f'allowed relative slowdown of p50/p95 (default: {DEFAULT_TOLERANCE})')
+    group.addoption('--latency-history', type=int, default=DEFAULT_HISTORY,
+                    help=f'runs kept per test and metric (default: {DEFAULT_HISTORY})')
+    group.addoption('--latency-min-runs', type=int, default=DEFAULT_MIN_RUNS,
+                    help=f'runs needed before a test is compared (default: {DEFAULT_MIN_RUNS})')
+    group.addoption('--latency-regression', choices=('fail', 'warn', 'off'), default='fail',
+                    help='what a latency regression does to the test; regressed runs are only stored as '
+                         'baseline with off (default: fail)')
+    group.addoption('--latency-no-update', action='store_true',
+                    help='compare with the baselines without storing this run')
+
+
+def pytest_configure(config) -> None:
+    config.addinivalue_line('markers', f'{MARKER}(pooled=False): compare the latencies recorded by the test with '
+                                       f'stored baselines; pooled=True leaves out background {CONNECT_PREFIX}* timings')
+    config._latency_baselines = LatencyBaselines(config.getoption('latency_baseline_file'),
+                                                 config.getoption('latency_tolerance'),
+                                                 config.getoption('latency_history'),
+                                                 config.getoption('latency_min_runs'))
+    config._latency_regressions = {}
+
+
+@pytest.fixture
+def latency_baseline(request) -> LatencyRecorder:
+    """
+    Fixture for the timings a test compares with its baseline.
+
+    By default a marked test is measured by everything the bot clients of the process record while
+    it runs. A test that merges timings into this recorder, e.g. a scenario's ``result.latency``, is
+    measured by those instead.
+    """
+    recorder = LatencyRecorder()
+    request.node.stash[_LATENCY_KEY] = recorder
+    return recorder
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    if item.get_closest_marker(MARKER) is not None:
+        item.stash[_SNAPSHOT_KEY] = LatencyRecorder.from_dict(PROCESS_LATENCY.to_dict())
+    yield
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    outcome = yield
+    report = outcome.get_result()
+    if call.when != 'call' or not report.passed or _SNAPSHOT_KEY not in item.stash:
+        return
+    recorder: Optional[LatencyRecorder] = item.stash.get(_LATENCY_KEY, None)
+    if recorder is None or not recorder.histograms:
+        recorder = PROCESS_LATENCY.difference(item.stash[_SNAPSHOT_KEY])
+        if item.get_closest_marker(MARKER).kwargs.get('pooled', False):
+            # A pool opens conversations in the background, so their connects land in whichever test runs.
+            recorder.histograms = {name: histogram for name, histogram in recorder.histograms.items()
+                                   if not name.startswith(CONNECT_PREFIX)}
+    stats = run_statistics(recorder)
+    if not stats:
+        return
+    config = item.config
+    baselines: LatencyBaselines = config._latency_baselines
+    mode = config.getoption('latency_regression')
+    regressions = baselines.compare(item.nodeid, stats) if mode != 'off' else []
+    # A regressed run would drag the baseline towards itself; only --latency-regression=off stores one.
+    if not regressions and not config.getoption('latency_no_update'):
+        baselines.add(item.nodeid, stats)
+    if not regressions:
+        return
+    config._latency_regressions[item.nodeid] = regressions
+    message = 'Latency regressed:\n' + '\n'.join(f'  {regression}' for regression in regressions)
+    if mode == 'fail':
+        report.outcome = 'failed'
+        report.longrepr = message
+    else:
+        item.warn(LatencyRegressionWarning(message))
+
+
+def pytest_sessionfinish(session) -> None:
+    config = session.config
+    if not config.getoption('latency_no_update') and config._latency_baselines.runs:
+        config._latency_baselines.save()
+
+
+def pytest_terminal_summary(terminalreporter, config) -> None:
+    regressions: Dict[str, Any] = config._latency_regressions
+    if not regressions:
+        return
+    terminalreporter.section('latency regressions')
+    for test_id, lines in regressions.items():
+        terminalreporter.line(test_id)
+        for line in lines:
+            terminalreporter.line(f'  {line}')
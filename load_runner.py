@@ -0,0 +1,296 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from async_chat_client import AsyncBotClient
+from copilot_chat_client import DIRECT_LINE_BASE_URL
+from http_pool import configure_pool
+from latency import LatencyRecorder
+from metrics import MetricsServer
+from turn_tracker import DEFAULT_QUIET_PERIOD
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_THINK_TIME = 1.0  # Seconds a virtual user waits between turns
+NO_REPLY = 'NoReply'  # Error name for a turn the bot did not answer within the timeout
+THREADS_PER_WORKER = 64  # Threads for the short blocking HTTP calls of one worker's event loop
+
+
+class LoadProfile:
+    """
+    A ramp-up, steady, ramp-down load profile for a number of virtual users.
+
+    Users start evenly spread over the ramp-up, all of them run during the steady phase, and they
+    stop evenly spread over the ramp-down in reverse order of starting.
+
+    Attributes:
+        users (int): The target number of concurrent virtual users.
+        ramp_up (float): Seconds to go from zero to ``users`` users.
+        steady (float): Seconds to hold ``users`` users.
+        ramp_down (float): Seconds to go from ``users`` users back to zero.
+    """
+
+    def __init__(self, users: int, ramp_up: float = 0.0, steady: float = 60.0, ramp_down: float = 0.0):
+        """
+        Initialize the LoadProfile.
+
+        Args:
+            users (int): The target number of concurrent virtual users.
+            ramp_up (float): Seconds to go from zero to ``users`` users.
+            steady (float): Seconds to hold ``users`` users.
+            ramp_down (float): Seconds to go from ``users`` users back to zero.
+
+        Raises:
+            ValueError: If there are no users or a phase has a negative duration.
+        """
+        if users < 1:
+            raise ValueError('A load profile needs at least one user')
+        if min(ramp_up, steady, ramp_down) < 0:
+            raise ValueError('Load profile phases cannot be negative')
+        self.users = users
+        self.ramp_up = ramp_up
+        self.steady = steady
+        self.ramp_down = ramp_down
+
+    @property
+    def duration(self) -> float:
+        """The total length of the profile in seconds."""
+        return self.ramp_up + self.steady + self.ramp_down
+
+    def start_offset(self, user: int) -> float:
+        """Seconds after the start of the run at which virtual user ``user`` (0-based) starts."""
+        return self.ramp_up * user / self.users
+
+    def stop_offset(self, user: int) -> float:
+        """Seconds after the start of the run after which virtual user ``user`` starts no new turns."""
+        return self.ramp_up + self.steady + self.ramp_down * (self.users - user) / self.users
+
+    def to_dict(self) -> Dict[str, float]:
+        return {'users': self.users, 'ramp_up': self.ramp_up, 'steady': self.steady, 'ramp_down': self.ramp_down}
+
+
+class LoadResult:
+    """
+    The outcome of a load run, or of one worker's share of it.
+
+    Results of several workers are combined with ``merge()``; they cross process boundaries as
+    ``to_dict()`` data.
+
+    Attributes:
+        latency (LatencyRecorder): The connect and turn latencies of all conversations.
+        conversations (int): Conversations that ran through the whole script.
+        turns (int): Messages sent and answered.
+        errors (Counter): Failures by exception name, plus ``NO_REPLY`` for unanswered turns.
+        elapsed (float): Wall-clock seconds the run took.
+    """
+
+    def __init__(self):
+        self.latency = LatencyRecorder()
+        self.conversations = 0
+        self.turns = 0
+        self.errors: Counter = Counter()
+        self.elapsed = 0.0
+
+    def merge(self, other: 'LoadResult') -> None:
+        """
+        Add another result to this one. The elapsed time is the longer of the two.
+
+        Args:
+            other (LoadResult): The result to merge in.
+        """
+        self.latency.merge(other.latency)
+        self.conversations += other.conversations
+        self.turns += other.turns
+        self.errors.update(other.errors)
+        self.elapsed = max(self.elapsed, other.elapsed)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the result to plain JSON-compatible data."""
+        return {'latency': self.latency.to_dict(), 'conversations': self.conversations, 'turns': self.turns,
+                'errors': dict(self.errors), 'elapsed': self.elapsed}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LoadResult':
+        """Rebuild a result serialized by ``to_dict()``."""
+        result = cls()
+        result.latency = LatencyRecorder.from_dict(data['latency'])
+        result.conversations = data['conversations']
+        result.turns = data['turns']
+        result.errors = Counter(data['errors'])
+        result.elapsed = data['elapsed']
+        return result
+
+    def format(self) -> str:
+        """Render the result as a human-readable report."""
+        rate = self.turns / self.elapsed if self.elapsed else 0.0
+        lines = [f"{self.conversations} conversations, {self.turns} turns in {self.elapsed:.1f}s "
+                 f"({rate:.1f} turns/s), {sum(self.errors.values())} errors"]
+        lines.extend(f"  {name}: {count}" for name, count in self.errors.most_common())
+        lines.append(self.latency.format())
+        return '\n'.join(lines)
+
+
+async def _virtual_user(user: int, profile: LoadProfile, script: List[str], options: Dict[str, Any],
+                        started: float, result: LoadResult, executor: ThreadPoolExecutor) -> None:
+    await asyncio.sleep(max(started + profile.start_offset(user) - time.monotonic(), 0))
+    stop_at = started + profile.stop_offset(user)
+
+    while time.monotonic() < stop_at:
+        bot = AsyncBotClient(options['endpoint'], options['base_url'], executor=executor)
+        try:
+            await bot.connect()
+            for message in script:
+                if time.monotonic() >= stop_at:
+                    break
+                await bot.send(message)
+                if await bot.receive(options['timeout'], options['quiet_period']):
+                    result.turns += 1
+                else:
+                    result.errors[NO_REPLY] += 1
+                await asyncio.sleep(options['think_time'])
+            else:
+                result.conversations += 1
+        except Exception as e:
+            result.errors[type(e).__name__] += 1
+            logger.debug(f"Virtual user {user} failed: {e}")
+            # Back off so a failing deployment is not hammered in a tight loop.
+            await asyncio.sleep(options['think_time'])
+        finally:
+            if bot.ws is not None:
+                try:
+                    await bot.disconnect()
+                except Exception as e:
+                    logger.debug(f"Virtual user {user} failed to disconnect: {e}")
+            result.latency.merge(bot.latency)
+
+
+async def _drive_users(users: List[int], profile: LoadProfile, script: List[str], options: Dict[str, Any],
+                       started_wall: float) -> LoadResult:
+    # Line the worker's monotonic clock up with the shared wall-clock start of the run.
+    started = time.monotonic() - (time.time() - started_wall)
+    result = LoadResult()
+    with ThreadPoolExecutor(max_workers=THREADS_PER_WORKER, thread_name_prefix='load-http') as executor:
+        await asyncio.gather(*(_virtual_user(user, profile, script, options, started, result, executor)
+                               for user in users))
+    result.elapsed = time.monotonic() - started
+    return result
+
+
+def _run_worker(users: List[int], profile: Dict[str, float], script: List[str], options: Dict[str, Any],
+                started_wall: float, metrics_port: Optional[int] = None) -> Dict[str, Any]:
+    """Run one worker's share of the virtual users on its own event loop and return its result data."""
+    configure_pool(pool_maxsize=THREADS_PER_WORKER)
+    server = MetricsServer(metrics_port) if metrics_port is not None else None
+    try:
+        result = asyncio.run(_drive_users(users, LoadProfile(**profile), script, options, started_wall))
+    finally:
+        if server is not None:
+            server.close()
+    return result.to_dict()
+
+
+def run_load(endpoint: str, script: List[str], profile: LoadProfile, workers: Optional[int] = None,
+             base_url: str = DIRECT_LINE_BASE_URL, timeout: float = 20, quiet_period: float = DEFAULT_QUIET_PERIOD,
+             think_time: float = DEFAULT_THINK_TIME, metrics_port: Optional[int] = None) -> LoadResult:
+    """
+    Run a conversation script with many concurrent virtual users spread across worker processes.
+
+    Every virtual user repeatedly opens a conversation, sends the script's messages with
+    ``think_time`` between turns and closes the conversation, following ``profile``. Users are
+    dealt round-robin to the workers; each worker drives its users on one asyncio event loop with
+    ``AsyncBotClient``. Worker results are merged into one report.
+
+    Args:
+        endpoint (str): The endpoint URL to obtain the bot token.
+        script (List[str]): The user messages of one conversation, in order.
+        profile (LoadProfile): The number of virtual users and the ramp and steady durations.
+        workers (int): The number of worker processes. Defaults to the number of CPU cores.
+        base_url (str): The Direct Line API base URL.
+        timeout (float): The per-turn receive timeout in seconds.
+        quiet_period (float): Seconds of silence after a bot reply that end a turn.
+        think_time (float): Seconds a virtual user waits between turns.
+        metrics_port (int): If set, each worker serves live Prometheus metrics on this port plus its
+            index, for the duration of the run.
+
+    Returns:
+        LoadResult: The merged result of all workers.
+
+    Raises:
+        ValueError: If the script is empty.
+    """
+    if not script:
+        raise ValueError('The conversation script has no messages')
+    workers = max(1, min(workers or os.cpu_count() or 1, profile.users))
+    options = {'endpoint': endpoint, 'base_url': base_url, 'timeout': timeout, 'quiet_period': quiet_period,
+               'think_time': think_time}
+    started_wall = time.time()
+    shares = [(list(range(worker, profile.users, workers)), profile.to_dict(), script, options, started_wall,
+               metrics_port + worker if metrics_port is not None else None)
+              for worker in range(workers)]
+    logger.info(f"Running {profile.users} virtual users on {workers} workers for {profile.duration:.0f}s.")
+
+    # Spawned rather than forked workers: the parent may hold threads and open sockets.
+    with multiprocessing.get_context('spawn').Pool(workers) as pool:
+        results = pool.starmap(_run_worker, shares)
+
+    merged = LoadResult()
+    for data in results:
+        merged.merge(LoadResult.from_dict(data))
+    return merged
+
+
+def load_script(path: str) -> List[str]:
+    """
+    Load a conversation script: a JSON list of messages, or an object with a ``messages`` list.
+
+    Args:
+        path (str): The script file.
+
+    Returns:
+        List[str]: The user messages, in order.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return data['messages'] if isinstance(data, dict) else data
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Run a conversation script with many concurrent virtual users.')
+    parser.add_argument('endpoint', help='Token endpoint URL.')
+    parser.add_argument('script', help='JSON file with the messages of one conversation.')
+    parser.add_argument('--users', type=int, required=True, help='Target number of concurrent virtual users.')
+    parser.add_argument('--ramp-up', type=float, default=0.0, help='Seconds to reach the target users.')
+    parser.add_argument('--steady', type=float, default=60.0, help='Seconds to hold the target users.')
+    parser.add_argument('--ramp-down', type=float, default=0.0, help='Seconds to stop all users.')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU cores).')
+    parser.add_argument('--base-url', default=DIRECT_LINE_BASE_URL, help='Direct Line API base URL.')
+    parser.add_argument('--timeout', type=float, default=20, help='Per-turn receive timeout in seconds.')
+    parser.add_argument('--quiet-period', type=float, default=DEFAULT_QUIET_PERIOD,
+                        help='Seconds of silence that end a turn.')
+    parser.add_argument('--think-time', type=float, default=DEFAULT_THINK_TIME, help='Seconds between turns.')
+    parser.add_argument('--json', dest='json_path', help='Also write the merged result to this JSON file.')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='Serve live Prometheus metrics from worker N on this port plus N.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    profile = LoadProfile(args.users, args.ramp_up, args.steady, args.ramp_down)
+    result = run_load(args.endpoint, load_script(args.script), profile, workers=args.workers,
+                      base_url=args.base_url, timeout=args.timeout, quiet_period=args.quiet_period,
+                      think_time=args.think_time, metrics_port=args.metrics_port)
+    print(result.format())
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'profile': profile.to_dict(), **result.to_dict()}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import json
+import logging
+import re
+import zlib
+
+import numpy as np
+
+from deferred_assertions import SemanticAssertionError
+
+logger = logging.getLogger(__name__)
+
+# Constants
+NGRAM_SIZE = 3
+HASH_DIMENSIONS = 1 << 16
+DEFAULT_PASS_ABOVE = 0.95  # Lexically this close always passes
+DEFAULT_FAIL_BELOW = 0.05  # Lexically this far apart always fails
+
+_WHITESPACE = re.compile(r'\s+')
+_WORD = re.compile(r'\w+')
+# Powers of a small prime used to hash character n-grams in one vectorized pass.
+_NGRAM_WEIGHTS = np.array([257 ** i for i in reversed(range(NGRAM_SIZE))], dtype=np.int64)
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(' ', text).strip().lower()
+
+
+def _char_ngram_counts(text: str) -> np.ndarray:
+    codes = np.frombuffer(text.encode('utf-8'), dtype=np.uint8).astype(np.int64)
+    if codes.size < NGRAM_SIZE:
+        codes = np.pad(codes, (0, NGRAM_SIZE - codes.size))
+    windows = np.lib.stride_tricks.sliding_window_view(codes, NGRAM_SIZE)
+    return np.bincount((windows @ _NGRAM_WEIGHTS) % HASH_DIMENSIONS, minlength=HASH_DIMENSIONS)
+
+
+def _word_counts(text: str) -> np.ndarray:
+    hashes = [zlib.crc32(word.encode('utf-8')) % HASH_DIMENSIONS for word in _WORD.findall(text)]
+    return np.bincount(np.array(hashes, dtype=np.int64), minlength=HASH_DIMENSIONS)
+
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> float:
+    norm = np.sqrt(float(a @ a) * float(b @ b))
+    return float(a @ b) / norm if norm else 0.0
+
+
+def lexical_similarity(expected: str, actual: str) -> float:
+    """
+    Compute an offline lexical similarity between two texts.
+
+    The score is the mean of the cosine similarity of hashed character trigram counts (robust to
+    inflection and typos) and of hashed word counts (robust to reordering). Identical texts after
+    whitespace and case normalization score exactly 1.0.
+
+    Args:
+        expected (str): The expected text.
+        actual (str): The actual text.
+
+    Returns:
+        float: A similarity between 0.0 and 1.0.
+    """
+    expected, actual = _normalize(expected), _normalize(actual)
+    if expected == actual:
+        return 1.0
+    if not expected or not actual:
+        return 0.0
+    char_score = _cosine(_char_ngram_counts(expected), _char_ngram_counts(actual))
+    word_score = _cosine(_word_counts(expected), _word_counts(actual))
+    return (char_score + word_score) / 2
+
+
+class TieredSimilarityEvaluator:
+    """
+    Decides clear semantic assertions locally and escalates only ambiguous ones to the LLM judge.
+
+    Pairs whose lexical similarity is at least ``pass_above`` (and the assertion threshold) pass,
+    pairs below ``fail_below`` fail, and everything in between is scored by the wrapped
+    ``SemanticSimilarityClient``. Lexical overlap cannot see paraphrases, so keep the fail band narrow.
+
+    Attributes:
+        client (SemanticSimilarityClient): The LLM judge for the uncertain middle band.
+        pass_above (float): Lexical similarity at or above which a pair passes locally.
+        fail_below (float): Lexical similarity below which a pair fails locally.
+        local_passes (int): Assertions passed without calling the judge.
+        local_fails (int): Assertions failed without calling the judge.
+        remote_calls (int): Assertions escalated to the judge.
+    """
+
+    def __init__(self, client, pass_above: float = DEFAULT_PASS_ABOVE, fail_below: float = DEFAULT_FAIL_BELOW):
+        """
+        Initialize the TieredSimilarityEvaluator.
+
+        Args:
+            client (SemanticSimilarityClient): The LLM judge for the uncertain middle band.
+            pass_above (float): Lexical similarity at or above which a pair passes locally.
+            fail_below (float): Lexical similarity below which a pair fails locally.
+        """
+        if fail_below > pass_above:
+            raise ValueError('fail_below must not be greater than pass_above')
+        self.client = client
+        self.pass_above = pass_above
+        self.fail_below = fail_below
+        self.local_passes = 0
+        self.local_fails = 0
+        self.remote_calls = 0
+
+    @property
+    def calls_avoided(self) -> int:
+        """The number of judge calls avoided by local decisions."""
+        return self.local_passes + self.local_fails
+
+    def assert_semantically(self, expected: str, actual: str, threshold: float = 0.75) -> float:
+        """
+        Assert that the semantic similarity score is above the threshold.
+
+        Args:
+            expected (str): The expected text.
+            actual (str): The actual text.
+            threshold (float): The minimum similarity score.
+
+        Returns:
+            float: The local lexical score for local decisions, otherwise the judge's score.
+
+        Raises:
+            SemanticAssertionError: If the similarity is below the threshold, with the score it got.
+        """
+        local_score = lexical_similarity(expected, actual)
+        if local_score >= max(self.pass_above, threshold):
+            self.local_passes += 1
+            logger.debug(f"Semantic assertion passed locally with lexical score {local_score:.2f}.")
+            return local_score
+        # A threshold below the fail band lowers it, so nothing the judge could pass fails locally.
+        fail_below = min(self.fail_below, threshold)
+        if local_score < fail_below:
+            self.local_fails += 1
+            raise SemanticAssertionError(f"Semantic similarity too low: lexical score {local_score:.2f} is below "
+                                         f"the local fail band {fail_below:.2f}. Actual: {actual}", local_score)
+
+        self.remote_calls += 1
+        response = json.loads(self.client.get_similarity_score(expected, actual))
+        score = response["score"]
+        if score < threshold:
+            raise SemanticAssertionError(f"Semantic similarity too low: {score:.2f}. Reason: {response['reason']} "
+                                         f"Actual: {actual}", score)
+        return score
+
+    def report(self) -> str:
+        """Summarize how many assertions were decided locally."""
+        total = self.calls_avoided + self.remote_calls
+        return (f"{total} semantic assertions: {self.local_passes} passed locally, {self.local_fails} failed locally, "
+                f"{self.remote_calls} sent to the LLM judge ({self.calls_avoided} calls avoided)")
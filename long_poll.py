@@ -0,0 +1,305 @@
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Set, Tuple
+
+import requests
+import websocket
+
+import metrics
+from activity import ActivitySet, parse_activity_set
+from http_pool import get_session
+from rate_limiter import AdaptiveRateLimiter, retry_after
+from transport import Channel
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_MIN_INTERVAL = 0.1  # Seconds between polls right after a send or a poll that returned activities
+DEFAULT_MAX_INTERVAL = 2.0  # Seconds between polls of an idle conversation
+DEFAULT_BACKOFF_FACTOR = 2.0  # Growth of the interval after each empty poll
+DEFAULT_MAX_CONCURRENCY = 8  # Polls in flight at once, across all conversations
+REQUEST_TIMEOUT = 10.0  # Seconds before a single poll request is abandoned
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})  # Polled again after Retry-After or the maximum interval
+
+_CLOSED = object()  # Queued when a channel is closed
+
+_lock = threading.Lock()
+_poller: Optional['ActivityPoller'] = None
+
+
+class PollingChannel(Channel):
+    """
+    One conversation read with Direct Line's ``GET /conversations/{id}/activities?watermark=``.
+
+    The ``ActivityPoller`` polls the conversation and queues every non-empty activity set here, so
+    the owning client reads it exactly like a WebSocket stream.
+
+    Attributes:
+        url (str): The conversation's activities URL.
+        watermark (str): The watermark the next poll continues from.
+        interval (float): Seconds until the next poll, adapted to the conversation's activity.
+    """
+
+    def __init__(self, poller: 'ActivityPoller', url: str, token: str, watermark: Optional[str] = None):
+        self.url = url
+        self.watermark = watermark
+        self.interval = poller.min_interval
+        self._poller = poller
+        self._headers = {'Authorization': f'Bearer {token}'}
+        self._queue: queue.Queue = queue.Queue()
+        self._closed = False
+        self._due = 0.0  # When the poll the poller has scheduled is due
+        self._in_flight = False
+        self._hurry = False  # Poll again as soon as the poll in flight returns
+
+    @property
+    def connected(self) -> bool:
+        return not self._closed
+
+    def get(self, timeout: Optional[float] = None) -> Tuple[float, str, List[ActivitySet]]:
+        """
+        Wait for the next activity set polled.
+
+        Args:
+            timeout (float): The maximum time to wait in seconds, or None to wait indefinitely.
+
+        Returns:
+            Tuple[float, str, List[ActivitySet]]: The ``time.monotonic()`` arrival time, the
+            response body and the activity set it holds.
+
+        Raises:
+            websocket.WebSocketTimeoutException: If no activities arrived in time.
+            websocket.WebSocketConnectionClosedException: If polling stopped.
+        """
+        try:
+            item = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            raise websocket.WebSocketTimeoutException('No activities within the timeout')
+        if item is _CLOSED:
+            self._queue.put(_CLOSED)
+            raise websocket.WebSocketConnectionClosedException('Polling stopped')
+        return item
+
+    def close(self) -> None:
+        """
+        Stop polling the conversation.
+        """
+        self._poller.unregister(self)
+
+    def sent(self) -> None:
+        """
+        Poll right away and then at the minimum interval, as the bot is about to reply.
+        """
+        self._poller.hurry(self)
+
+
+class ActivityPoller:
+    """
+    Polls many conversations for new activities from a single scheduling thread.
+
+    The fallback for networks that block or break WebSockets. Each conversation is polled with
+    its watermark over the pooled HTTP session, at an interval that drops to ``min_interval``
+    after a send or a poll that returned activities and grows by ``backoff_factor`` with every
+    empty poll, up to ``max_interval``. Polls run on a small thread pool, at most one per
+    conversation at a time. A throttled or unavailable conversation is polled again after the
+    response's ``Retry-After``, or ``max_interval`` without one; with a ``limiter``, polls share
+    its rate and concurrency limits and throttling pauses every client using it. A poll that
+    fails otherwise ends the channel, which the client handles like a dropped stream.
+
+    Attributes:
+        session (requests.Session): The HTTP session polls are sent on.
+        min_interval (float): Seconds between polls of a conversation expecting replies.
+        max_interval (float): Seconds between polls of an idle conversation.
+        backoff_factor (float): Growth of the interval after each empty poll.
+        limiter (AdaptiveRateLimiter): The rate limiter polls go through, if any.
+    """
+
+    def __init__(self, session: requests.Session = None, min_interval: float = DEFAULT_MIN_INTERVAL,
+                 max_interval: float = DEFAULT_MAX_INTERVAL, backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, limiter: AdaptiveRateLimiter = None):
+        """
+        Initialize the ActivityPoller and start its thread.
+
+        Args:
+            session (requests.Session): The HTTP session to use. Defaults to the pooled, process-wide
+                session from ``http_pool``.
+            min_interval (float): Seconds between polls of a conversation expecting replies.
+            max_interval (float): Seconds between polls of an idle conversation.
+            backoff_factor (float): Growth of the interval after each empty poll.
+            max_concurrency (int): Polls in flight at once, across all conversations.
+            limiter (AdaptiveRateLimiter): A rate limiter to share with the clients' sends, so polling
+                backs off together with them; see ``BotClient``.
+        """
+        self.session = session or get_session()
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.limiter = limiter
+        self._condition = threading.Condition()
+        self._schedule: List[Tuple[float, int, PollingChannel]] = []  # Heap of (due, sequence, channel)
+        self._channels: Set[PollingChannel] = set()
+        self._sequence = itertools.count()
+        self._executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix='activity-poll')
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='activity-poller', daemon=True)
+        self._thread.start()
+
+    def register(self, base_url: str, conversation_id: str, token: str,
+                 watermark: Optional[str] = None) -> PollingChannel:
+        """
+        Start polling a conversation.
+
+        Args:
+            base_url (str): The Direct Line API base URL.
+            conversation_id (str): The conversation to poll.
+            token (str): The conversation token.
+            watermark (str): The watermark to continue from, or None for all activities.
+
+        Returns:
+            PollingChannel: The channel to receive the conversation's activity sets from.
+        """
+        channel = PollingChannel(self, f'{base_url}/conversations/{conversation_id}/activities', token, watermark)
+        with self._condition:
+            self._channels.add(channel)
+            self._schedule_poll(channel, time.monotonic())
+        return channel
+
+    def unregister(self, channel: PollingChannel) -> None:
+        """
+        Stop polling a channel's conversation and wake any reader waiting on it.
+
+        Args:
+            channel (PollingChannel): A channel returned by ``register()``.
+        """
+        with self._condition:
+            if channel._closed:
+                return
+            channel._closed = True
+            self._channels.discard(channel)
+        channel._queue.put(_CLOSED)
+
+    def hurry(self, channel: PollingChannel) -> None:
+        """
+        Poll a channel right away and reset its interval to the minimum.
+
+        Args:
+            channel (PollingChannel): A channel returned by ``register()``.
+        """
+        with self._condition:
+            channel.interval = self.min_interval
+            if channel._in_flight:
+                channel._hurry = True
+            elif not channel._closed:
+                self._schedule_poll(channel, time.monotonic())
+
+    def close(self) -> None:
+        """
+        Close every channel and stop polling.
+        """
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            channels = list(self._channels)
+            self._condition.notify()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+        for channel in channels:
+            self.unregister(channel)
+
+    def _schedule_poll(self, channel: PollingChannel, due: float) -> None:
+        # Entries are never removed from the heap; one whose due time is no longer the channel's is skipped.
+        channel._due = due
+        heapq.heappush(self._schedule, (due, next(self._sequence), channel))
+        self._condition.notify()
+
+    def _run(self) -> None:
+        with self._condition:
+            while self._running:
+                if not self._schedule:
+                    self._condition.wait()
+                    continue
+                due, _, channel = self._schedule[0]
+                now = time.monotonic()
+                if due > now:
+                    self._condition.wait(due - now)
+                    continue
+                heapq.heappop(self._schedule)
+                if channel._closed or channel._in_flight or due != channel._due:
+                    continue
+                channel._in_flight = True
+                self._executor.submit(self._poll, channel)
+
+    def _poll(self, channel: PollingChannel) -> None:
+        params = {'watermark': channel.watermark} if channel.watermark is not None else {}
+        metrics.POLLS.inc()
+
+        def send() -> requests.Response:
+            return self.session.get(channel.url, headers=channel._headers, params=params, timeout=REQUEST_TIMEOUT)
+
+        try:
+            response = self.limiter.call(send) if self.limiter is not None else send()
+        except requests.RequestException as e:
+            logger.warning(f"Polling {channel.url} failed: {e}")
+            self._reschedule(channel, None)
+            return
+        received_at = time.monotonic()
+
+        if response.status_code in RETRY_STATUSES:
+            delay = retry_after(response)
+            if delay is None:
+                delay = self.max_interval
+            logger.warning(f"Polling {channel.url} returned {response.status_code}, retrying in {delay:.1f}s.")
+            self._reschedule(channel, delay)
+            return
+        try:
+            response.raise_for_status()
+            text = response.text
+            activity_set = parse_activity_set(text)
+        except (requests.HTTPError, ValueError) as e:
+            logger.warning(f"Polling {channel.url} failed: {e}")
+            self._reschedule(channel, None)
+            return
+
+        if activity_set.watermark is not None:
+            channel.watermark = activity_set.watermark
+        if activity_set.activities:
+            channel._queue.put((received_at, text, [activity_set]))
+            self._reschedule(channel, self.min_interval)
+        else:
+            metrics.EMPTY_POLLS.inc()
+            self._reschedule(channel, min(channel.interval * self.backoff_factor, self.max_interval))
+
+    def _reschedule(self, channel: PollingChannel, interval: Optional[float]) -> None:
+        """Schedule the channel's next poll after ``interval`` seconds, or close it if None."""
+        if interval is None:
+            self.unregister(channel)
+        with self._condition:
+            channel._in_flight = False
+            if channel._closed or not self._running:
+                return
+            if channel._hurry:
+                channel._hurry = False
+                interval = 0.0
+            else:
+                channel.interval = interval
+            self._schedule_poll(channel, time.monotonic() + interval)
+
+
+def get_poller() -> ActivityPoller:
+    """
+    Get the process-wide activity poller, starting it on first use.
+
+    Returns:
+        ActivityPoller: The shared poller.
+    """
+    global _poller
+    with _lock:
+        if _poller is None or not _poller._running:
+            _poller = ActivityPoller()
+        return _poller
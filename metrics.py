@@ -0,0 +1,333 @@
+import bisect
+import logging
+import math
+import threading
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from latency import PROCESS_LATENCY, LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+# Constants
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'  # Prometheus text exposition format
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Sample = Tuple[str, str, float]  # Metric name with suffix, rendered labels, value
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if bound == math.inf else repr(float(bound))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+class Registry:
+    """
+    The metrics to expose, rendered in the Prometheus text format on each scrape.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric) -> None:
+        """
+        Add a metric, i.e. anything with ``name``, ``documentation``, ``type`` and ``samples()``.
+
+        Args:
+            metric: The metric.
+
+        Raises:
+            ValueError: If a metric with the same name is already registered.
+        """
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f'Metric {metric.name} is already registered')
+            self._metrics.append(metric)
+
+    def exposition(self) -> str:
+        """
+        Render all metrics.
+
+        Returns:
+            str: The metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(f'{name}{labels} {_format_value(value)}' for name, labels, value in metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Sharded(ABC):
+    """
+    Per-thread shards of a metric's state.
+
+    Each thread updates only its own shard, without locking; a scrape sums the shards. The lock is
+    taken once per thread, when its shard is created.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[list] = []
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _new_shard(self) -> list:
+        """Create the state of one thread's shard."""
+
+    def _shard(self) -> list:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = self._new_shard()
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _all_shards(self) -> List[list]:
+        with self._lock:
+            return list(self._shards)
+
+
+class Counter(_Sharded):
+    """
+    A monotonically increasing count, e.g. of messages sent.
+
+    Attributes:
+        name (str): The metric name, ending in ``_total``.
+        documentation (str): The help text.
+    """
+
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, registry: Optional[Registry] = REGISTRY):
+        """
+        Initialize the Counter and register it.
+
+        Args:
+            name (str): The metric name, ending in ``_total``.
+            documentation (str): The help text.
+            registry (Registry): The registry to expose it in, if any.
+        """
+        super().__init__()
+        self.name = name
+        self.documentation = documentation
+        if registry is not None:
+            registry.register(self)
+
+    def _new_shard(self) -> list:
+        return [0]
+
+    def inc(self, amount: float = 1) -> None:
+        """
+        Add to the count.
+
+        Args:
+            amount (float): The non-negative amount to add.
+        """
+        self._shard()[0] += amount
+
+    @property
+    def value(self) -> float:
+        """The count over all threads."""
+        return sum(shard[0] for shard in self._all_shards())
+
+    def samples(self) -> Iterator[Sample]:
+        yield self.name, '', self.value
+
+
+class Histogram(_Sharded):
+    """
+    A distribution of observed values, e.g. request durations, in fixed buckets.
+
+    Attributes:
+        name (str): The metric name.
+        documentation (str): The help text.
+        buckets (Tuple[float, ...]): The bucket upper bounds, in increasing order.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+                 registry: Optional[Registry] = REGISTRY):
+        """
+        Initialize the Histogram and register it.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text.
+            buckets (Sequence[float]): The bucket upper bounds, in increasing order.
+            registry (Registry): The registry to expose it in, if any.
+        """
+        super().__init__()
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        if registry is not None:
+            registry.register(self)
+
+    def _new_shard(self) -> list:
+        # A count per bucket plus one for values above the last bound, then the sum of all values.
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value: float) -> None:
+        """
+        Record one value.
+
+        Args:
+            value (float): The value, e.g. seconds.
+        """
+        shard = self._shard()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def samples(self) -> Iterator[Sample]:
+        counts = [0] * (len(self.buckets) + 1)
+        total = 0.0
+        for shard in self._all_shards():
+            for position in range(len(counts)):
+                counts[position] += shard[position]
+            total += shard[-1]
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            yield f'{self.name}_bucket', f'{{le="{_format_bound(bound)}"}}', cumulative
+        yield f'{self.name}_sum', '', total
+        yield f'{self.name}_count', '', cumulative
+
+
+class LatencyCollector:
+    """
+    Exposes the histograms of a ``LatencyRecorder`` as one Prometheus histogram labelled by metric.
+
+    Nothing is added to the clients' hot path: the recorder's log-bucketed histograms are converted
+    to the Prometheus buckets when scraped.
+
+    Attributes:
+        name (str): The metric name.
+        documentation (str): The help text.
+        recorder (LatencyRecorder): The recorder exposed.
+        buckets (Tuple[float, ...]): The bucket upper bounds in seconds, in increasing order.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, recorder: LatencyRecorder,
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS, registry: Optional[Registry] = REGISTRY):
+        """
+        Initialize the LatencyCollector and register it.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text.
+            recorder (LatencyRecorder): The recorder to expose.
+            buckets (Sequence[float]): The bucket upper bounds in seconds, in increasing order.
+            registry (Registry): The registry to expose it in, if any.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.recorder = recorder
+        self.buckets = tuple(buckets)
+        if registry is not None:
+            registry.register(self)
+
+    def samples(self) -> Iterator[Sample]:
+        for metric, histogram in sorted(LatencyRecorder.from_dict(self.recorder.to_dict()).histograms.items()):
+            label = f'metric="{_escape(metric)}"'
+            for bound, count in zip(self.buckets, histogram.cumulative_counts(list(self.buckets))):
+                yield f'{self.name}_bucket', f'{{{label},le="{_format_bound(bound)}"}}', count
+            yield f'{self.name}_bucket', f'{{{label},le="+Inf"}}', histogram.count
+            yield f'{self.name}_sum', f'{{{label}}}', histogram.total
+            yield f'{self.name}_count', f'{{{label}}}', histogram.count
+
+
+# Metrics fed by the bot and judge clients
+SENDS = Counter('bot_sends_total', 'Messages sent to the bot.')
+ACTIVITIES_RECEIVED = Counter('bot_activities_received_total', 'Bot activities received in replies to turns.')
+RECEIVE_TIMEOUTS = Counter('bot_receive_timeouts_total', 'Turns the bot did not reply to before the timeout.')
+CONNECTION_CLOSED = Counter('bot_connection_closed_total', 'WebSocket streams that closed unexpectedly.')
+POLLS = Counter('bot_polls_total', 'Long-poll requests for new activities.')
+EMPTY_POLLS = Counter('bot_empty_polls_total', 'Long-poll requests that returned no new activities.')
+JUDGE_CALLS = Counter('judge_calls_total', 'Semantic similarity verdicts requested.')
+JUDGE_CACHE_HITS = Counter('judge_cache_hits_total', 'Semantic similarity verdicts served from the cache.')
+JUDGE_REQUESTS = Counter('judge_requests_total', 'Requests sent to the Azure OpenAI judge.')
+JUDGE_REQUEST_SECONDS = Histogram('judge_request_seconds', 'Duration of requests to the Azure OpenAI judge.')
+BOT_LATENCY = LatencyCollector('bot_latency_seconds', 'Connect, send and turn latencies of the bot clients.',
+                               PROCESS_LATENCY)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self) -> None:
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.registry.exposition().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(format % args)
+
+
+class MetricsServer:
+    """
+    Serves a registry at ``http://host:port/metrics`` from a background thread, for Prometheus to scrape.
+
+    Attributes:
+        port (int): The port the server listens on.
+        url (str): The metrics URL.
+    """
+
+    def __init__(self, port: int = 0, host: str = '127.0.0.1', registry: Registry = REGISTRY):
+        """
+        Initialize the MetricsServer and start serving.
+
+        Args:
+            port (int): The port to listen on; 0 picks a free one.
+            host (str): The interface to listen on. Defaults to the loopback interface only.
+            registry (Registry): The registry to serve.
+        """
+        handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self.url = f'http://{host}:{self.port}/metrics'
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True)
+        self._thread.start()
+        logger.info(f"Serving metrics at {self.url}.")
+
+    def __enter__(self) -> 'MetricsServer':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stop serving.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
@@ -0,0 +1,174 @@
+import logging
+from typing import Dict, Iterable, List, Optional
+
+import latency
+from activity import ActivitySet, BotReply
+from copilot_chat_client import BotClient
+from turn_tracker import DEFAULT_QUIET_PERIOD, TurnTracker
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_TIMEOUT = 20.0
+
+
+class PendingReply:
+    """
+    The handle of one pipelined message: its activity id and, once the bot has answered, its reply.
+
+    Attributes:
+        message (str): The message sent.
+        activity_id (str): The id Direct Line assigned to the message.
+        tracker (TurnTracker): Collects the bot activities that reply to the message.
+        timings (Dict[str, float]): The latencies of the turn in seconds by metric name.
+        reply (BotReply): The bot's reply, once the turn is over; None before.
+    """
+
+    def __init__(self, pipeline: 'Pipeline', message: str, activity_id: Optional[str], sent_at: float,
+                 acked_at: float):
+        self.message = message
+        self.activity_id = activity_id
+        self.tracker = TurnTracker(activity_id, pipeline.quiet_period)
+        self.timings: Dict[str, float] = {latency.SEND_ACK: acked_at - sent_at}
+        self.reply: Optional[BotReply] = None
+        self._sent_at = sent_at
+        self._pipeline = pipeline
+
+    @property
+    def done(self) -> bool:
+        """Whether the turn is over and ``reply`` is set."""
+        return self.reply is not None
+
+    def result(self, timeout: float = DEFAULT_TIMEOUT) -> BotReply:
+        """
+        Wait for the bot's complete reply to this message.
+
+        Replies to other pending messages that arrive meanwhile are routed to their handles.
+
+        Args:
+            timeout (float): The maximum time to wait in seconds.
+
+        Returns:
+            BotReply: The reply; empty if the bot did not reply in time.
+        """
+        return self._pipeline.gather([self], timeout)[0]
+
+
+class Pipeline:
+    """
+    Sends several messages on one conversation without waiting for the replies in between.
+
+    Each message posted with ``send()`` gets a ``PendingReply``. Bot activities read from the
+    stream are routed to the pending message their ``replyToId`` names, so replies to different
+    messages never mix however they interleave. An activity without a ``replyToId`` goes to the
+    oldest message still waiting for its reply.
+
+    The stream is only read while a caller waits in ``PendingReply.result()`` or ``gather()``, so a
+    pipeline is meant to be used from one thread, like its client.
+
+    Attributes:
+        client (BotClient): The connected conversation.
+        quiet_period (float): Seconds of silence after a reply that end a turn.
+        pending (Dict[str, PendingReply]): The messages still waiting for their reply, by activity id.
+        unmatched (int): Bot activities that replied to none of the pending messages and were dropped.
+    """
+
+    def __init__(self, client: BotClient, quiet_period: float = DEFAULT_QUIET_PERIOD):
+        """
+        Initialize the Pipeline.
+
+        Args:
+            client (BotClient): A connected conversation.
+            quiet_period (float): Seconds of silence after a reply that end a turn.
+        """
+        self.client = client
+        self.quiet_period = quiet_period
+        self.pending: Dict[str, PendingReply] = {}
+        self.unmatched = 0
+        self._waiting: List[PendingReply] = []  # Pending messages in the order they were sent
+
+    def send(self, message: str) -> PendingReply:
+        """
+        Post a message without waiting for the reply.
+
+        Args:
+            message (str): The message to send to the bot.
+
+        Returns:
+            PendingReply: The handle to wait for the reply with.
+
+        Raises:
+            requests.RequestException: If there is an error in the HTTP request.
+        """
+        activity_id, sent_at, acked_at = self.client._post_message(message)
+        pending = PendingReply(self, message, activity_id, sent_at, acked_at)
+        if activity_id is not None:
+            self.pending[activity_id] = pending
+        self._waiting.append(pending)
+        return pending
+
+    def send_many(self, messages: Iterable[str]) -> List[PendingReply]:
+        """
+        Post messages back-to-back, in order, without waiting for any reply.
+
+        Args:
+            messages (Iterable[str]): The messages to send.
+
+        Returns:
+            List[PendingReply]: The handles, in the order of ``messages``.
+        """
+        return [self.send(message) for message in messages]
+
+    def gather(self, handles: Iterable[PendingReply], timeout: float = DEFAULT_TIMEOUT) -> List[BotReply]:
+        """
+        Wait for the replies to several pipelined messages.
+
+        Args:
+            handles (Iterable[PendingReply]): The handles to wait for.
+            timeout (float): The maximum time to wait for all of them, in seconds.
+
+        Returns:
+            List[BotReply]: The replies, in the order of ``handles``; empty for messages the bot did
+            not reply to in time.
+        """
+        handles = list(handles)
+        clock = self.client._clock
+        deadline = clock() + timeout
+        while True:
+            now = clock()
+            wait = None
+            for handle in handles:
+                if handle.done:
+                    continue
+                remaining = handle.tracker.wait_time(deadline, now)
+                if remaining <= 0:
+                    self._finish(handle)
+                elif wait is None or remaining < wait:
+                    wait = remaining
+            if wait is None:
+                return [handle.reply for handle in handles]
+            received_at, activity_sets = self.client._read_stream(wait)
+            for activity_set in activity_sets:
+                self._route(activity_set, received_at)
+
+    def _route(self, activity_set: ActivitySet, received_at: float) -> None:
+        routed: Dict[int, List] = {}
+        for activity in activity_set.activities:
+            if activity.role != 'bot':
+                continue
+            if activity.reply_to_id is not None:
+                target = self.pending.get(activity.reply_to_id)
+            else:
+                target = next((pending for pending in self._waiting if not pending.done), None)
+            if target is None:
+                self.unmatched += 1
+                logger.debug(f"Dropped activity {activity.id} replying to {activity.reply_to_id}.")
+                continue
+            routed.setdefault(id(target), [target]).append(activity)
+        for target, *activities in routed.values():
+            target.tracker.observe(ActivitySet(activities, activity_set.watermark), received_at)
+
+    def _finish(self, handle: PendingReply) -> None:
+        handle.reply = self.client._finish_turn(handle.tracker, handle._sent_at, handle.message, handle.timings)
+        self.pending.pop(handle.activity_id, None)
+        self._waiting.remove(handle)
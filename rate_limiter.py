@@ -0,0 +1,242 @@
+import email.utils
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional, Tuple
+
+import requests
+
+import latency
+from latency import LatencyRecorder
+from reconnect import Backoff
+
+logger = logging.getLogger(__name__)
+
+# Constants
+THROTTLE_STATUSES = {429, 503}  # Responses that mean "slow down" rather than "failed"
+MAX_RETRY_AFTER = 60.0  # Upper bound on an honored Retry-After, in seconds
+DEFAULT_BURST = 10
+DEFAULT_INITIAL_CONCURRENCY = 8
+DEFAULT_MAX_CONCURRENCY = 256
+DEFAULT_DECREASE_FACTOR = 0.5
+DEFAULT_MAX_RETRIES = 5
+
+
+def retry_after(response: requests.Response) -> Optional[float]:
+    """
+    Read the ``Retry-After`` header of a response.
+
+    Args:
+        response (requests.Response): The throttled response.
+
+    Returns:
+        float: The seconds to wait, capped at ``MAX_RETRY_AFTER``, or None if the header is missing or invalid.
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            moment = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = (moment - datetime.now(timezone.utc)).total_seconds()
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class AdaptiveRateLimiter:
+    """
+    A token bucket and an adaptive concurrency limit shared by all calls to Direct Line.
+
+    Every call first takes a token from the bucket (``rate`` per second, up to ``burst`` at once)
+    and a slot under the concurrency limit. The limit follows AIMD: each fast, successful call
+    raises it by ``1 / limit`` (about one slot per round of calls), while a throttled response or a
+    call slower than ``latency_target`` multiplies it by ``decrease_factor``. Throttled calls are
+    retried after their ``Retry-After`` (or with backoff), and every caller holds off until then,
+    since throttling applies to the whole deployment. So the limiter settles just below the
+    service's throughput limit.
+
+    Attributes:
+        rate (float): Calls per second allowed by the token bucket, or None for no rate limit.
+        burst (int): The bucket size.
+        concurrency_limit (float): The current adaptive limit on calls in flight.
+        min_concurrency (int): The lowest the concurrency limit may go.
+        max_concurrency (int): The highest the concurrency limit may go.
+        latency_target (float): Calls slower than this many seconds decrease the limit, if set.
+        decrease_factor (float): The multiplicative decrease on throttling or slow calls.
+        max_retries (int): Retries of a throttled call before its response is returned as is.
+        in_flight (int): Calls currently in progress.
+        throttled (int): Throttled responses seen.
+        throttled_time (float): Total seconds callers spent waiting because of limiting or throttling.
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: int = DEFAULT_BURST,
+                 initial_concurrency: int = DEFAULT_INITIAL_CONCURRENCY, min_concurrency: int = 1,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, latency_target: Optional[float] = None,
+                 decrease_factor: float = DEFAULT_DECREASE_FACTOR, max_retries: int = DEFAULT_MAX_RETRIES):
+        """
+        Initialize the AdaptiveRateLimiter.
+
+        Args:
+            rate (float): Calls per second allowed by the token bucket, or None for no rate limit.
+            burst (int): The bucket size.
+            initial_concurrency (int): The starting concurrency limit.
+            min_concurrency (int): The lowest the concurrency limit may go.
+            max_concurrency (int): The highest the concurrency limit may go.
+            latency_target (float): Calls slower than this many seconds decrease the limit, if set.
+            decrease_factor (float): The multiplicative decrease on throttling or slow calls.
+            max_retries (int): Retries of a throttled call before its response is returned as is.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.concurrency_limit = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.max_retries = max_retries
+        self.in_flight = 0
+        self.throttled = 0
+        self.throttled_time = 0.0
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._next_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def call(self, send: Callable[[], requests.Response],
+             recorder: Optional[LatencyRecorder] = None) -> requests.Response:
+        """
+        Make one HTTP call under the limiter, retrying it while it is throttled.
+
+        Args:
+            send (Callable[[], requests.Response]): Makes the call; invoked once per attempt.
+            recorder (LatencyRecorder): Receives the time spent waiting as ``latency.THROTTLE_WAIT``.
+
+        Returns:
+            requests.Response: The first response that was not throttled, or the last one.
+        """
+        backoff = Backoff(max_attempts=self.max_retries)
+        waited = 0.0
+        while True:
+            waited += self._acquire()
+            started = time.monotonic()
+            try:
+                response = send()
+            finally:
+                elapsed = time.monotonic() - started
+                self._release()
+            if response.status_code not in THROTTLE_STATUSES:
+                self._on_success(elapsed)
+                break
+            delay = retry_after(response)
+            if delay is None:
+                delay = backoff.next_delay()
+            else:
+                backoff.attempts += 1
+            self._on_throttled(delay)
+            if backoff.attempts > self.max_retries:
+                logger.warning(f"Still throttled ({response.status_code}) after {self.max_retries} retries.")
+                break
+            # The throttled attempt itself was spent waiting on the service, not the bot.
+            waited += elapsed
+        if waited > 0:
+            with self._condition:
+                self.throttled_time += waited
+            if recorder is not None:
+                recorder.record(latency.THROTTLE_WAIT, waited)
+        return response
+
+    def _acquire(self) -> float:
+        start = time.monotonic()
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                wait = self._blocked_until - now
+                if wait <= 0 and self.rate is not None:
+                    self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+                    self._refilled_at = now
+                    if self._tokens < 1:
+                        wait = (1 - self._tokens) / self.rate
+                if wait <= 0:
+                    if self.in_flight < int(self.concurrency_limit):
+                        break
+                    wait = None  # Woken up by _release()
+                self._condition.wait(wait)
+            if self.rate is not None:
+                self._tokens -= 1
+            self.in_flight += 1
+        return time.monotonic() - start
+
+    def _release(self) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def _on_success(self, elapsed: float) -> None:
+        if self.latency_target is not None and elapsed > self.latency_target:
+            self._decrease(elapsed)
+            return
+        with self._condition:
+            increased = min(self.max_concurrency, self.concurrency_limit + 1 / self.concurrency_limit)
+            if int(increased) > int(self.concurrency_limit):
+                self._condition.notify()
+            self.concurrency_limit = increased
+
+    def _on_throttled(self, delay: float) -> None:
+        with self._condition:
+            self.throttled += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        self._decrease(delay)
+
+    def _decrease(self, window: float) -> None:
+        # Calls that were in flight together see the same overload; only the first one decreases.
+        with self._condition:
+            now = time.monotonic()
+            if now < self._next_decrease:
+                return
+            self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit * self.decrease_factor)
+            self._next_decrease = now + window
+            logger.info(f"Concurrency limit lowered to {self.concurrency_limit:.1f}.")
+
+
+def timed_request(send: Callable[[], requests.Response], recorder: LatencyRecorder, name: Optional[str] = None,
+                  limiter: Optional[AdaptiveRateLimiter] = None,
+                  clock: Callable[[], float] = time.monotonic) -> Tuple[requests.Response, float, float]:
+    """
+    Make one HTTP call, through the limiter if there is one, and time its successful attempt.
+
+    Time spent throttled is recorded as ``latency.THROTTLE_WAIT``, so ``name`` only measures the
+    service.
+
+    Args:
+        send (Callable[[], requests.Response]): Makes the call.
+        recorder (LatencyRecorder): The recorder of the conversation.
+        name (str): The metric to record the call's duration under, if any.
+        limiter (AdaptiveRateLimiter): The shared limiter, if any.
+        clock (Callable[[], float]): The clock used for the returned times.
+
+    Returns:
+        Tuple[requests.Response, float, float]: The response and the start and end times of the attempt
+        that produced it.
+
+    Raises:
+        requests.RequestException: If the call fails or returns an error status.
+    """
+    times = []
+
+    def attempt() -> requests.Response:
+        started = clock()
+        response = send()
+        times[:] = [started, clock()]
+        return response
+
+    response = limiter.call(attempt, recorder) if limiter is not None else attempt()
+    response.raise_for_status()
+    started, finished = times
+    if name is not None:
+        recorder.record(name, finished - started)
+    return response, started, finished
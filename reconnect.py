@@ -0,0 +1,67 @@
+import random
+from typing import Optional
+
+# Constants
+DEFAULT_INITIAL_DELAY = 0.5  # Seconds before the first retry
+DEFAULT_MAX_DELAY = 30.0  # Upper bound on the delay between retries
+DEFAULT_MULTIPLIER = 2.0
+DEFAULT_MAX_ATTEMPTS = 5  # Retries before a dropped stream is reported as closed
+
+
+class Backoff:
+    """
+    Exponential backoff with full jitter.
+
+    The n-th consecutive failure waits a random time between zero and
+    ``min(max_delay, initial_delay * multiplier ** n)``, so many clients that lost their streams at
+    the same moment do not all reconnect at the same moment.
+
+    Attributes:
+        initial_delay (float): The delay bound after the first failure, in seconds.
+        max_delay (float): The largest delay bound, in seconds.
+        multiplier (float): The growth of the delay bound per consecutive failure.
+        max_attempts (int): The number of retries allowed before giving up.
+        attempts (int): Consecutive failures since the last ``reset()``.
+    """
+
+    def __init__(self, initial_delay: float = DEFAULT_INITIAL_DELAY, max_delay: float = DEFAULT_MAX_DELAY,
+                 multiplier: float = DEFAULT_MULTIPLIER, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 rng: Optional[random.Random] = None):
+        """
+        Initialize the Backoff.
+
+        Args:
+            initial_delay (float): The delay bound after the first failure, in seconds.
+            max_delay (float): The largest delay bound, in seconds.
+            multiplier (float): The growth of the delay bound per consecutive failure.
+            max_attempts (int): The number of retries allowed before giving up; 0 disables retries.
+            rng (random.Random): The source of jitter. Defaults to the ``random`` module.
+        """
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.max_attempts = max_attempts
+        self.attempts = 0
+        self._rng = rng or random
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether all retries have been used up."""
+        return self.attempts >= self.max_attempts
+
+    def next_delay(self) -> float:
+        """
+        Count one more failure and return how long to wait before the next retry.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        bound = min(self.max_delay, self.initial_delay * self.multiplier ** self.attempts)
+        self.attempts += 1
+        return self._rng.uniform(0, bound)
+
+    def reset(self) -> None:
+        """
+        Forget past failures after a success.
+        """
+        self.attempts = 0
@@ -0,0 +1,215 @@
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import websocket
+
+import latency
+from copilot_chat_client import BotClient
+from latency import LatencyRecorder
+from transcript import CONNECT, FRAME, SEND, read_transcript
+
+logger = logging.getLogger(__name__)
+
+
+class VirtualClock:
+    """
+    A clock that only moves when told to, used to replay recordings at maximum speed.
+
+    Attributes:
+        now (float): The current virtual time in seconds.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance_to(self, moment: float) -> None:
+        """Move the clock forward to ``moment`` (never backwards)."""
+        self.now = max(self.now, moment)
+
+
+class ReplayWebSocket:
+    """
+    Plays back the recorded frames of one conversation with the subset of the ``websocket.WebSocket``
+    API that ``BotClient.receive()`` uses.
+
+    Frames are released one turn at a time: those recorded after a send become available when the
+    replayed client sends. A turn that has no more frames behaves like a silent socket and times out.
+
+    Attributes:
+        connected (bool): Whether the replay is still open.
+    """
+
+    def __init__(self, records: List[Dict[str, Any]], clock, speed: Optional[float] = None, start: float = 0.0):
+        """
+        Initialize the ReplayWebSocket.
+
+        Args:
+            records (List[Dict[str, Any]]): The records of one recording, after its CONNECT record.
+            clock: The client's clock; a ``VirtualClock`` when replaying at maximum speed.
+            speed (float): Playback speed relative to the recording, or None for maximum speed.
+            start (float): The recorded time of the CONNECT record.
+        """
+        self.records = records
+        self.clock = clock
+        self.speed = speed
+        self.connected = True
+        self._position = 0
+        self._timeout: Optional[float] = None
+        self.anchor(start)
+
+    def anchor(self, recorded: float) -> None:
+        """Line up the recorded time ``recorded`` with the current client clock time."""
+        self._offset = self.clock() - recorded / (self.speed or 1.0)
+
+    def due(self, recorded: float) -> float:
+        """The client clock time at which something recorded at ``recorded`` happens."""
+        return self._offset + recorded / (self.speed or 1.0)
+
+    def settimeout(self, timeout: Optional[float]) -> None:
+        self._timeout = timeout
+
+    def next_send(self) -> Optional[Dict[str, Any]]:
+        """
+        Release the frames of the next turn and return the SEND record that starts it.
+
+        Frames of the current turn that were not received are skipped, and the recorded send time is
+        lined up with the current clock, so time spent by the test between turns is not replayed.
+        """
+        while self._position < len(self.records):
+            record = self.records[self._position]
+            self._position += 1
+            if record['k'] == SEND:
+                self.anchor(record['t'])
+                return record
+        return None
+
+    def recv(self) -> str:
+        if not self.connected:
+            raise websocket.WebSocketConnectionClosedException('Replay closed')
+        record = self.records[self._position] if self._position < len(self.records) else None
+        if record is None or record['k'] != FRAME:
+            self._sleep(self._timeout or 0)
+            raise websocket.WebSocketTimeoutException('No more recorded frames in this turn')
+        wait = self.due(record['t']) - self.clock()
+        if self._timeout is not None and wait > self._timeout:
+            self._sleep(self._timeout)
+            raise websocket.WebSocketTimeoutException('Next recorded frame is due after the timeout')
+        self._sleep(wait)
+        self._position += 1
+        return record['d']
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        if isinstance(self.clock, VirtualClock):
+            self.clock.advance_to(self.clock() + seconds)
+        else:
+            time.sleep(seconds)
+
+    def close(self) -> None:
+        self.connected = False
+
+    def shutdown(self) -> None:
+        self.close()
+
+
+class ReplayBotClient(BotClient):
+    """
+    A BotClient that replays a recorded transcript instead of talking to Direct Line.
+
+    ``send()`` consumes the next recorded outgoing activity and ``receive()`` runs the recorded
+    frames through the regular frame decoding, turn detection and ``_extract_bot_responses``. At
+    maximum speed a virtual clock is used, so the replay finishes as fast as the client can parse
+    while latency figures still reflect the recorded timings.
+
+    Attributes:
+        path (str): The transcript file.
+        speed (float): Playback speed relative to the recording, or None for maximum speed.
+        recording (int): Which recording of the file to replay, if it holds several.
+    """
+
+    def __init__(self, path: str, speed: Optional[float] = None, recording: int = 0):
+        """
+        Initialize the ReplayBotClient.
+
+        Args:
+            path (str): The transcript file.
+            speed (float): Playback speed relative to the recording (1.0 is real time), or None for
+                maximum speed.
+            recording (int): Which recording of the file to replay, if it holds several.
+        """
+        super().__init__(endpoint=path, session=None)
+        # Replayed timings are not live traffic; keep them out of PROCESS_LATENCY and its metrics.
+        self.latency = LatencyRecorder()
+        self.path = path
+        self.speed = speed
+        self.recording = recording
+        if speed is None:
+            self._clock = VirtualClock()
+
+    def connect(self, token: str = None) -> None:
+        """
+        Load the recording and open the replayed stream.
+        """
+        recordings: List[List[Dict[str, Any]]] = []
+        for record in read_transcript(self.path):
+            if record['k'] == CONNECT:
+                recordings.append([record])
+            elif recordings:
+                recordings[-1].append(record)
+        if self.recording >= len(recordings):
+            raise ValueError(f'{self.path} holds {len(recordings)} recordings, not {self.recording + 1}')
+        header, *records = recordings[self.recording]
+        self.conversation_id = header['conversationId']
+        self.conversation_token = None
+        self.ws = ReplayWebSocket(records, self._clock, self.speed, start=header['t'])
+        self._decoder.reset()
+        logger.info(f"Replaying conversation {self.conversation_id} from {self.path}.")
+
+    def send(self, message: str) -> Optional[str]:
+        """
+        Replay the next recorded outgoing activity.
+
+        Args:
+            message (str): The message the test would send; a mismatch with the recording is logged.
+
+        Returns:
+            str: The recorded activity id.
+
+        Raises:
+            EOFError: If the recording has no more outgoing activities.
+        """
+        record = self.ws.next_send()
+        if record is None:
+            raise EOFError(f'No more recorded messages in {self.path}')
+        recorded_text = record['a'].get('text')
+        if recorded_text != message:
+            logger.warning(f"Replayed message {recorded_text!r} differs from sent message {message!r}.")
+
+        self._sent_at = self._clock()
+        self._sleep_until(self.ws.due(record['t'] + record['ack']))
+        self.turn_timings = {latency.SEND_ACK: self._clock() - self._sent_at}
+        self.latency.record(latency.SEND_ACK, self.turn_timings[latency.SEND_ACK])
+        self.last_activity_id = record['id']
+        self.last_message = message
+        return self.last_activity_id
+
+    def _reconnect(self) -> bool:
+        """
+        A closed replay cannot be reopened, and resuming would contact Direct Line; the turn fails instead.
+
+        Returns:
+            bool: Always False.
+        """
+        self.ws.shutdown()
+        return False
+
+    def _sleep_until(self, moment: float) -> None:
+        if isinstance(self._clock, VirtualClock):
+            self._clock.advance_to(moment)
+        else:
+            time.sleep(max(moment - self._clock(), 0))
@@ -0,0 +1,368 @@
+import glob
+import json
+import logging
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, ValidationError, model_validator
+
+import tracing
+from activity import Activity, BotReply
+from conversation_pool import ConversationPool
+from copilot_chat_client import BotClient
+from deferred_assertions import DeferredSemanticAssertions, SemanticAssertionError
+from latency import TURN_COMPLETE, LatencyRecorder
+from turn_log import TurnLog
+from turn_tracker import DEFAULT_QUIET_PERIOD
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_TURN_TIMEOUT = 20.0
+DEFAULT_THRESHOLD = 0.75
+ANY_BRANCH = '*'  # Branch taken when none of the other branches' actions is offered
+
+
+class ScenarioError(ValueError):
+    """Raised when a scenario file is invalid."""
+
+
+class SemanticExpectation(BaseModel):
+    """A reply message that must mean the same as ``text``, as judged by the semantic evaluator."""
+    model_config = ConfigDict(extra='forbid')
+
+    text: str = Field(min_length=1)
+    threshold: float = Field(DEFAULT_THRESHOLD, ge=0.0, le=1.0)
+    response: int = Field(0, ge=0, description='Index of the response message to judge.')
+
+
+class Expectation(BaseModel):
+    """What the bot's reply to one turn must look like."""
+    model_config = ConfigDict(extra='forbid')
+
+    contains: List[str] = Field(default_factory=list, description='Case-insensitive substrings of some message.')
+    suggested_actions: List[str] = Field(default_factory=list, description='Action titles that must be offered.')
+    similar: List[SemanticExpectation] = Field(default_factory=list)
+    reply_required: bool = False
+    allow_empty: bool = False
+
+    _contains_lower: List[str] = PrivateAttr(default_factory=list)
+
+    @model_validator(mode='after')
+    def _precompute(self) -> 'Expectation':
+        self._contains_lower = [text.lower() for text in self.contains]
+        return self
+
+
+class Turn(BaseModel):
+    """One user message, the expectations on the reply, and the branches that may follow it."""
+    model_config = ConfigDict(extra='forbid')
+
+    send: str = Field(min_length=1)
+    expect: Expectation = Field(default_factory=Expectation)
+    budget: Optional[float] = Field(None, gt=0, description='Maximum seconds from send to the last reply.')
+    timeout: float = Field(DEFAULT_TURN_TIMEOUT, gt=0)
+    quiet_period: float = Field(DEFAULT_QUIET_PERIOD, ge=0)
+    branch: Dict[str, List['Turn']] = Field(default_factory=dict,
+                                            description='Turns to continue with, by suggested action title.')
+
+    _label: str = PrivateAttr('')
+
+    @property
+    def label(self) -> str:
+        """Where the turn is in its scenario, e.g. ``weather#2[Tomorrow]#1``."""
+        return self._label
+
+
+class Scenario(BaseModel):
+    """A conversation flow: turns in order, each with its expectations."""
+    model_config = ConfigDict(extra='forbid')
+
+    name: str = Field(pattern=r'^[\w.-]+$')
+    description: str = ''
+    turns: List[Turn] = Field(min_length=1)
+
+    _semantic: bool = PrivateAttr(False)
+
+    @property
+    def needs_evaluator(self) -> bool:
+        """Whether any turn has semantic expectations."""
+        return self._semantic
+
+
+def _prepare(turns: List[Turn], prefix: str) -> bool:
+    semantic = False
+    for number, turn in enumerate(turns, 1):
+        turn._label = f'{prefix}#{number}'
+        semantic |= bool(turn.expect.similar)
+        for choice, branch_turns in turn.branch.items():
+            if not branch_turns:
+                raise ScenarioError(f'{turn.label}: branch {choice!r} has no turns')
+            semantic |= _prepare(branch_turns, f'{turn.label}[{choice}]')
+    return semantic
+
+
+def compile_scenario(data: Dict, source: str = '<scenario>') -> Scenario:
+    """
+    Validate a scenario and pre-process it for execution.
+
+    Args:
+        data (Dict): The scenario as decoded from JSON.
+        source (str): Where the scenario came from, for error messages.
+
+    Returns:
+        Scenario: The compiled scenario.
+
+    Raises:
+        ScenarioError: If the scenario is invalid.
+    """
+    try:
+        scenario = Scenario.model_validate(data)
+    except ValidationError as e:
+        raise ScenarioError(f'{source}: invalid scenario:\n{e}') from e
+    scenario._semantic = _prepare(scenario.turns, scenario.name)
+    return scenario
+
+
+def load_scenarios(path: str) -> List[Scenario]:
+    """
+    Load and compile scenarios from a JSON file or from every ``*.json`` file in a directory.
+
+    A file holds one scenario object or a list of them.
+
+    Args:
+        path (str): The file or directory.
+
+    Returns:
+        List[Scenario]: The compiled scenarios, sorted by file name and then in file order.
+
+    Raises:
+        ScenarioError: If a file is invalid or two scenarios share a name.
+    """
+    files = sorted(glob.glob(os.path.join(glob.escape(path), '*.json'))) if os.path.isdir(path) else [path]
+    scenarios, names = [], set()
+    for file in files:
+        with open(file, encoding='utf-8') as f:
+            try:
+                data = json.load(f)
+            except ValueError as e:
+                raise ScenarioError(f'{file}: invalid JSON: {e}') from e
+        for item in data if isinstance(data, list) else [data]:
+            scenario = compile_scenario(item, file)
+            if scenario.name in names:
+                raise ScenarioError(f'{file}: duplicate scenario name {scenario.name!r}')
+            names.add(scenario.name)
+            scenarios.append(scenario)
+    return scenarios
+
+
+class ScenarioResult:
+    """
+    The outcome of running one scenario.
+
+    Attributes:
+        name (str): The scenario name.
+        failures (List[str]): Every failed expectation, prefixed with its turn label.
+        transcript (List[Tuple[str, List[str]]]): The messages sent and the responses received.
+        elapsed (float): Seconds the scenario took, including semantic judging.
+        latency (LatencyRecorder): The connect and turn timings of the scenario's conversation.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.failures: List[str] = []
+        self.transcript: List[Tuple[str, List[str]]] = []
+        self.elapsed = 0.0
+        self.latency = LatencyRecorder()
+
+    @property
+    def passed(self) -> bool:
+        return not self.failures
+
+    def report(self) -> str:
+        """Render the outcome, with the transcript if the scenario failed."""
+        status = 'passed' if self.passed else f'failed ({len(self.failures)})'
+        lines = [f"Scenario {self.name} {status} in {self.elapsed:.1f}s"]
+        lines.extend(f"  {failure}" for failure in self.failures)
+        if not self.passed:
+            lines.extend(f"  > {sent}\n  < {responses}" for sent, responses in self.transcript)
+        return '\n'.join(lines)
+
+
+class _PendingTurn:
+    """A turn whose turn log entry waits for the semantic verdicts on its reply."""
+
+    __slots__ = ('turn_log', 'conversation_id', 'sent', 'activities', 'timings', 'verdicts')
+
+    def __init__(self, turn_log: TurnLog, conversation_id: str, sent: str, activities: List[Activity],
+                 timings: Dict[str, float], verdicts: List[Future]):
+        self.turn_log = turn_log
+        self.conversation_id = conversation_id
+        self.sent = sent
+        self.activities = activities
+        self.timings = timings
+        self.verdicts = verdicts
+
+    def write(self) -> None:
+        """
+        Log the turn with its lowest score, including scores below the threshold.
+
+        The score is None if the turn was not judged, or if a judge call errored or was cancelled.
+        """
+        scores = []
+        for verdict in self.verdicts:
+            error = verdict.exception() if not verdict.cancelled() else None
+            if verdict.cancelled() or error is not None and not isinstance(error, SemanticAssertionError):
+                scores = []
+                break
+            scores.append(error.score if error is not None else verdict.result())
+        self.turn_log.record_turn(self.conversation_id, self.sent, self.activities, self.timings,
+                                  min(scores) if scores else None)
+
+
+class ScenarioRunner:
+    """
+    Runs compiled scenarios on conversations from a ``ConversationPool``.
+
+    Each scenario gets a fresh pooled conversation, so there is no per-scenario connect latency,
+    and ``run_all()`` runs as many scenarios at once as the pool has conversations. Semantic
+    expectations are judged in the background while the conversation continues. If the pool's
+    clients have a ``turn_log``, their turns are logged once judged, with the semantic score.
+
+    Attributes:
+        pool (ConversationPool): The pool providing the conversations.
+        evaluator: Judges semantic expectations, e.g. a ``SemanticSimilarityClient`` or a
+            ``TieredSimilarityEvaluator``. Scenarios with semantic expectations fail without one.
+        max_workers (int): The number of scenarios run at once.
+    """
+
+    def __init__(self, pool: ConversationPool, evaluator=None, max_workers: Optional[int] = None,
+                 acquire_timeout: float = 60):
+        """
+        Initialize the ScenarioRunner.
+
+        Args:
+            pool (ConversationPool): The pool providing the conversations.
+            evaluator: Judges semantic expectations, if any.
+            max_workers (int): The number of scenarios run at once. Defaults to the pool size.
+            acquire_timeout (float): Seconds to wait for a pooled conversation.
+        """
+        self.pool = pool
+        self.evaluator = evaluator
+        self.max_workers = max_workers or pool.size
+        self.acquire_timeout = acquire_timeout
+
+    def run_all(self, scenarios: Iterable[Scenario]) -> List[ScenarioResult]:
+        """
+        Run scenarios in parallel.
+
+        Args:
+            scenarios (Iterable[Scenario]): The compiled scenarios.
+
+        Returns:
+            List[ScenarioResult]: The results, in the order of ``scenarios``.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='scenario') as executor:
+            return list(executor.map(self.run, scenarios))
+
+    def run(self, scenario: Scenario) -> ScenarioResult:
+        """
+        Run one scenario. Failed expectations are collected in the result, not raised.
+
+        Args:
+            scenario (Scenario): The compiled scenario.
+
+        Returns:
+            ScenarioResult: The outcome.
+        """
+        result = ScenarioResult(scenario.name)
+        pending: List[_PendingTurn] = []
+        started = time.monotonic()
+        try:
+            if self.evaluator is not None and scenario.needs_evaluator:
+                with DeferredSemanticAssertions(self.evaluator) as judge:
+                    self._converse(scenario, result, judge, pending)
+            else:
+                self._converse(scenario, result, None, pending)
+        except AssertionError as e:
+            result.failures.append(str(e))
+        except Exception as e:
+            logger.exception(f"Scenario {scenario.name} failed to run")
+            result.failures.append(f'{scenario.name}: {type(e).__name__}: {e}')
+        result.elapsed = time.monotonic() - started
+        for turn in pending:
+            turn.write()
+        logger.info(result.report().splitlines()[0])
+        return result
+
+    def _converse(self, scenario: Scenario, result: ScenarioResult, judge: Optional[DeferredSemanticAssertions],
+                  pending: List[_PendingTurn]) -> None:
+        with self.pool.conversation(self.acquire_timeout) as client:
+            # The client would log each turn before it is judged; run() logs them with their scores instead.
+            turn_log, client.turn_log = client.turn_log, None
+            try:
+                self._run_turns(client, scenario.turns, result, judge, turn_log, pending)
+            finally:
+                client.turn_log = turn_log
+                result.latency.merge(client.latency)
+
+    def _run_turns(self, client: BotClient, turns: List[Turn], result: ScenarioResult,
+                   judge: Optional[DeferredSemanticAssertions], turn_log: Optional[TurnLog],
+                   pending: List[_PendingTurn]) -> bool:
+        for turn in turns:
+            client.send(turn.send)
+            with tracing.attributes(conversation_id=client.conversation_id, turn_index=client.turn_index,
+                                    turn=turn.label):
+                reply = client.receive(timeout=turn.timeout, quiet_period=turn.quiet_period)
+                result.transcript.append((turn.send, list(reply)))
+                verdicts: List[Future] = []
+                result.failures.extend(f'{turn.label}: {failure}'
+                                       for failure in self._check(turn, reply, client.turn_timings, judge, verdicts))
+                if turn_log is not None:
+                    pending.append(_PendingTurn(turn_log, client.conversation_id, turn.send, reply.activities,
+                                                client.turn_timings, verdicts))
+            if not turn.branch:
+                continue
+            offered = [title for activity in reply.activities for title in activity.suggested_actions]
+            choice = next((choice for choice in turn.branch if choice in offered), None)
+            if choice is None and ANY_BRANCH in turn.branch:
+                choice = ANY_BRANCH
+            if choice is None:
+                result.failures.append(f'{turn.label}: none of the branches {list(turn.branch)} was offered, '
+                                       f'got {offered}')
+                return False
+            if not self._run_turns(client, turn.branch[choice], result, judge, turn_log, pending):
+                return False
+        return True
+
+    @staticmethod
+    def _check(turn: Turn, reply: BotReply, timings: Dict[str, float], judge: Optional[DeferredSemanticAssertions],
+               verdicts: List[Future]) -> List[str]:
+        expect = turn.expect
+        failures = []
+        if expect.reply_required and not reply:
+            failures.append('no reply')
+        if not expect.allow_empty and '' in reply:
+            failures.append(f'empty response in {list(reply)}')
+        lowered = [response.lower() for response in reply]
+        for text, needle in zip(expect.contains, expect._contains_lower):
+            if not any(needle in response for response in lowered):
+                failures.append(f'expected {text!r} in {list(reply)}')
+        offered = {title for activity in reply.activities for title in activity.suggested_actions}
+        missing = [title for title in expect.suggested_actions if title not in offered]
+        if missing:
+            failures.append(f'suggested actions {missing} not offered, got {sorted(offered)}')
+        for similar in expect.similar:
+            if judge is None:
+                failures.append('semantic expectation needs an evaluator')
+            elif similar.response >= len(reply):
+                failures.append(f'no response {similar.response} to compare with {similar.text!r}')
+            else:
+                verdicts.append(judge.expect(similar.text, reply[similar.response], similar.threshold,
+                                             label=turn.label))
+        elapsed = timings.get(TURN_COMPLETE)
+        if turn.budget is not None and elapsed is not None and elapsed > turn.budget:
+            failures.append(f'took {elapsed:.2f}s, budget {turn.budget:.2f}s')
+        return failures
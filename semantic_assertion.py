@@ -1,9 +1,88 @@
 import json
+import logging
 import os
+import time
+from typing import List, Tuple
 
 from dotenv import load_dotenv
-from openai import AzureOpenAI
-from pydantic import BaseModel
+from openai import AzureOpenAI, ContentFilterFinishReasonError, LengthFinishReasonError
+from pydantic import BaseModel, ValidationError
+
+import metrics
+import tracing
+from deferred_assertions import SemanticAssertionError
+from similarity_cache import VerdictCache
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = ("You are an AI model specialized in evaluating the semantic similarity "
+                 "between two text statements. Your response must strictly adhere to "
+                 "JSON format, containing three components: \n\n1. **'Similarity "
+                 "Score'**: A numeric value between 0.0 (completely different) and 1.0 ("
+                 "identical), reflecting the degree of semantic similarity.\n2. "
+                 "**'Decision'**: Categorize the relationship between the statements. "
+                 "Choose one of the following options:\n   - 'Identical'\n   - "
+                 "'Similar'\n   - 'Somewhat Similar'\n   - 'Not Similar'\n   - "
+                 "'Completely Different'\n3. **'Reason'**: Provide a concise explanation "
+                 "for the assigned similarity score and decision, focusing on factual "
+                 "alignment, meaning, and context over minor wording "
+                 "differences.\n\nYour evaluations should prioritize accuracy and "
+                 "completeness while maintaining consistency across similar inputs. "
+                 "Factual alignment and overall meaning are your primary considerations, "
+                 "with less importance placed on superficial or stylistic "
+                 "differences.\n\n# Steps\n\n1. Compare the main ideas and meanings of "
+                 "the two statements.\n2. Assess the level of agreement or alignment in "
+                 "factual content, context, and purpose.\n3. Quantify the degree of "
+                 "semantic similarity as a numerical score (0.0 - 1.0).\n4. Use the "
+                 "similarity score to decide on a category from the defined list ("
+                 "'Identical', 'Similar', etc.).\n5. Provide a reason, ensuring it "
+                 "justifies both the similarity score and the corresponding "
+                 "decision.\n\n# Output Format\n\nYour response must follow this JSON "
+                 "structure:\n\n```json\n{\n  \"Similarity Score\": [numeric value "
+                 "between 0.0 and 1.0],\n  \"Decision\": \"[one of: 'Identical', "
+                 "'Similar', 'Somewhat Similar', 'Not Similar', 'Completely "
+                 "Different']\",\n  \"Reason\": \"[concise explanation of the similarity "
+                 "score and decision based on factual alignment and overall "
+                 "meaning]\"\n}\n```\n\nEnsure consistent formatting and avoid "
+                 "outputting anything outside the JSON structure.\n\n# Examples\n\n### "
+                 "Example 1:\n**Input Statements:**\n- Statement 1: \"Cats are small, "
+                 "domesticated mammals often kept as pets.\"\n- Statement 2: \"Felines "
+                 "are commonly kept as pets and are small, domesticated "
+                 "animals.\"\n\n**Output:**\n```json\n{\n  \"Similarity Score\": 0.85,"
+                 "\n  \"Decision\": \"Similar\",\n  \"Reason\": \"Both statements "
+                 "describe cats as small, domesticated mammals commonly kept as pets, "
+                 "with slight differences in phrasing.\"\n}\n```\n\n---\n\n### Example "
+                 "2:\n**Input Statements:**\n- Statement 1: \"The Eiffel Tower is "
+                 "located in Paris, France.\"\n- Statement 2: \"The Great Wall of China "
+                 "is a historic structure in China.\"\n\n**Output:**\n```json\n{\n  "
+                 "\"Similarity Score\": 0.1,\n  \"Decision\": \"Completely Different\","
+                 "\n  \"Reason\": \"The two statements refer to entirely different "
+                 "landmarks in different countries with no overlap in "
+                 "meaning.\"\n}\n```\n\n---\n\n### Example 3:\n**Input Statements:**\n- "
+                 "Statement 1: \"The Pacific Ocean is the largest ocean on Earth.\"\n- "
+                 "Statement 2: \"The Atlantic Ocean is smaller than the Pacific but "
+                 "larger than the Indian Ocean.\"\n\n**Output:**\n```json\n{\n  "
+                 "\"Similarity Score\": 0.3,\n  \"Decision\": \"Somewhat Similar\","
+                 "\n  \"Reason\": \"Both statements refer to oceans and their relative "
+                 "sizes, but they discuss different oceans and emphasize different "
+                 "aspects.\"\n}\n```\n\n# Notes\n\n- Maintain consistency in evaluations "
+                 "and formatting across all responses.\n- If the factual alignment "
+                 "between statements is unclear or ambiguous, provide a cautious and "
+                 "well-reasoned explanation.\n- Avoid introducing biases or "
+                 "interpretations that are not directly supported by the provided "
+                 "statements.")
+BATCH_INSTRUCTIONS = ("\n\n# Batch Mode\n\nYou will receive several numbered pairs of statements. Evaluate every "
+                      "pair independently, exactly as described above, and return one entry per pair in 'scores' "
+                      "with its 'index' copied from the input.")
+# Bump whenever SYSTEM_PROMPT changes so cached verdicts from the old prompt are not reused.
+PROMPT_VERSION = "1"
+# Batch verdicts come from a different prompt and are cached apart; bump when BATCH_INSTRUCTIONS changes.
+BATCH_PROMPT_VERSION = f"{PROMPT_VERSION}-batch.1"
+# Rough token accounting used to split batches; about four characters per token.
+CHARS_PER_TOKEN = 4
+PAIR_OVERHEAD_TOKENS = 60  # Per-pair framing in the request plus its verdict in the response
+DEFAULT_MAX_BATCH_TOKENS = 8000
+DEFAULT_MAX_BATCH_SIZE = 20
 
 
 class ComparisonScore(BaseModel):
@@ -12,10 +91,21 @@ class ComparisonScore(BaseModel):
     decision: str
 
 
+class IndexedComparisonScore(ComparisonScore):
+    index: int
+
+
+class ComparisonScoreBatch(BaseModel):
+    scores: List[IndexedComparisonScore]
+
+
 class SemanticSimilarityClient:
-    def __init__(self, azure_openai_endpoint, azure_openai_key, deployment_name, api_version="2022-03-01-preview"):
+    def __init__(self, azure_openai_endpoint, azure_openai_key, deployment_name, api_version="2022-03-01-preview",
+                 cache: VerdictCache = None):
         """
         Initialize the Azure OpenAI client for semantic similarity evaluation.
+
+        Pass a VerdictCache to reuse verdicts for byte-identical comparisons across runs.
         """
         self.client = AzureOpenAI(
             azure_endpoint=azure_openai_endpoint,
@@ -23,83 +113,144 @@ class SemanticSimilarityClient:
             api_version=api_version
         )
         self.deployment_name = deployment_name
+        self.cache = cache
 
     def get_similarity_score(self, expected, actual):
         """
         Fetch semantic similarity score between expected and actual responses.
         """
+        metrics.JUDGE_CALLS.inc()
+        with tracing.span(tracing.JUDGE) as span:
+            if self.cache is None:
+                return self._score(expected, actual)
+
+            key = VerdictCache.make_key(self.deployment_name, PROMPT_VERSION, expected, actual)
+            verdict = self.cache.get(key)
+            span.set_attribute('cached', verdict is not None)
+            if verdict is not None:
+                metrics.JUDGE_CACHE_HITS.inc()
+            else:
+                verdict = self._score(expected, actual)
+                self.cache.put(key, verdict)
+            return verdict
+
+    def _score(self, expected, actual):
+        """
+        Ask the LLM judge for the similarity verdict.
+        """
         prompt = f"""
         Text 1: {expected}
         Text 2: {actual}
         """
 
-        response = self.client.beta.chat.completions.parse(
-            model=self.deployment_name,
-            messages=[
-                {"role": "system", "content": "You are an AI model specialized in evaluating the semantic similarity "
-                                              "between two text statements. Your response must strictly adhere to "
-                                              "JSON format, containing three components: \n\n1. **'Similarity "
-                                              "Score'**: A numeric value between 0.0 (completely different) and 1.0 ("
-                                              "identical), reflecting the degree of semantic similarity.\n2. "
-                                              "**'Decision'**: Categorize the relationship between the statements. "
-                                              "Choose one of the following options:\n   - 'Identical'\n   - "
-                                              "'Similar'\n   - 'Somewhat Similar'\n   - 'Not Similar'\n   - "
-                                              "'Completely Different'\n3. **'Reason'**: Provide a concise explanation "
-                                              "for the assigned similarity score and decision, focusing on factual "
-                                              "alignment, meaning, and context over minor wording "
-                                              "differences.\n\nYour evaluations should prioritize accuracy and "
-                                              "completeness while maintaining consistency across similar inputs. "
-                                              "Factual alignment and overall meaning are your primary considerations, "
-                                              "with less importance placed on superficial or stylistic "
-                                              "differences.\n\n# Steps\n\n1. Compare the main ideas and meanings of "
-                                              "the two statements.\n2. Assess the level of agreement or alignment in "
-                                              "factual content, context, and purpose.\n3. Quantify the degree of "
-                                              "semantic similarity as a numerical score (0.0 - 1.0).\n4. Use the "
-                                              "similarity score to decide on a category from the defined list ("
-                                              "'Identical', 'Similar', etc.).\n5. Provide a reason, ensuring it "
-                                              "justifies both the similarity score and the corresponding "
-                                              "decision.\n\n# Output Format\n\nYour response must follow this JSON "
-                                              "structure:\n\n```json\n{\n  \"Similarity Score\": [numeric value "
-                                              "between 0.0 and 1.0],\n  \"Decision\": \"[one of: 'Identical', "
-                                              "'Similar', 'Somewhat Similar', 'Not Similar', 'Completely "
-                                              "Different']\",\n  \"Reason\": \"[concise explanation of the similarity "
-                                              "score and decision based on factual alignment and overall "
-                                              "meaning]\"\n}\n```\n\nEnsure consistent formatting and avoid "
-                                              "outputting anything outside the JSON structure.\n\n# Examples\n\n### "
-                                              "Example 1:\n**Input Statements:**\n- Statement 1: \"Cats are small, "
-                                              "domesticated mammals often kept as pets.\"\n- Statement 2: \"Felines "
-                                              "are commonly kept as pets and are small, domesticated "
-                                              "animals.\"\n\n**Output:**\n```json\n{\n  \"Similarity Score\": 0.85,"
-                                              "\n  \"Decision\": \"Similar\",\n  \"Reason\": \"Both statements "
-                                              "describe cats as small, domesticated mammals commonly kept as pets, "
-                                              "with slight differences in phrasing.\"\n}\n```\n\n---\n\n### Example "
-                                              "2:\n**Input Statements:**\n- Statement 1: \"The Eiffel Tower is "
-                                              "located in Paris, France.\"\n- Statement 2: \"The Great Wall of China "
-                                              "is a historic structure in China.\"\n\n**Output:**\n```json\n{\n  "
-                                              "\"Similarity Score\": 0.1,\n  \"Decision\": \"Completely Different\","
-                                              "\n  \"Reason\": \"The two statements refer to entirely different "
-                                              "landmarks in different countries with no overlap in "
-                                              "meaning.\"\n}\n```\n\n---\n\n### Example 3:\n**Input Statements:**\n- "
-                                              "Statement 1: \"The Pacific Ocean is the largest ocean on Earth.\"\n- "
-                                              "Statement 2: \"The Atlantic Ocean is smaller than the Pacific but "
-                                              "larger than the Indian Ocean.\"\n\n**Output:**\n```json\n{\n  "
-                                              "\"Similarity Score\": 0.3,\n  \"Decision\": \"Somewhat Similar\","
-                                              "\n  \"Reason\": \"Both statements refer to oceans and their relative "
-                                              "sizes, but they discuss different oceans and emphasize different "
-                                              "aspects.\"\n}\n```\n\n# Notes\n\n- Maintain consistency in evaluations "
-                                              "and formatting across all responses.\n- If the factual alignment "
-                                              "between statements is unclear or ambiguous, provide a cautious and "
-                                              "well-reasoned explanation.\n- Avoid introducing biases or "
-                                              "interpretations that are not directly supported by the provided "
-                                              "statements."},
-
-                {"role": "user", "content": prompt}
-            ],
-            response_format=ComparisonScore
-        )
+        metrics.JUDGE_REQUESTS.inc()
+        started = time.perf_counter()
+        with tracing.span(tracing.JUDGE_REQUEST, deployment=self.deployment_name):
+            response = self.client.beta.chat.completions.parse(
+                model=self.deployment_name,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+
+                    {"role": "user", "content": prompt}
+                ],
+                response_format=ComparisonScore
+            )
+        metrics.JUDGE_REQUEST_SECONDS.observe(time.perf_counter() - started)
 
         return response.choices[0].message.content
 
+    def score_many(self, pairs: List[Tuple[str, str]], max_batch_tokens=DEFAULT_MAX_BATCH_TOKENS,
+                   max_batch_size=DEFAULT_MAX_BATCH_SIZE) -> List[str]:
+        """
+        Fetch semantic similarity scores for many (expected, actual) pairs with as few requests as possible.
+
+        Pairs are packed into structured-output requests of at most max_batch_size pairs and roughly
+        max_batch_tokens prompt tokens, so the system prompt is sent once per batch instead of once per pair.
+        Pairs a batch fails to score are retried one by one. Returns the verdicts in the order of pairs,
+        in the same JSON form as get_similarity_score.
+
+        Batch verdicts are cached under BATCH_PROMPT_VERSION, so get_similarity_score never reuses them;
+        score_many reuses both its own and single-pair verdicts.
+        """
+        metrics.JUDGE_CALLS.inc(len(pairs))
+        verdicts = [None] * len(pairs)
+        keys = [None] * len(pairs)
+        batch_keys = [None] * len(pairs)
+        todo = []
+        for i, (expected, actual) in enumerate(pairs):
+            if self.cache is not None:
+                keys[i] = VerdictCache.make_key(self.deployment_name, PROMPT_VERSION, expected, actual)
+                batch_keys[i] = VerdictCache.make_key(self.deployment_name, BATCH_PROMPT_VERSION, expected, actual)
+                verdicts[i] = self.cache.get_first([keys[i], batch_keys[i]])
+            if verdicts[i] is None:
+                todo.append(i)
+            else:
+                metrics.JUDGE_CACHE_HITS.inc()
+
+        for batch in self._split_batches(pairs, todo, max_batch_tokens, max_batch_size):
+            batch_verdicts = self._score_batch(pairs, batch)
+            for i in batch:
+                if i in batch_verdicts:
+                    verdicts[i], key = batch_verdicts[i], batch_keys[i]
+                else:
+                    verdicts[i], key = self._score(*pairs[i]), keys[i]
+                if self.cache is not None:
+                    self.cache.put(key, verdicts[i])
+        return verdicts
+
+    @staticmethod
+    def _split_batches(pairs, indices, max_batch_tokens, max_batch_size):
+        """
+        Group pair indices into batches that fit the token budget.
+        """
+        batches, batch, tokens = [], [], 0
+        for i in indices:
+            expected, actual = pairs[i]
+            pair_tokens = (len(expected) + len(actual)) // CHARS_PER_TOKEN + PAIR_OVERHEAD_TOKENS
+            if batch and (tokens + pair_tokens > max_batch_tokens or len(batch) >= max_batch_size):
+                batches.append(batch)
+                batch, tokens = [], 0
+            batch.append(i)
+            tokens += pair_tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _score_batch(self, pairs, batch):
+        """
+        Ask the LLM judge for the verdicts of a batch of pairs in one request.
+
+        Returns the verdicts it could parse, keyed by pair index. A single pair is scored directly.
+        """
+        if len(batch) == 1:
+            return {}
+
+        prompt = "\n\n".join(f"Pair {n}:\nText 1: {pairs[i][0]}\nText 2: {pairs[i][1]}" for n, i in enumerate(batch))
+        metrics.JUDGE_REQUESTS.inc()
+        started = time.perf_counter()
+        try:
+            with tracing.span(tracing.JUDGE_BATCH, deployment=self.deployment_name, pairs=len(batch)):
+                response = self.client.beta.chat.completions.parse(
+                    model=self.deployment_name,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT + BATCH_INSTRUCTIONS},
+
+                        {"role": "user", "content": prompt}
+                    ],
+                    response_format=ComparisonScoreBatch
+                )
+            metrics.JUDGE_REQUEST_SECONDS.observe(time.perf_counter() - started)
+            result = ComparisonScoreBatch.model_validate_json(response.choices[0].message.content)
+        except (ValidationError, LengthFinishReasonError, ContentFilterFinishReasonError, ValueError) as e:
+            logger.warning(f"Batch of {len(batch)} comparisons could not be parsed, scoring them one by one: {e}")
+            return {}
+
+        verdicts = {}
+        for item in result.scores:
+            if 0 <= item.index < len(batch):
+                verdicts[batch[item.index]] = item.model_dump_json(exclude={"index"})
+        return verdicts
+
     def assert_semantically(self, expected, actual, threshold=0.75):
         """
         Assert that the semantic similarity score is above the threshold.
@@ -108,7 +259,9 @@ class SemanticSimilarityClient:
         response = json.loads(response)
         score = response["score"]
         # print(response)
-        assert score >= threshold, f"Semantic similarity too low: {score:.2f}. Reason: {response['reason']} Actual: {actual}"
+        if score < threshold:
+            raise SemanticAssertionError(f"Semantic similarity too low: {score:.2f}. Reason: {response['reason']} "
+                                         f"Actual: {actual}", score)
         return score
 
 
@@ -0,0 +1,206 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_CACHE_PATH = os.path.join('.semantic_cache', 'verdicts.sqlite3')
+DEFAULT_MAX_ENTRIES = 100_000
+DEFAULT_MAX_AGE = 30 * 24 * 3600  # Seconds
+DEFAULT_MEMORY_ENTRIES = 4096
+EVICT_EVERY = 256  # Run disk eviction after this many writes
+
+
+class LRUCache:
+    """
+    A small thread-safe in-memory LRU map.
+
+    Attributes:
+        capacity (int): The maximum number of entries kept.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_MEMORY_ENTRIES):
+        self.capacity = capacity
+        self._data: 'OrderedDict[str, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# Shared by every VerdictCache in the process, in front of the on-disk store.
+PROCESS_LRU = LRUCache()
+
+
+class VerdictCache:
+    """
+    A persistent, content-addressed cache of semantic similarity verdicts.
+
+    Verdicts are keyed by a hash of the deployment, prompt version, expected text and actual text,
+    so a byte-identical comparison from an earlier run is answered without calling the LLM. Entries
+    live in a SQLite file and are evicted by age and, beyond ``max_entries``, least recently used
+    first. A process-wide in-memory LRU sits in front of the file; it keeps each verdict's creation
+    time, so ``max_age`` applies to memory hits as well.
+
+    Attributes:
+        path (str): The SQLite file holding the verdicts.
+        max_entries (int): The maximum number of verdicts kept on disk.
+        max_age (float): Seconds after which a verdict is no longer used.
+        hits (int): Lookups answered from memory or disk.
+        misses (int): Lookups that found nothing.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_age: float = DEFAULT_MAX_AGE, memory: LRUCache = PROCESS_LRU):
+        """
+        Initialize the VerdictCache, creating the cache file if needed.
+
+        Args:
+            path (str): The SQLite file holding the verdicts.
+            max_entries (int): The maximum number of verdicts kept on disk.
+            max_age (float): Seconds after which a verdict is no longer used.
+            memory (LRUCache): The in-memory LRU in front of the file. Defaults to the process-wide one.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.memory = memory
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS verdicts ('
+                         'key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS verdicts_accessed ON verdicts (accessed)')
+        self.evict()
+
+    @staticmethod
+    def make_key(deployment: str, prompt_version: str, expected: str, actual: str) -> str:
+        """
+        Build the content address of a comparison.
+
+        Args:
+            deployment (str): The Azure OpenAI deployment judging the comparison.
+            prompt_version (str): The version of the judge prompt.
+            expected (str): The expected text.
+            actual (str): The actual text.
+
+        Returns:
+            str: A hex SHA-256 digest.
+        """
+        digest = hashlib.sha256()
+        for part in (deployment, prompt_version, expected, actual):
+            data = str(part).encode('utf-8')
+            # Length-prefix every field so ('ab', 'c') and ('a', 'bc') never collide.
+            digest.update(len(data).to_bytes(8, 'big'))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a verdict.
+
+        Args:
+            key (str): The key from ``make_key``.
+
+        Returns:
+            str: The cached verdict, or None if there is no fresh one.
+        """
+        return self.get_first([key])
+
+    def get_first(self, keys: Sequence[str]) -> Optional[str]:
+        """
+        Look up the first of several keys that has a fresh verdict, counting one hit or miss in all.
+
+        Args:
+            keys (Sequence[str]): Keys from ``make_key``, in order of preference.
+
+        Returns:
+            str: The cached verdict, or None if none of the keys has a fresh one.
+        """
+        value = None
+        for key in keys:
+            value = self._lookup(key)
+            if value is not None:
+                break
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def _lookup(self, key: str) -> Optional[str]:
+        now = time.time()
+        entry = self.memory.get(key)  # (verdict, created)
+        if entry is not None and entry[1] >= now - self.max_age:
+            return entry[0]
+        with self._lock:
+            row = self._db.execute('SELECT value, created FROM verdicts WHERE key = ? AND created >= ?',
+                                   (key, now - self.max_age)).fetchone()
+            if row is not None:
+                self._db.execute('UPDATE verdicts SET accessed = ? WHERE key = ?', (now, key))
+        if row is None:
+            return None
+        self.memory.put(key, row)
+        return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        """
+        Store a verdict.
+
+        Args:
+            key (str): The key from ``make_key``.
+            value (str): The verdict as returned by the judge.
+        """
+        now = time.time()
+        self.memory.put(key, (value, now))
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO verdicts (key, value, created, accessed) VALUES (?, ?, ?, ?)',
+                             (key, value, now, now))
+            self._writes += 1
+            evict = self._writes % EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Remove verdicts older than ``max_age`` and trim the file to ``max_entries``.
+        """
+        with self._lock:
+            self._db.execute('DELETE FROM verdicts WHERE created < ?', (time.time() - self.max_age,))
+            self._db.execute('DELETE FROM verdicts WHERE key IN (SELECT key FROM verdicts '
+                             'ORDER BY accessed DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def close(self) -> None:
+        """
+        Close the cache file.
+        """
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,68 @@
+import json
+import tracemalloc
+
+from activity import ActivitySet, BotReply, parse_activity_set
+from bench_frame_decoder import make_activity_set
+from copilot_chat_client import BotClient
+
+ACTIVITY_SET = {
+    'watermark': '7',
+    'activities': [
+        {'type': 'message', 'id': 'c|1', 'from': {'id': 'user1', 'role': 'user'}, 'text': 'hi'},
+        {'type': 'typing', 'id': 'c|2', 'from': {'id': 'bot', 'role': 'bot'}, 'replyToId': 'c|1'},
+        {'type': 'message', 'id': 'c|3', 'from': {'id': 'bot', 'role': 'bot'}, 'replyToId': 'c|1',
+         'timestamp': '2025-01-01T00:00:00Z', 'text': 'Pick a city', 'inputHint': 'expectingInput',
+         'channelData': {'large': 'x' * 100}, 'attachments': [{'contentType': 'card', 'content': {}}],
+         'suggestedActions': {'actions': [{'type': 'imBack', 'title': 'Paris', 'value': 'Paris'},
+                                          {'type': 'imBack', 'title': 'Rome', 'value': 'Rome'}]}},
+    ],
+}
+
+
+def test_parse_keeps_correlation_fields():
+    """Test that ids, replyToId, timestamps and input hints survive parsing."""
+    activity_set = parse_activity_set(json.dumps(ACTIVITY_SET))
+    assert activity_set.watermark == '7'
+    reply = activity_set.activities[2]
+    assert (reply.id, reply.reply_to_id, reply.timestamp) == ('c|3', 'c|1', '2025-01-01T00:00:00Z')
+    assert reply.input_hint == 'expectingInput'
+    assert reply.suggested_actions == ('Paris', 'Rome')
+    assert not hasattr(reply, '__dict__')
+
+
+def test_untitled_suggested_actions_are_skipped():
+    """Test that suggested actions without a title never put None into the responses."""
+    activity = {'type': 'message', 'from': {'role': 'bot'}, 'text': 'Pick one',
+                'suggestedActions': {'actions': [{'type': 'imBack', 'value': 'x'},
+                                                 {'type': 'imBack', 'title': 'Rome', 'value': 'Rome'}]}}
+    assert ActivitySet.from_dict({'activities': [activity]}).responses() == ['Pick one', 'Rome']
+
+
+def test_responses_match_plain_extraction():
+    """Test that the compact model yields the same responses as extracting from the plain JSON."""
+    assert ActivitySet.from_dict(ACTIVITY_SET).responses() == ['Pick a city', 'Paris', 'Rome']
+    assert BotClient._extract_bot_responses(ACTIVITY_SET) == ['Pick a city', 'Paris', 'Rome']
+
+
+def test_bot_reply_is_backwards_compatible():
+    """Test that a BotReply compares like the old list of strings and carries the activities."""
+    reply = BotReply(ActivitySet.from_dict(ACTIVITY_SET))
+    assert reply == ['Pick a city', 'Paris', 'Rome']
+    assert reply[0] == 'Pick a city'
+    assert [activity.id for activity in reply.activities] == ['c|1', 'c|2', 'c|3']
+    assert BotReply(ActivitySet()) == []
+
+
+def test_compact_model_uses_less_memory():
+    """Test that a large card-heavy activity set takes far less memory than its plain JSON form."""
+    text = json.dumps(make_activity_set(n_activities=50, card_kb=16, n_actions=5))
+
+    def retained(parse):
+        tracemalloc.start()
+        result = parse(text)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        assert result
+        return size
+
+    assert retained(parse_activity_set) * 5 < retained(json.loads)
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from async_chat_client import AsyncBotClient, get_executor
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_connect_send_receive_disconnect(emulator):
+    """Test a full conversation: connect, one multi-reply turn, a second turn, then disconnect."""
+    async def main():
+        bot = AsyncBotClient(emulator.token_endpoint, base_url=emulator.base_url)
+        await bot.connect()
+        assert bot.conversation_id in emulator.conversations
+        activity_id = await bot.send('Hi')
+        assert activity_id and activity_id == bot.last_activity_id
+        first = await bot.receive(timeout=5)
+        await bot.send('weather')
+        second = await bot.receive(timeout=5, quiet_period=0.2)
+        await bot.disconnect()
+        return bot, first, second
+
+    bot, first, second = run(main())
+    assert first == ['Hello, I am the weather bot.', 'What can I help with?', 'Weather', 'Bye']
+    assert second == ['Which city?', 'Hyderabad', 'Mumbai']
+    assert bot.latency.summary()['turn.complete']['count'] == 2
+    assert {'connect.token', 'connect.conversation', 'connect.websocket', 'send.ack'} <= set(bot.latency.summary())
+
+
+def test_receive_without_reply_times_out_empty(emulator):
+    """Test that a turn the bot does not answer returns an empty reply once the timeout passes."""
+    async def main():
+        async with AsyncBotClient(emulator.token_endpoint, base_url=emulator.base_url) as bot:
+            await bot.send('quiet')
+            return await bot.receive(timeout=0.3)
+
+    assert run(main()) == []
+
+
+def test_receive_after_stream_dropped_raises(emulator):
+    """Test that a stream closed under the client surfaces as an error instead of a silent empty turn."""
+    async def main():
+        async with AsyncBotClient(emulator.token_endpoint, base_url=emulator.base_url) as bot:
+            await bot.send('Hi')
+            await bot.receive(timeout=5)
+            emulator.drop_streams()
+            with pytest.raises(Exception, match='WebSocket connection closed'):
+                await bot.receive(timeout=5)
+
+    run(main())
+
+
+def test_concurrent_conversations_share_a_small_executor(emulator):
+    """Test that many conversations on one loop run their HTTP calls only on the client's executor."""
+    threads = set()
+
+    class RecordingExecutor(ThreadPoolExecutor):
+        def submit(self, fn, *args, **kwargs):
+            return super().submit(lambda: threads.add(threading.current_thread().name) or fn(*args, **kwargs))
+
+    async def conversation(executor):
+        async with AsyncBotClient(emulator.token_endpoint, base_url=emulator.base_url, executor=executor) as bot:
+            await bot.send('weather')
+            return await bot.receive(timeout=10, quiet_period=0.2), bot.conversation_id
+
+    async def main():
+        with RecordingExecutor(max_workers=4, thread_name_prefix='test-http') as executor:
+            return await asyncio.gather(*(conversation(executor) for _ in range(50)))
+
+    results = run(main())
+    assert [reply for reply, _ in results] == [['Which city?', 'Hyderabad', 'Mumbai']] * 50
+    assert len({conversation_id for _, conversation_id in results}) == 50
+    assert threads and all(name.startswith('test-http') for name in threads)
+
+
+def test_default_executor_is_shared():
+    """Test that clients without an executor share one process-wide pool instead of the loop's default."""
+    assert AsyncBotClient('http://token').executor is AsyncBotClient('http://token').executor is get_executor()
@@ -0,0 +1,18 @@
+import bench_suite
+
+
+def test_benchmarks_run_offline():
+    """Test that every benchmark runs without a network and reports throughput and memory."""
+    benchmarks = (bench_suite.receive_benchmarks() + bench_suite.extract_benchmarks()
+                  + bench_suite.send_benchmarks() + bench_suite.semantic_benchmarks(batch_size=3))
+    report = bench_suite.run(benchmarks, min_time=0.001, repeat=1)
+    assert [result['name'] for result in report['results']] == [name for name, _ in benchmarks]
+    assert all(result['ops_per_sec'] > 0 and result['alloc_kib'] > 0 for result in report['results'])
+
+
+def test_compare_flags_slower_benchmarks():
+    """Test that only benchmarks slower than the tolerance are reported."""
+    previous = {'results': [{'name': 'a', 'ops_per_sec': 1000}, {'name': 'b', 'ops_per_sec': 1000}]}
+    report = {'results': [{'name': 'a', 'ops_per_sec': 900}, {'name': 'b', 'ops_per_sec': 700},
+                          {'name': 'c', 'ops_per_sec': 1}]}
+    assert bench_suite.compare(report, previous, tolerance=0.2) == ['b: 700 ops/s, was 1,000 ops/s']
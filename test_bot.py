@@ -1,23 +1,42 @@
 import json
 import os
+from functools import partial
 from dotenv import load_dotenv
 import pytest
+from conversation_pool import ConversationPool
 from copilot_chat_client import BotClient
+from long_poll import get_poller
+from scenario import ScenarioRunner, load_scenarios
 
 # Load environment variables
 load_dotenv()
 
 # Fetch the endpoint
 BOT_ENDPOINT = os.getenv("BOT_ENDPOINT")
+SCENARIO_DIR = os.getenv("SCENARIO_DIR", os.path.join(os.path.dirname(__file__), "scenarios"))
+SCENARIOS = load_scenarios(SCENARIO_DIR)
+# Set to "poll" to read replies by polling Direct Line where WebSockets are blocked
+TRANSPORT = os.getenv("DIRECT_LINE_TRANSPORT", "websocket")
+
+# Compare every test's turn latencies with the stored baselines (see latency_baseline.py); the pool
+# connects in the background, so connect latencies are left out.
+pytestmark = pytest.mark.latency_baseline(pooled=True)
+
+
+@pytest.fixture(scope="session")
+def conversation_pool():
+    """Fixture that keeps connected conversations ready so tests skip the connect latency."""
+    client_factory = partial(BotClient, poller=get_poller()) if TRANSPORT == "poll" else BotClient
+    with ConversationPool(BOT_ENDPOINT, size=2, client_factory=client_factory) as pool:
+        yield pool
 
 
 @pytest.fixture
-def bot_client():
-    """Fixture to initialize and connect to the bot."""
-    client = BotClient(BOT_ENDPOINT)
-    client.connect()
+def bot_client(conversation_pool):
+    """Fixture to hand out a connected bot conversation."""
+    client = conversation_pool.acquire()
     yield client
-    client.disconnect()  # Ensure the connection is properly closed after tests
+    conversation_pool.release(client)  # Ensure the connection is properly closed after tests
 
 
 def test_connection(bot_client):
@@ -36,37 +55,20 @@ def test_send_and_receive(bot_client):
     assert any("hello" in msg.lower() for msg in response), f"Expected greeting in bot response: {response}"
 
 
-def test_multiple_messages(bot_client):
-    """Test a conversation with multiple exchanges."""
-    messages = ["Hi", "Weather", "Hyderabad", "Tomorrow"]
-    for msg in messages:
-        bot_client.send(msg)
-        response = bot_client.receive()
-        print(response)
-        assert response is not None, f"No response for message: {msg}"
-        assert '' not in response, f"Empty response for message: {msg}"
-
-
-def test_conversation_flow(bot_client):
-    """Test a conversation flow with multiple specific messages."""
-    messages = [
-        "hi",
-        "weather",
-        "hyderabad",
-        "tomorrow",
-        "Rainy",
-        "Get Forecast For Tomorrow",
-        "Mumbai",
-        "Ok Bye",
-        "Yes",
-        "No"
-    ]
-    for msg in messages:
-        bot_client.send(msg)
-        response = bot_client.receive()
-        print(response)
-        assert response is not None, f"No response for message: {msg}"
-        assert '' not in response, f"Empty response for message: {msg}"
+@pytest.fixture(scope="session")
+def scenario_results(conversation_pool):
+    """Fixture that runs every scenario in parallel on the pool, once per session."""
+    results = ScenarioRunner(conversation_pool).run_all(SCENARIOS)
+    return {result.name: result for result in results}
+
+
+@pytest.mark.parametrize('scenario', SCENARIOS, ids=lambda scenario: scenario.name)
+def test_scenario(scenario_results, scenario, latency_baseline):
+    """Test a conversation flow from the scenario files."""
+    result = scenario_results[scenario.name]
+    latency_baseline.merge(result.latency)
+    print(result.report())
+    assert result.passed, result.report()
 
 
 if __name__ == "__main__":
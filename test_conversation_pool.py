@@ -0,0 +1,87 @@
+import threading
+import time
+from functools import partial
+
+import pytest
+
+from conversation_pool import ConversationPool, TokenCache
+from copilot_chat_client import BotClient
+from directline_emulator import TOKEN_TTL
+
+SINGLE_USE = pytest.mark.parametrize('emulator', [{'single_use_tokens': True}], indirect=True,
+                                     ids=['single-use'])
+
+
+def make_pool(emulator, size: int) -> ConversationPool:
+    return ConversationPool(emulator.token_endpoint, size=size,
+                            client_factory=partial(BotClient, base_url=emulator.base_url))
+
+
+def test_token_is_reused_until_it_expires(emulator):
+    """Test that a reusable token is fetched once and then served from the cache."""
+    tokens = TokenCache(emulator.token_endpoint)
+    issued = emulator.tokens_issued
+    assert tokens.needs_refresh()
+    assert tokens.get() == tokens.get()
+    assert emulator.tokens_issued == issued + 1
+    assert not tokens.needs_refresh()
+
+
+def test_token_within_refresh_margin_is_refetched(emulator):
+    """Test that a token closer to its expiry than the refresh margin is replaced."""
+    tokens = TokenCache(emulator.token_endpoint, refresh_margin=TOKEN_TTL)
+    first = tokens.get()
+    assert tokens.needs_refresh()
+    assert tokens.get() != first
+
+
+@SINGLE_USE
+def test_single_use_token_is_handed_out_once(emulator):
+    """Test that concurrent get() calls never share a token bound to a conversation."""
+    tokens = TokenCache(emulator.token_endpoint)
+    tokens.refresh()  # As the pool's maintainer does; the token is not cached for anyone else
+    results = []
+    barrier = threading.Barrier(16)
+
+    def get():
+        barrier.wait()
+        results.append(tokens.get())
+
+    threads = [threading.Thread(target=get) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(results)) == len(results) == 16
+    assert not tokens.needs_refresh()
+
+
+@SINGLE_USE
+def test_pool_opens_each_conversation_with_its_own_token(emulator):
+    """Test that pooled conversations never join each other's conversation, nor fetch tokens while full."""
+    with make_pool(emulator, size=2) as pool:
+        deadline = time.monotonic() + 10
+        while pool._ready.qsize() < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        issued = emulator.tokens_issued
+        for _ in range(3):
+            pool._wakeup.set()
+            time.sleep(0.05)
+        assert emulator.tokens_issued == issued
+
+        clients = [pool.acquire(timeout=10) for _ in range(2)]
+        assert len({client.conversation_id for client in clients}) == 2
+        for client in clients:
+            assert emulator.conversations[client.conversation_id].starts == 1
+            pool.release(client)
+
+
+def test_released_conversation_is_replaced(emulator):
+    """Test that a released conversation is closed and a fresh one takes its place."""
+    with make_pool(emulator, size=1) as pool:
+        first = pool.acquire(timeout=10)
+        pool.release(first)
+        second = pool.acquire(timeout=10)
+        assert not first.ws.connected
+        assert second.ws.connected and second.conversation_id != first.conversation_id
+        pool.release(second)
@@ -0,0 +1,78 @@
+import contextvars
+import threading
+
+import pytest
+
+from deferred_assertions import DeferredSemanticAssertions
+
+request_id: contextvars.ContextVar[str] = contextvars.ContextVar('request_id', default='unset')
+
+
+class RecordingEvaluator:
+    """An evaluator scoring by word overlap, recording the thread and context of each call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def assert_semantically(self, expected: str, actual: str, threshold: float) -> float:
+        self.calls.append((threading.current_thread().name, request_id.get()))
+        if actual == 'explode':
+            raise RuntimeError('judge unavailable')
+        expected_words, actual_words = set(expected.split()), set(actual.split())
+        score = len(expected_words & actual_words) / len(expected_words | actual_words)
+        assert score >= threshold, f"Score {score:.2f} below {threshold}. Actual: {actual}"
+        return score
+
+
+def test_failure_is_raised_on_exit_with_its_label():
+    """Test that a failed assertion does not interrupt the block and is raised on leaving it, labelled."""
+    with pytest.raises(AssertionError) as error:
+        with DeferredSemanticAssertions(RecordingEvaluator()) as judge:
+            judge.expect('sunny and warm', 'sunny and warm', label='greeting')
+            judge.expect('sunny and warm', 'heavy rain', label='forecast')
+            reached = True
+    assert reached
+    assert str(error.value).startswith('1 of 2 semantic assertions failed:\nforecast: Score 0.00')
+
+
+def test_failures_are_aggregated():
+    """Test that every failed assertion is reported at once, unlabelled ones by position."""
+    judge = DeferredSemanticAssertions(RecordingEvaluator())
+    judge.expect('a b', 'a b')
+    judge.expect('a b', 'c d')
+    judge.expect('a b', 'a c')
+    with pytest.raises(AssertionError) as error:
+        judge.verify()
+    lines = str(error.value).splitlines()
+    assert lines[0] == '2 of 3 semantic assertions failed:'
+    assert [line.split(':')[0] for line in lines if line.startswith('assertion')] == ['assertion 2', 'assertion 3']
+    assert judge.verify() == []
+
+
+def test_scores_are_returned_in_order():
+    """Test that verify() returns the scores of passed assertions in registration order."""
+    with DeferredSemanticAssertions(RecordingEvaluator()) as judge:
+        futures = [judge.expect('a b', 'a b', threshold=0.5), judge.expect('a b', 'a b c', threshold=0.5)]
+        assert judge.verify() == [1.0, pytest.approx(2 / 3)]
+    assert futures[0].result() == 1.0
+
+
+def test_evaluator_error_is_reported():
+    """Test that an evaluator exception is reported as a judge error of its assertion, and its future raises it."""
+    with pytest.raises(AssertionError, match=r"turn 1: judge error RuntimeError: judge unavailable Actual: explode"):
+        with DeferredSemanticAssertions(RecordingEvaluator()) as judge:
+            future = judge.expect('a', 'explode', label='turn 1')
+    with pytest.raises(RuntimeError):
+        future.result()
+
+
+def test_context_is_copied_to_the_judge_threads():
+    """Test that context variables set by the caller are visible to the evaluator on its worker threads."""
+    evaluator = RecordingEvaluator()
+    with DeferredSemanticAssertions(evaluator, max_workers=2) as judge:
+        for n in range(4):
+            token = request_id.set(f'turn {n}')
+            judge.expect('a', 'a')
+            request_id.reset(token)
+    assert sorted(context for _, context in evaluator.calls) == [f'turn {n}' for n in range(4)]
+    assert all(thread.startswith('semantic-judge') for thread, _ in evaluator.calls)
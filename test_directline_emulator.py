@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+import requests
+
+from async_chat_client import run_conversation
+from copilot_chat_client import BotClient
+from directline_emulator import DirectLineEmulator
+from reconnect import Backoff
+
+
+@pytest.fixture
+def bot_client(emulator):
+    """Fixture to initialize and connect a BotClient to the emulator."""
+    client = BotClient(emulator.token_endpoint, base_url=emulator.base_url)
+    client.connect()
+    yield client
+    client.disconnect()
+
+
+def test_connection(bot_client):
+    """Test that the unmodified client connects to the emulator by changing only the base URL."""
+    assert bot_client.conversation_id is not None, "Conversation ID should not be None"
+    assert bot_client.ws.connected, "WebSocket should be established"
+
+
+def test_multi_message_turn_with_suggested_actions(bot_client):
+    """Test that every reply of a turn and its suggested actions are received, despite fragmentation."""
+    bot_client.send("Hi")
+    response = bot_client.receive(timeout=5)
+    assert response == ['Hello, I am the weather bot.', 'What can I help with?', 'Weather', 'Bye']
+
+
+def test_conversation_flow(bot_client):
+    """Test consecutive turns only return the replies to their own message."""
+    for message, expected in [("weather", ["Which city?", "Hyderabad", "Mumbai"]), ("Hyderabad", ["You said: Hyderabad"])]:
+        bot_client.send(message)
+        assert bot_client.receive(timeout=5, quiet_period=0.2) == expected
+    assert bot_client.latency.summary()['turn.complete']['count'] == 2
+
+
+def test_rejects_invalid_token(emulator, bot_client):
+    """Test that activities posted with another conversation's token are refused."""
+    response = requests.post(f'{emulator.base_url}/conversations/{bot_client.conversation_id}/activities',
+                             headers={'Authorization': 'Bearer wrong'}, json={'type': 'message', 'text': 'hi'})
+    assert response.status_code == 403
+
+
+def test_many_concurrent_conversations(emulator):
+    """Test that one event loop can drive many conversations against the emulator at once."""
+    async def main():
+        conversations = [run_conversation(emulator.token_endpoint, ['weather'], timeout=10,
+                                          base_url=emulator.base_url) for _ in range(200)]
+        return await asyncio.gather(*conversations)
+
+    results = asyncio.run(main())
+    assert results == [[['Which city?', 'Hyderabad', 'Mumbai']]] * 200
+
+
+def test_reconnects_from_watermark(emulator):
+    """Test that a dropped stream is reopened and only activities after the watermark are redelivered."""
+    client = BotClient(emulator.token_endpoint, base_url=emulator.base_url, backoff=Backoff(initial_delay=0.01))
+    client.connect()
+    client.send("weather")
+    assert client.receive(timeout=5, quiet_period=0.2) == ["Which city?", "Hyderabad", "Mumbai"]
+
+    emulator.drop_streams()
+    client.send("Hyderabad")
+    assert client.receive(timeout=5, quiet_period=0.2) == ["You said: Hyderabad"]
+    assert client.reconnects == 1
+    assert client.bytes_saved > 0
+    assert client.latency.summary()['connect.resume']['count'] == 1
+    client.disconnect()
+
+
+def test_gives_up_when_reconnect_fails():
+    """Test that receive() reports the closed stream once the reconnect retries are used up."""
+    with DirectLineEmulator() as server:
+        client = BotClient(server.token_endpoint, base_url=server.base_url,
+                           backoff=Backoff(initial_delay=0.01, max_attempts=2))
+        client.connect()
+    with pytest.raises(Exception, match='WebSocket connection closed'):
+        client.receive(timeout=5)
+    assert client.reconnects == 0
+    assert client.backoff.attempts == 2
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from bench_frame_decoder import make_activity_set, split_frames
+from frame_decoder import ActivityStreamDecoder
+
+
+@pytest.mark.parametrize("frame_size", [1, 7, 64, 4096])
+def test_reassembles_split_activity_set(frame_size):
+    """Test that an activity set split at arbitrary boundaries decodes to the original document."""
+    activity_set = make_activity_set(n_activities=2, card_kb=2, n_actions=3)
+    decoder = ActivityStreamDecoder()
+    documents = []
+    for frame in split_frames(json.dumps(activity_set), frame_size):
+        documents.extend(decoder.feed(frame))
+    assert documents == [activity_set], "Decoded document should match the original activity set"
+    assert not decoder.pending, "No partial document should be left over"
+
+
+def test_multiple_documents_in_one_frame():
+    """Test that back-to-back documents in one frame are emitted in order."""
+    decoder = ActivityStreamDecoder()
+    first, second = {'activities': [{'text': '}{'}]}, {'activities': [], 'watermark': '2'}
+    text = json.dumps(first) + '\n' + json.dumps(second)
+    assert decoder.feed(text[:5]) == []
+    assert decoder.feed(text[5:]) == [first, second]
+
+
+def test_escaped_quote_across_frames():
+    """Test that an escape sequence split between frames does not end the string early."""
+    decoder = ActivityStreamDecoder()
+    assert decoder.feed('{"text": "say \\') == []
+    assert decoder.feed('"hi\\" {"}') == [{'text': 'say "hi" {'}]
+
+
+def test_keep_alive_and_malformed_frames():
+    """Test that empty keep-alive frames are ignored and malformed documents are dropped."""
+    decoder = ActivityStreamDecoder()
+    assert decoder.feed('') == []
+    assert decoder.feed('{"a": tru}') == []
+    assert decoder.feed('{"a": true}') == [{'a': True}]
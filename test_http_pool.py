@@ -0,0 +1,45 @@
+import pytest
+
+import http_pool
+from http_pool import DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE, close_pool, configure_pool, get_session
+
+
+@pytest.fixture(autouse=True)
+def default_pool():
+    """Fixture that restores the default pool settings after each test."""
+    close_pool()
+    yield
+    configure_pool(DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE)
+    close_pool()
+
+
+def test_session_is_shared():
+    """Test that every caller gets the same pooled session until the pool is closed."""
+    session = get_session()
+    assert get_session() is session
+    assert session.get_adapter('https://directline.botframework.com')._pool_maxsize == DEFAULT_POOL_MAXSIZE
+
+
+def test_configure_pool_resizes_the_session_in_use(emulator):
+    """Test that configuring the pool changes the session clients already hold, which keeps working."""
+    session = get_session()
+    configure_pool(pool_maxsize=5, host_limits={emulator.base_url: 2})
+    assert get_session() is session
+    assert session.get_adapter('https://example.com')._pool_maxsize == 5
+    limited = session.get_adapter(f'{emulator.base_url}/conversations')
+    assert limited._pool_maxsize == 2 and limited._pool_block
+
+    configure_pool(pool_maxsize=7)
+    assert emulator.base_url not in session.adapters
+    assert session.get_adapter(emulator.base_url)._pool_maxsize == 7
+    assert session.get(emulator.token_endpoint, timeout=5).json()['token']
+
+
+def test_close_pool_starts_a_new_session(emulator):
+    """Test that closing the pool replaces the shared session and the old one still works."""
+    old = get_session()
+    assert old.get(emulator.token_endpoint, timeout=5).ok
+    close_pool()
+    assert http_pool._session is None
+    assert get_session() is not old
+    assert old.get(emulator.token_endpoint, timeout=5).ok
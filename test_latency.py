@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+from latency import LatencyHistogram, LatencyRecorder
+
+
+def test_percentiles_within_relative_error():
+    """Test that histogram percentiles stay within the bucket resolution of the exact values."""
+    rng = random.Random(7)
+    values = sorted(rng.lognormvariate(-1, 1) for _ in range(10_000))
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    for percent in (50, 90, 99):
+        exact = values[int(len(values) * percent / 100) - 1]
+        assert histogram.percentile(percent) == pytest.approx(exact, rel=0.02)
+    assert histogram.summary()['max'] == values[-1]
+
+
+def test_merge_and_serialization_round_trip():
+    """Test that merging serialized histograms equals recording everything in one."""
+    combined, first, second = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for i in range(1, 200):
+        combined.record(i / 1000)
+        (first if i % 2 else second).record(i / 1000)
+    merged = LatencyHistogram.from_dict(first.to_dict())
+    merged.merge(LatencyHistogram.from_dict(second.to_dict()))
+    assert merged.summary() == pytest.approx(combined.summary())
+
+
+def test_recorder_forwards_to_parent():
+    """Test that per-conversation recorders also feed the aggregate recorder."""
+    parent = LatencyRecorder()
+    conversations = [LatencyRecorder(parent=parent) for _ in range(3)]
+    for n, recorder in enumerate(conversations):
+        recorder.record('send.ack', 0.01 * (n + 1))
+    assert conversations[0].summary()['send.ack']['count'] == 1
+    assert parent.summary()['send.ack']['count'] == 3
+    assert parent.summary()['send.ack']['max'] == pytest.approx(0.03)
+    assert 'send.ack' in parent.format()
@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+from latency import LatencyHistogram, LatencyRecorder
+from latency_baseline import LatencyBaselines, regression_limit, run_statistics
+
+pytest_plugins = ['pytester']
+
+MARKED_TEST = '''
+import os
+import pytest
+from latency import PROCESS_LATENCY
+
+@pytest.mark.latency_baseline
+def test_turn():
+    for _ in range(20):
+        PROCESS_LATENCY.record('turn.complete', float(os.environ['TURN_SECONDS']))
+'''
+
+POOLED_TEST = '''
+import os
+import pytest
+from latency import PROCESS_LATENCY
+
+@pytest.mark.latency_baseline(pooled=True)
+def test_turn():
+    for _ in range(20):
+        PROCESS_LATENCY.record('connect.websocket', float(os.environ['CONNECT_SECONDS']))
+        PROCESS_LATENCY.record('turn.complete', 0.1)
+'''
+
+
+def test_histogram_difference():
+    """Test that a recorder's difference to a snapshot holds only the newer values."""
+    recorder = LatencyRecorder()
+    recorder.record('turn.complete', 0.1)
+    snapshot = LatencyRecorder.from_dict(recorder.to_dict())
+    for seconds in (1.0, 2.0, 3.0):
+        recorder.record('turn.complete', seconds)
+    recorder.record('send.ack', 0.05)
+
+    newer = recorder.difference(snapshot)
+    assert newer.histograms['turn.complete'].count == 3
+    assert newer.histograms['turn.complete'].percentile(50) == pytest.approx(2.0, rel=0.02)
+    assert newer.histograms['turn.complete'].min > 0.9
+    assert recorder.difference(LatencyRecorder.from_dict(recorder.to_dict())).histograms == {}
+    assert LatencyHistogram().difference(LatencyHistogram()).count == 0
+
+
+def test_regression_limit_accounts_for_noise():
+    """Test that the limit is the tolerance over the median, widened for noisy histories."""
+    assert regression_limit([1.0, 1.0, 1.0], 0.2) == pytest.approx(1.2)
+    assert regression_limit([1.0, 2.0, 3.0], 0.2) == pytest.approx(2.0 + 3 * 1.4826)
+
+
+def test_baselines_compare_after_min_runs(tmp_path):
+    """Test that runs are compared only once enough history exists, and that history is bounded."""
+    path = str(tmp_path / 'baselines.json')
+    baselines = LatencyBaselines(path, tolerance=0.5, history=4, min_runs=3)
+    recorder = LatencyRecorder()
+    recorder.record('turn.complete', 1.0)
+    fast = run_statistics(recorder)
+    recorder.record('turn.complete', 3.0)
+    recorder.record('turn.complete', 3.0)
+    slow = run_statistics(recorder)
+
+    for _ in range(2):
+        assert baselines.compare('t', slow) == []
+        baselines.add('t', fast)
+    baselines.add('t', fast)
+    regressions = baselines.compare('t', slow)
+    assert [regression.split()[:2] for regression in regressions] == [['turn.complete', 'p50'],
+                                                                       ['turn.complete', 'p95']]
+
+    for _ in range(3):
+        baselines.add('t', slow)
+    baselines.save()
+    reloaded = LatencyBaselines(path, tolerance=0.5, history=4, min_runs=3)
+    assert len(reloaded.runs['t']['turn.complete']) == 4
+    assert reloaded.compare('t', slow) == []
+
+
+def test_plugin_fails_or_warns_on_regression(pytester, monkeypatch):
+    """Test that a marked test fails once its latency regresses, or only warns if configured so."""
+    monkeypatch.setenv('PYTHONPATH', os.path.dirname(os.path.abspath(__file__)))
+    pytester.makeconftest("pytest_plugins = ['latency_baseline']")
+    pytester.makepyfile(MARKED_TEST)
+
+    monkeypatch.setenv('TURN_SECONDS', '0.1')
+    for _ in range(3):
+        pytester.runpytest_subprocess().assert_outcomes(passed=1)
+
+    monkeypatch.setenv('TURN_SECONDS', '0.3')
+    result = pytester.runpytest_subprocess('--latency-no-update')
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(['*turn.complete p50 300.*ms > limit 120.*ms*'])
+    result = pytester.runpytest_subprocess('--latency-regression=warn')
+    result.assert_outcomes(passed=1, warnings=1)
+    pytester.runpytest_subprocess().assert_outcomes(failed=1)  # The regressed run was not stored
+
+    for _ in range(3):
+        pytester.runpytest_subprocess('--latency-regression=off').assert_outcomes(passed=1)
+    pytester.runpytest_subprocess().assert_outcomes(passed=1)
+
+
+def test_pooled_suite_ignores_background_connects(pytester, monkeypatch):
+    """Test that a pooled test is not measured by connects its pool happened to make while it ran."""
+    monkeypatch.setenv('PYTHONPATH', os.path.dirname(os.path.abspath(__file__)))
+    pytester.makeconftest("pytest_plugins = ['latency_baseline']")
+    pytester.makepyfile(POOLED_TEST)
+
+    monkeypatch.setenv('CONNECT_SECONDS', '0.1')
+    for _ in range(3):
+        pytester.runpytest_subprocess().assert_outcomes(passed=1)
+    monkeypatch.setenv('CONNECT_SECONDS', '2.0')
+    pytester.runpytest_subprocess().assert_outcomes(passed=1)
+    baselines = LatencyBaselines(str(pytester.path / '.latency_baselines.json'))
+    assert list(baselines.runs['test_pooled_suite_ignores_background_connects.py::test_turn']) == ['turn.complete']
@@ -0,0 +1,45 @@
+import pytest
+
+from directline_emulator import DirectLineEmulator
+from load_runner import LoadProfile, LoadResult, NO_REPLY, run_load
+
+
+def test_profile_ramps_users_up_and_down():
+    """Test that users start over the ramp-up and stop over the ramp-down in reverse order."""
+    profile = LoadProfile(users=4, ramp_up=8, steady=10, ramp_down=4)
+    assert [profile.start_offset(user) for user in range(4)] == [0, 2, 4, 6]
+    assert [profile.stop_offset(user) for user in range(4)] == [22, 21, 20, 19]
+    assert profile.duration == 22
+    with pytest.raises(ValueError):
+        LoadProfile(users=0)
+
+
+def test_results_merge_across_workers():
+    """Test that serialized worker results merge into one report."""
+    first, second = LoadResult(), LoadResult()
+    first.turns, first.elapsed = 3, 2.0
+    first.errors[NO_REPLY] += 1
+    first.latency.record('turn.complete', 0.1)
+    second.turns, second.elapsed = 5, 2.5
+    second.errors[NO_REPLY] += 2
+    second.latency.record('turn.complete', 0.2)
+
+    merged = LoadResult()
+    for result in (first, second):
+        merged.merge(LoadResult.from_dict(result.to_dict()))
+    assert merged.turns == 8
+    assert merged.errors == {NO_REPLY: 3}
+    assert merged.elapsed == 2.5
+    assert merged.latency.summary()['turn.complete']['count'] == 2
+    assert '8 turns' in merged.format()
+
+
+def test_run_load_against_emulator():
+    """Test a short multi-process run against the local emulator."""
+    with DirectLineEmulator(response_delay=0.01) as emulator:
+        result = run_load(emulator.token_endpoint, ['hello', 'bye'], LoadProfile(users=6, ramp_up=0.5, steady=1),
+                          workers=2, base_url=emulator.base_url, timeout=5, quiet_period=0.1, think_time=0.05)
+    assert not result.errors
+    assert result.conversations >= 6
+    assert result.turns >= 2 * result.conversations
+    assert result.latency.summary()['turn.complete']['count'] == result.turns
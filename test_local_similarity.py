@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from deferred_assertions import SemanticAssertionError
+from local_similarity import TieredSimilarityEvaluator, lexical_similarity
+
+
+class _StubJudge:
+    """Stands in for SemanticSimilarityClient and records the pairs it was asked to judge."""
+
+    def __init__(self, score):
+        self.score = score
+        self.pairs = []
+
+    def get_similarity_score(self, expected, actual):
+        self.pairs.append((expected, actual))
+        return json.dumps({'score': self.score, 'reason': 'stub', 'decision': 'Similar'})
+
+
+def test_lexical_similarity_orders_pairs():
+    """Test that the lexical score separates identical, paraphrased and unrelated texts."""
+    assert lexical_similarity("Hello  there", "hello there") == 1.0
+    close = lexical_similarity("Garbage collection reclaims unused memory", "Garbage collection reclaims memory")
+    unrelated = lexical_similarity("The Eiffel Tower is in Paris", "Quantum chromodynamics")
+    assert 0.5 < close < 1.0
+    assert unrelated < 0.1
+
+
+def test_clear_pairs_are_decided_locally():
+    """Test that exact matches pass and unrelated answers fail without calling the judge."""
+    judge = _StubJudge(score=1.0)
+    evaluator = TieredSimilarityEvaluator(judge)
+    assert evaluator.assert_semantically("Hello", "hello") == 1.0
+    with pytest.raises(AssertionError):
+        evaluator.assert_semantically("abc", "xyz")
+    assert judge.pairs == []
+    assert evaluator.calls_avoided == 2
+
+
+def test_ambiguous_pairs_are_escalated():
+    """Test that the uncertain middle band is scored by the LLM judge."""
+    judge = _StubJudge(score=0.5)
+    evaluator = TieredSimilarityEvaluator(judge)
+    with pytest.raises(SemanticAssertionError, match="0.50") as error:
+        evaluator.assert_semantically("Objects no longer referenced", "Objects that are unreachable", threshold=0.8)
+    assert error.value.score == 0.5
+    assert evaluator.remote_calls == 1
+    assert "1 sent to the LLM judge" in evaluator.report()
+
+
+def test_low_threshold_is_not_failed_locally():
+    """Test that a threshold below the fail band lowers it, so answers the judge could pass are escalated."""
+    judge = _StubJudge(score=0.4)
+    evaluator = TieredSimilarityEvaluator(judge, fail_below=0.5)
+    expected, actual = "Garbage collection reclaims unused memory", "Memory is reclaimed by the collector"
+    assert evaluator.assert_semantically(expected, actual, threshold=0.3) == 0.4
+    assert evaluator.assert_semantically("abc", "xyz", threshold=0.0) == 0.4
+    with pytest.raises(AssertionError, match="local fail band 0.30"):
+        evaluator.assert_semantically("abc", "xyz", threshold=0.3)
+    assert len(judge.pairs) == 2 and evaluator.local_fails == 1
@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+from copilot_chat_client import BotClient
+from long_poll import ActivityPoller
+from rate_limiter import AdaptiveRateLimiter
+from reconnect import Backoff
+
+
+class ScriptedSession:
+    """A session answering each GET with the next scripted response, then with ``idle``, recording when it was asked."""
+
+    def __init__(self, *responses, idle):
+        self.responses = list(responses)
+        self.idle = idle
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append(time.monotonic())
+        return self.responses.pop(0) if self.responses else self.idle
+
+
+ACTIVITIES = {'activities': [{'id': 'c|1', 'type': 'message', 'from': {'role': 'bot'}, 'text': 'hi'}],
+              'watermark': '1'}
+
+
+@pytest.fixture
+def poller():
+    """Fixture for a poller with short intervals so the tests observe its backoff quickly."""
+    poller = ActivityPoller(min_interval=0.05, max_interval=0.4)
+    yield poller
+    poller.close()
+
+
+def test_many_clients_share_one_poller(emulator, poller):
+    """Test that clients in many threads receive their own replies, as over WebSocket, through one poller."""
+    errors = []
+
+    def converse(n):
+        client = BotClient(emulator.token_endpoint, base_url=emulator.base_url, poller=poller)
+        client.connect()
+        try:
+            client.send('Hi')
+            assert client.receive(timeout=5) == ['Hello, I am the weather bot.', 'What can I help with?',
+                                                 'Weather', 'Bye']
+            client.send(f'city {n}')
+            assert client.receive(timeout=5, quiet_period=0.3) == [f'You said: city {n}']
+        except AssertionError as e:
+            errors.append(e)
+        finally:
+            client.disconnect()
+
+    threads = [threading.Thread(target=converse, args=(n,)) for n in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert not poller._channels
+
+
+def test_poll_interval_adapts(emulator, poller):
+    """Test that an idle conversation is polled less and less often, and quickly again after a send."""
+    client = BotClient(emulator.token_endpoint, base_url=emulator.base_url, poller=poller)
+    client.connect()
+    threading.Event().wait(1.0)
+    assert client.ws.interval == poller.max_interval
+
+    client.send('weather')
+    assert client.ws.interval == poller.min_interval
+    assert client.receive(timeout=2, quiet_period=0.2) == ['Which city?', 'Hyderabad', 'Mumbai']
+    assert client.watermark == client.ws.watermark
+    client.disconnect()
+    assert not client.ws.connected
+
+
+def test_stopped_polling_resumes_from_watermark(emulator, poller):
+    """Test that a channel that stopped polling is reopened from the watermark without losing replies."""
+    client = BotClient(emulator.token_endpoint, base_url=emulator.base_url, poller=poller,
+                       backoff=Backoff(initial_delay=0.01))
+    client.connect()
+    client.send('weather')
+    assert client.receive(timeout=2, quiet_period=0.2) == ['Which city?', 'Hyderabad', 'Mumbai']
+
+    channel = client.ws
+    channel.close()
+    client.send('Paris')
+    assert client.receive(timeout=2, quiet_period=0.2) == ['You said: Paris']
+    assert client.reconnects == 1 and client.ws is not channel
+    client.disconnect()
+
+
+def test_throttled_poll_waits_for_retry_after(make_response):
+    """Test that a throttled poll is retried after its Retry-After, even beyond the maximum interval."""
+    session = ScriptedSession(make_response(429, retry_after='0.6'), make_response(200, ACTIVITIES),
+                              idle=make_response(200, {'activities': []}))
+    poller = ActivityPoller(session, min_interval=0.05, max_interval=0.1)
+    try:
+        channel = poller.register('http://directline', 'c', 'token')
+        _, _, (activity_set,) = channel.get(timeout=5)
+        assert activity_set.watermark == '1' and channel.watermark == '1'
+        assert session.calls[1] - session.calls[0] >= 0.6
+    finally:
+        poller.close()
+
+
+def test_polls_go_through_the_limiter(make_response):
+    """Test that with a limiter a throttled poll is retried by it and counted against the shared limits."""
+    session = ScriptedSession(make_response(503, retry_after='0.2'), make_response(200, ACTIVITIES),
+                              idle=make_response(200, {'activities': []}))
+    limiter = AdaptiveRateLimiter()
+    poller = ActivityPoller(session, min_interval=0.05, max_interval=0.1, limiter=limiter)
+    try:
+        channel = poller.register('http://directline', 'c', 'token')
+        _, _, (activity_set,) = channel.get(timeout=5)
+        assert activity_set.activities[0].text == 'hi'
+        assert limiter.throttled == 1 and limiter.throttled_time >= 0.2
+    finally:
+        poller.close()
@@ -0,0 +1,67 @@
+import threading
+
+import requests
+
+import metrics
+from copilot_chat_client import BotClient
+from latency import LatencyRecorder
+
+
+def test_counter_sums_thread_shards():
+    """Test that increments from many threads, each on its own shard, all count."""
+    counter = metrics.Counter('test_increments_total', 'Increments.', registry=None)
+
+    def work():
+        for _ in range(10_000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.value == 80_000
+    assert len(counter._shards) == 8
+
+
+def test_exposition_format():
+    """Test the Prometheus text rendering of counters, histograms and latency recorders."""
+    registry = metrics.Registry()
+    metrics.Counter('test_sends_total', 'Sends.', registry=registry).inc(3)
+    histogram = metrics.Histogram('test_seconds', 'Durations.', buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+    recorder = LatencyRecorder()
+    for value in (0.05, 0.2, 0.3):
+        recorder.record('turn.complete', value)
+    metrics.LatencyCollector('test_latency_seconds', 'Latencies.', recorder, buckets=(0.1, 1.0), registry=registry)
+
+    lines = registry.exposition().splitlines()
+    assert lines[:3] == ['# HELP test_sends_total Sends.', '# TYPE test_sends_total counter', 'test_sends_total 3']
+    assert lines[5:10] == ['test_seconds_bucket{le="0.1"} 1', 'test_seconds_bucket{le="1.0"} 2',
+                           'test_seconds_bucket{le="+Inf"} 3', 'test_seconds_sum 5.55', 'test_seconds_count 3']
+    assert 'test_latency_seconds_bucket{metric="turn.complete",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{metric="turn.complete",le="1.0"} 3' in lines
+    assert 'test_latency_seconds_count{metric="turn.complete"} 3' in lines
+
+
+def test_clients_feed_served_metrics(emulator):
+    """Test that a conversation updates the default metrics, served over HTTP."""
+    sends, received, timeouts = (metrics.SENDS.value, metrics.ACTIVITIES_RECEIVED.value,
+                                 metrics.RECEIVE_TIMEOUTS.value)
+    client = BotClient(emulator.token_endpoint, base_url=emulator.base_url)
+    client.connect()
+    client.send('hi')
+    client.receive(timeout=5, quiet_period=0.1)
+    client.send('quiet')
+    client.receive(timeout=0.3)
+    client.disconnect()
+
+    assert metrics.SENDS.value == sends + 2
+    assert metrics.ACTIVITIES_RECEIVED.value == received + 2
+    assert metrics.RECEIVE_TIMEOUTS.value == timeouts + 1
+    with metrics.MetricsServer() as server:
+        response = requests.get(server.url, timeout=5)
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    assert f'bot_sends_total {sends + 2}' in response.text.splitlines()
+    assert 'bot_latency_seconds_count{metric="turn.complete"}' in response.text
@@ -1,23 +1,50 @@
+from conversation_pool import ConversationPool
 from copilot_chat_client import BotClient
+from functools import partial
 import os
 import pytest
 from dotenv import load_dotenv
+from scenario import ScenarioRunner, load_scenarios
 from semantic_assertion import SemanticSimilarityClient
+from similarity_cache import VerdictCache
+from turn_log import TurnLog
 
 # Load environment variables
 load_dotenv()
 
 # Fetch the endpoint
 PERFORMANCE_BOT_ENDPOINT = os.getenv("PERFORMANCE_BOT_ENDPOINT")
+TURN_LOG_DIR = os.getenv("TURN_LOG_DIR", ".turn_logs")
+PERFORMANCE_SCENARIO_DIR = os.getenv("PERFORMANCE_SCENARIO_DIR",
+                                     os.path.join(os.path.dirname(__file__), "scenarios", "performance"))
+SCENARIOS = load_scenarios(PERFORMANCE_SCENARIO_DIR)
+
+# Compare every test's turn latencies with the stored baselines (see latency_baseline.py); the pool
+# connects in the background, so connect latencies are left out.
+pytestmark = pytest.mark.latency_baseline(pooled=True)
+
+
+@pytest.fixture(scope="session")
+def turn_log():
+    """Fixture that streams every turn of the session to compressed segments in TURN_LOG_DIR."""
+    with TurnLog(TURN_LOG_DIR) as log:
+        yield log
+
+
+@pytest.fixture(scope="session")
+def conversation_pool(turn_log):
+    """Fixture that keeps connected conversations ready so tests skip the connect latency."""
+    with ConversationPool(PERFORMANCE_BOT_ENDPOINT, size=2,
+                          client_factory=partial(BotClient, turn_log=turn_log)) as pool:
+        yield pool
 
 
 @pytest.fixture
-def bot_client():
-    """Fixture to initialize and connect to the bot."""
-    client = BotClient(PERFORMANCE_BOT_ENDPOINT)
-    client.connect()
+def bot_client(conversation_pool):
+    """Fixture to hand out a connected bot conversation."""
+    client = conversation_pool.acquire()
     yield client
-    client.disconnect()  # Ensure the connection is properly closed after tests
+    conversation_pool.release(client)  # Ensure the connection is properly closed after tests
 
 
 def test_connection(bot_client):
@@ -27,47 +54,20 @@ def test_connection(bot_client):
     assert bot_client.ws is not None, "WebSocket should be established"
 
 
-def test_garbage_collection_conversion(bot_client):
-    """Test sending and receiving a message from the bot."""
-    load_dotenv()
+@pytest.fixture(scope="session")
+def scenario_results(conversation_pool):
+    """Fixture that runs every performance scenario on the pool, judging replies with the LLM, once per session."""
     similarity_client = SemanticSimilarityClient(os.getenv("ENDPOINT_NAME"), os.getenv("API_KEY"),
                                                  os.getenv("DEPLOYMENT_NAME"),
-                                                 os.getenv("API_VERSION"))
-    bot_client.send("Hello")
-    response = bot_client.receive()
-    print(response)
-    assert response is not None, "Bot did not respond"
-    assert any("hello" in msg.lower() for msg in response), f"Expected greeting in bot response: {response}"
-
-    bot_client.send('What is Garbage collection in JVM?')
-    response = bot_client.receive()
-    print(response)
-    similarity_client.assert_semantically("Garbage collection in JVM is a form of automatic memory management used to "
-                                          "reclaim memory occupied by objects that are no longer in use",
-                                          response[0], threshold=0.8)
-
-    bot_client.send('What do you mean by no longer in use')
-    response = bot_client.receive()
-    print(response)
-    similarity_client.assert_semantically("Objects that are no longer in use refer to objects that are no longer "
-                                          "reachable or referenced by any part of the program, making them eligible "
-                                          "for memory reclamation by the garbage collector",
-                                          response[0], threshold=0.8)
+                                                 os.getenv("API_VERSION"), cache=VerdictCache())
+    results = ScenarioRunner(conversation_pool, evaluator=similarity_client).run_all(SCENARIOS)
+    return {result.name: result for result in results}
 
-    bot_client.send('Can static collection references cause memory leaks?')
-    response = bot_client.receive()
-    print(response)
-    similarity_client.assert_semantically("Yes, static collection references can cause memory leaks if they are not "
-                                          "properly managed or released, as they can keep objects alive longer than "
-                                          "necessary, preventing them from being garbage collected",
-                                          response[0], threshold=0.8)
 
-    bot_client.send('what is difference between concurrent mark sweep and parallel garbage collection?')
-    response = bot_client.receive()
-    print(response)
-    similarity_client.assert_semantically(expected="Concurrent Mark-Sweep (CMS) is a garbage collector that "
-                                                   "enables concurrent collection, automatically enabling "
-                                                   "ParNewGC by default. Parallel GC uses a single-threaded "
-                                                   "garbage collector for the old generation and a "
-                                                   "multi-threaded garbage collector for the young generation ",
-                                          actual=response[0], threshold=0.8)
+@pytest.mark.parametrize('scenario', SCENARIOS, ids=lambda scenario: scenario.name)
+def test_scenario(scenario_results, scenario, latency_baseline):
+    """Test a conversation flow from the performance scenario files, e.g. the garbage collection questions."""
+    result = scenario_results[scenario.name]
+    latency_baseline.merge(result.latency)
+    print(result.report())
+    assert result.passed, result.report()
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from copilot_chat_client import BotClient
+from pipeline import Pipeline
+
+RESPONSE_DELAY = 0.3
+
+
+@pytest.fixture(scope="module")
+def emulator_options():
+    """Fixture for an emulator whose bot takes a while to answer each message."""
+    return {'response_delay': RESPONSE_DELAY}
+
+
+@pytest.fixture
+def bot_client(emulator):
+    """Fixture to initialize and connect a BotClient to the emulator."""
+    client = BotClient(emulator.token_endpoint, base_url=emulator.base_url)
+    client.connect()
+    yield client
+    client.disconnect()
+
+
+def test_burst_replies_are_routed_to_their_messages(bot_client):
+    """Test that interleaved replies to a burst of messages each reach the handle of their own message."""
+    pipeline = Pipeline(bot_client, quiet_period=2 * RESPONSE_DELAY)
+    messages = ['Hi', 'weather', 'Hyderabad', 'Paris']
+    handles = pipeline.send_many(messages)
+
+    assert len({handle.activity_id for handle in handles}) == len(messages)
+    replies = pipeline.gather(handles, timeout=10)
+
+    assert replies == [['Hello, I am the weather bot.', 'What can I help with?', 'Weather', 'Bye'],
+                       ['Which city?', 'Hyderabad', 'Mumbai'], ['You said: Hyderabad'], ['You said: Paris']]
+    for handle, reply in zip(handles, replies):
+        assert handle.done and handle.reply is reply
+        assert all(activity.reply_to_id == handle.activity_id for activity in reply.activities)
+    assert pipeline.pending == {} and pipeline.unmatched == 0
+    assert bot_client.latency.summary()['turn.complete']['count'] == len(messages)
+
+
+def test_pipelined_turns_overlap(bot_client):
+    """Test that pipelined turns take about as long as one turn, not as long as all of them in sequence."""
+    pipeline = Pipeline(bot_client, quiet_period=0.1)
+    started = time.monotonic()
+    handles = pipeline.send_many(f'message {n}' for n in range(5))
+    replies = [handle.result(timeout=10) for handle in handles]
+    elapsed = time.monotonic() - started
+
+    assert replies == [[f'You said: message {n}'] for n in range(5)]
+    assert elapsed < 5 * RESPONSE_DELAY
+
+
+def test_late_replies_are_dropped_after_the_turn(bot_client):
+    """Test that replies arriving after their message timed out are counted as unmatched, not misrouted."""
+    pipeline = Pipeline(bot_client, quiet_period=0.1)
+    early = pipeline.send('first')
+    assert early.result(timeout=RESPONSE_DELAY / 3) == []
+
+    late = pipeline.send('second')
+    assert late.result(timeout=10) == ['You said: second']
+    assert pipeline.unmatched == 1
@@ -0,0 +1,83 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from copilot_chat_client import BotClient
+from directline_emulator import DirectLineEmulator
+from latency import LatencyRecorder
+from rate_limiter import AdaptiveRateLimiter, retry_after
+
+
+def test_retry_after_formats(make_response):
+    """Test that Retry-After is read as seconds or as an HTTP date, and ignored when invalid."""
+    assert retry_after(make_response(429, retry_after='2')) == 2.0
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert retry_after(make_response(429, retry_after=later)) == pytest.approx(30, abs=2)
+    assert retry_after(make_response(429, retry_after='soon')) is None
+    assert retry_after(make_response(429)) is None
+
+
+def test_throttled_call_is_retried_after_retry_after(make_response):
+    """Test that a 429 is retried after Retry-After, recorded as throttle time and lowers concurrency."""
+    responses = [make_response(429, retry_after='0.2'), make_response(200)]
+    limiter = AdaptiveRateLimiter(initial_concurrency=8)
+    recorder = LatencyRecorder()
+
+    started = time.monotonic()
+    response = limiter.call(lambda: responses.pop(0), recorder)
+    assert response.status_code == 200
+    assert time.monotonic() - started >= 0.2
+    assert limiter.throttled == 1
+    assert limiter.concurrency_limit < 8
+    assert recorder.summary()['throttle.wait']['max'] >= 0.2
+
+
+def test_gives_up_after_max_retries(make_response):
+    """Test that a call that stays throttled returns the throttled response."""
+    limiter = AdaptiveRateLimiter(max_retries=2)
+    response = limiter.call(lambda: make_response(503, retry_after='0'))
+    assert response.status_code == 503
+    assert limiter.throttled == 3
+
+
+def test_concurrency_limit_and_token_bucket(make_response):
+    """Test that calls in flight stay under the concurrency limit and the rate is respected."""
+    limiter = AdaptiveRateLimiter(rate=50, burst=1, initial_concurrency=2, max_concurrency=2)
+    lock = threading.Lock()
+    in_flight, peak = [0], [0]
+
+    def send():
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.05)
+        with lock:
+            in_flight[0] -= 1
+        return make_response(200)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=limiter.call, args=(send,)) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+    assert time.monotonic() - started >= 9 / 50
+    assert limiter.in_flight == 0
+
+
+def test_clients_share_a_limiter():
+    """Test that bot clients route their Direct Line calls through a shared limiter."""
+    limiter = AdaptiveRateLimiter(rate=100, burst=2)
+    with DirectLineEmulator() as emulator:
+        clients = [BotClient(emulator.token_endpoint, base_url=emulator.base_url, limiter=limiter) for _ in range(3)]
+        for client in clients:
+            client.connect()
+            client.send('hello')
+            assert client.receive(timeout=5, quiet_period=0.1) == ['You said: hello']
+            client.disconnect()
+    assert limiter.in_flight == 0
+    assert limiter.concurrency_limit > 8
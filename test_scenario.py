@@ -0,0 +1,132 @@
+import json
+import os
+from functools import partial
+
+import pytest
+
+from conversation_pool import ConversationPool
+from copilot_chat_client import BotClient
+from deferred_assertions import SemanticAssertionError
+from scenario import ScenarioError, ScenarioRunner, compile_scenario, load_scenarios
+from turn_log import TurnLog, iter_turns
+
+SCENARIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios')
+
+WEATHER_SCENARIO = {
+    'name': 'weather',
+    'turns': [
+        {'send': 'Hi', 'expect': {'contains': ['WEATHER BOT'], 'suggested_actions': ['Weather']}},
+        {'send': 'Weather', 'budget': 5, 'branch': {
+            'Chennai': [{'send': 'Chennai'}],
+            'Mumbai': [{'send': 'Mumbai', 'expect': {'contains': ['you said: mumbai']}}],
+        }},
+        {'send': 'Bye', 'expect': {'contains': ['goodbye']}},
+    ],
+}
+
+
+class ExactEvaluator:
+    """An evaluator that scores 1.0 for identical texts and 0.0 otherwise, and is unavailable for 'judge down'."""
+
+    def assert_semantically(self, expected: str, actual: str, threshold: float) -> float:
+        if expected == 'judge down':
+            raise RuntimeError('judge unavailable')
+        score = 1.0 if expected == actual else 0.0
+        if score < threshold:
+            raise SemanticAssertionError(f"Score {score} below {threshold}. Actual: {actual}", score)
+        return score
+
+
+@pytest.fixture(scope="module")
+def pool(emulator):
+    """Fixture for a pool of conversations with the emulator."""
+    with ConversationPool(emulator.token_endpoint, size=3,
+                          client_factory=partial(BotClient, base_url=emulator.base_url)) as pool:
+        yield pool
+
+
+def test_runs_branch_offered_by_the_bot(pool):
+    """Test that a scenario follows the branch whose suggested action the bot offered."""
+    result = ScenarioRunner(pool).run(compile_scenario(WEATHER_SCENARIO))
+    assert result.passed, result.report()
+    assert [sent for sent, _ in result.transcript] == ['Hi', 'Weather', 'Mumbai', 'Bye']
+
+
+def test_collects_failures_with_turn_labels(pool):
+    """Test that failed expectations, a missing branch and a blown budget are reported per turn."""
+    scenario = compile_scenario({'name': 'broken', 'turns': [
+        {'send': 'Hi', 'expect': {'contains': ['sunny'], 'suggested_actions': ['Forecast']}},
+        {'send': 'Weather', 'budget': 1e-6, 'branch': {'Delhi': [{'send': 'Delhi'}]}},
+        {'send': 'Never sent'},
+    ]})
+    result = ScenarioRunner(pool).run(scenario)
+    assert not result.passed
+    assert [failure.split(':')[0] for failure in result.failures] == ['broken#1', 'broken#1', 'broken#2', 'broken#2']
+    assert 'budget' in result.failures[2] and 'none of the branches' in result.failures[3]
+    assert [sent for sent, _ in result.transcript] == ['Hi', 'Weather']
+
+
+def test_semantic_expectations(pool):
+    """Test that semantic expectations are judged by the evaluator, and fail without one."""
+    scenario = compile_scenario({'name': 'semantic', 'turns': [
+        {'send': 'Bye', 'expect': {'similar': [{'text': 'Goodbye!', 'threshold': 0.9}]}},
+        {'send': 'Bye', 'expect': {'similar': [{'text': 'See you', 'threshold': 0.9}]}},
+    ]})
+    assert scenario.needs_evaluator
+    result = ScenarioRunner(pool, evaluator=ExactEvaluator()).run(scenario)
+    assert len(result.failures) == 1 and '\nsemantic#2: Score 0.0' in result.failures[0]
+    result = ScenarioRunner(pool).run(scenario)
+    assert result.failures == ['semantic#1: semantic expectation needs an evaluator',
+                               'semantic#2: semantic expectation needs an evaluator']
+
+
+def test_turn_log_records_semantic_scores(emulator, tmp_path):
+    """Test that judged turns are logged with their score, below the threshold too, and null if the judge failed."""
+    scenario = compile_scenario({'name': 'logged', 'turns': [
+        {'send': 'Hi'},
+        {'send': 'Bye', 'expect': {'similar': [{'text': 'Goodbye!', 'threshold': 0.9}]}},
+        {'send': 'Bye', 'expect': {'similar': [{'text': 'See you', 'threshold': 0.9}]}},
+        {'send': 'Bye', 'expect': {'similar': [{'text': 'judge down', 'threshold': 0.9}]}},
+    ]})
+    with TurnLog(str(tmp_path)) as log, ConversationPool(
+            emulator.token_endpoint, size=1,
+            client_factory=partial(BotClient, base_url=emulator.base_url, turn_log=log)) as logged_pool:
+        ScenarioRunner(logged_pool, evaluator=ExactEvaluator()).run(scenario)
+    turns = list(iter_turns(str(tmp_path)))
+    assert [(turn['sent'], turn['score']) for turn in turns] == [('Hi', None), ('Bye', 1.0), ('Bye', 0.0),
+                                                                 ('Bye', None)]
+    assert all('turn.complete' in turn['timings'] for turn in turns)
+
+
+def test_run_all_in_parallel(pool):
+    """Test that many scenarios run at once across the pool and keep their order."""
+    scenarios = [compile_scenario(dict(WEATHER_SCENARIO, name=f'weather-{i}')) for i in range(6)]
+    results = ScenarioRunner(pool).run_all(scenarios)
+    assert [result.name for result in results] == [f'weather-{i}' for i in range(6)]
+    assert all(result.passed for result in results)
+
+
+def test_validation_errors(tmp_path):
+    """Test that invalid scenarios are rejected when compiled, with labels assigned otherwise."""
+    with pytest.raises(ScenarioError, match='expect'):
+        compile_scenario({'name': 'typo', 'turns': [{'send': 'Hi', 'expects': {}}]})
+    with pytest.raises(ScenarioError):
+        compile_scenario({'name': 'empty', 'turns': []})
+    with pytest.raises(ScenarioError, match='has no turns'):
+        compile_scenario({'name': 'branch', 'turns': [{'send': 'Hi', 'branch': {'Weather': []}}]})
+
+    (tmp_path / 'a.json').write_text(json.dumps(WEATHER_SCENARIO))
+    scenario, = load_scenarios(str(tmp_path))
+    assert scenario.turns[1].branch['Mumbai'][0].label == 'weather#2[Mumbai]#1'
+    (tmp_path / 'b.json').write_text(json.dumps([WEATHER_SCENARIO]))
+    with pytest.raises(ScenarioError, match='duplicate'):
+        load_scenarios(str(tmp_path))
+
+
+def test_shipped_scenarios_run_against_the_weather_bot_model(pool):
+    """Test that the scenario files compile and the weather flows pass against the emulated weather bot."""
+    performance, = load_scenarios(os.path.join(SCENARIO_DIR, 'performance'))
+    assert performance.needs_evaluator
+    results = {result.name: result for result in ScenarioRunner(pool).run_all(load_scenarios(SCENARIO_DIR))}
+    assert all(result.passed for result in results.values()), [result.report() for result in results.values()]
+    assert [sent for sent, _ in results['weather-forecast-branches'].transcript][:3] == ['hi', 'weather', 'Hyderabad']
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from semantic_assertion import BATCH_PROMPT_VERSION, PROMPT_VERSION, SemanticSimilarityClient
+from similarity_cache import VerdictCache
+
+
+@pytest.fixture
+def judge_completions(judge_completions):
+    """Fixture for judge completions that leave the second pair of every batch unscored."""
+    judge_completions.drop = {1}
+    return judge_completions
+
+
+def test_score_many_batches_and_falls_back(judge_client, judge_completions):
+    """Test that score_many packs pairs into batches, skips cached ones and retries unscored ones singly."""
+    judge_client.get_similarity_score('e0', 'a0')
+
+    pairs = [(f'e{i}', f'a{i}') for i in range(6)]
+    verdicts = [json.loads(v) for v in judge_client.score_many(pairs, max_batch_size=3)]
+
+    assert judge_completions.batch_sizes == [3, 2], \
+        "The cached pair should be skipped and the rest split by max_batch_size"
+    assert [v['reason'] for v in verdicts] == ['single', 'batch', 'single', 'batch', 'batch', 'single']
+    assert judge_completions.calls == 5, "One initial call, two batches and one single-call fallback per batch"
+
+
+def test_batch_verdicts_are_cached_under_their_own_prompt_version(judge_client, cache, judge_completions):
+    """Test that a batch verdict is reused by score_many, counted once, but never served to get_similarity_score."""
+    pairs = [('e0', 'a0'), ('e1', 'a1'), ('e2', 'a2')]
+    judge_client.score_many(pairs)
+    assert cache.get(VerdictCache.make_key('gpt', BATCH_PROMPT_VERSION, 'e0', 'a0')) is not None
+    assert cache.get(VerdictCache.make_key('gpt', PROMPT_VERSION, 'e0', 'a0')) is None
+    assert cache.get(VerdictCache.make_key('gpt', PROMPT_VERSION, 'e1', 'a1')) is not None, \
+        "The single-call fallback is cached under the single-pair prompt version"
+
+    calls, hits, misses = judge_completions.calls, cache.hits, cache.misses
+    assert [json.loads(v)['reason'] for v in judge_client.score_many(pairs)] == ['batch', 'single', 'batch']
+    assert judge_completions.calls == calls
+    assert (cache.hits - hits, cache.misses - misses) == (3, 0), "Each pair counts one hit, whichever key held it"
+    assert json.loads(judge_client.get_similarity_score('e0', 'a0'))['reason'] == 'single'
+    assert judge_completions.calls == calls + 1
+
+
+def test_batches_respect_the_token_budget():
+    """Test that batches are split by the estimated prompt tokens as well as by size."""
+    pairs = [('x' * 400, 'y' * 400)] * 5
+    assert SemanticSimilarityClient._split_batches(pairs, range(5), max_batch_tokens=600, max_batch_size=20) == \
+        [[0, 1], [2, 3], [4]]
+    assert SemanticSimilarityClient._split_batches(pairs, [4], max_batch_tokens=1, max_batch_size=20) == [[4]]
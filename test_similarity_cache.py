@@ -0,0 +1,54 @@
+import time
+
+from similarity_cache import LRUCache, VerdictCache
+
+
+def test_key_depends_on_every_field():
+    """Test that the content address changes with deployment, prompt version and both texts."""
+    base = VerdictCache.make_key('gpt', '1', 'ab', 'c')
+    assert base == VerdictCache.make_key('gpt', '1', 'ab', 'c')
+    assert base != VerdictCache.make_key('gpt', '1', 'a', 'bc')
+    assert base != VerdictCache.make_key('gpt', '2', 'ab', 'c')
+    assert base != VerdictCache.make_key('gpt-4o', '1', 'ab', 'c')
+
+
+def test_verdicts_persist_across_instances(cache, tmp_path):
+    """Test that a verdict written by one cache is read back from disk by a new one."""
+    cache.put('k', 'verdict')
+    reopened = VerdictCache(cache.path, memory=LRUCache())
+    assert reopened.get('k') == 'verdict'
+    assert reopened.get('missing') is None
+    assert (reopened.hits, reopened.misses) == (1, 1)
+    reopened.close()
+
+
+def test_eviction_by_age_and_size(tmp_path):
+    """Test that stale verdicts are ignored and the file is trimmed to max_entries."""
+    verdicts = VerdictCache(str(tmp_path / 'v.sqlite3'), max_entries=2, max_age=60, memory=LRUCache())
+    for key in ('a', 'b', 'c'):
+        verdicts.put(key, key)
+        time.sleep(0.01)
+    verdicts.evict()
+    assert verdicts._db.execute('SELECT COUNT(*) FROM verdicts').fetchone()[0] == 2
+    verdicts.max_age = 0
+    verdicts.memory.clear()
+    assert verdicts.get('c') is None, "Verdicts older than max_age should not be used"
+    verdicts.close()
+
+
+def test_memory_hits_respect_max_age(cache):
+    """Test that a verdict still held in memory is not used once it is older than max_age."""
+    cache.put('k', 'verdict')
+    assert cache.get('k') == 'verdict'
+    time.sleep(0.01)
+    cache.max_age = 0.005
+    assert cache.get('k') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_client_skips_judge_for_cached_pairs(judge_client, judge_completions):
+    """Test that SemanticSimilarityClient only calls the LLM once per identical comparison."""
+    assert judge_client.assert_semantically('expected', 'actual') == 0.9
+    assert judge_client.assert_semantically('expected', 'actual') == 0.9
+    judge_client.assert_semantically('expected', 'other')
+    assert judge_completions.calls == 2
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+import tracing
+from copilot_chat_client import BotClient
+from deferred_assertions import DeferredSemanticAssertions
+from directline_emulator import DirectLineEmulator
+
+
+class MemoryExporter:
+    """An exporter that keeps the finished spans."""
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def close(self):
+        pass
+
+
+class ContextEvaluator:
+    """An evaluator that records a judge span, as SemanticSimilarityClient does."""
+
+    def assert_semantically(self, expected, actual, threshold):
+        with tracing.span(tracing.JUDGE):
+            return 1.0
+
+
+@pytest.fixture
+def exporter():
+    """Fixture that installs a tracer exporting to memory for the duration of a test."""
+    previous = tracing.get_tracer()
+    exporter = MemoryExporter()
+    tracing.set_tracer(tracing.Tracer(exporter))
+    yield exporter
+    tracing.set_tracer(previous)
+
+
+def test_noop_tracer_shares_one_span():
+    """Test that the default tracer hands out the same inert span and records nothing."""
+    tracer = tracing.NoopTracer()
+    with tracer.span(tracing.SEND, {'turn_index': 1}) as span:
+        span.set_attribute('activities', 2)
+    assert span is tracer.span(tracing.RECEIVE, {})
+
+
+def test_client_spans_carry_conversation_and_turn(exporter):
+    """Test that connect, send and receive are traced with the conversation id and turn index."""
+    with DirectLineEmulator() as emulator:
+        client = BotClient(emulator.token_endpoint, base_url=emulator.base_url)
+        client.connect()
+        for message in ('one', 'two'):
+            client.send(message)
+            client.receive(timeout=5, quiet_period=0.1)
+        client.disconnect()
+
+    spans = {(span.name, span.attributes.get('turn_index')): span for span in exporter.spans}
+    assert [span.name for span in exporter.spans[:4]] == [tracing.CONNECT_TOKEN, tracing.CONNECT_CONVERSATION,
+                                                          tracing.CONNECT_WEBSOCKET, tracing.CONNECT]
+    connect = spans[(tracing.CONNECT, None)]
+    assert connect.attributes['conversation_id'] == client.conversation_id
+    assert all(connect.start <= span.start and span.end <= connect.end for span in exporter.spans[:3])
+    assert spans[(tracing.RECEIVE, 2)].attributes == {'conversation_id': client.conversation_id, 'turn_index': 2,
+                                                      'activities': 1}
+    assert (tracing.SEND, 1) in spans
+
+
+def test_context_attributes_reach_deferred_judge(exporter):
+    """Test that attributes set around an assertion are added to the judge's span on another thread."""
+    with DeferredSemanticAssertions(ContextEvaluator()) as judge:
+        with tracing.attributes(conversation_id='c1', turn_index=3):
+            judge.expect('a', 'b')
+        judge.expect('a', 'b')
+    labelled, plain = sorted(exporter.spans, key=lambda span: len(span.attributes), reverse=True)
+    assert labelled.attributes == {'conversation_id': 'c1', 'turn_index': 3}
+    assert plain.attributes == {}
+
+
+def test_chrome_trace_file(tmp_path):
+    """Test that the trace file is a valid Chrome trace, and stays readable before it is closed."""
+    path = tmp_path / 'trace.json'
+    tracer = tracing.Tracer(tracing.ChromeTraceExporter(str(path)))
+    with pytest.raises(ValueError):
+        with tracer.span(tracing.SEND, {'turn_index': 1}):
+            with tracer.span(tracing.JUDGE_REQUEST, {}):
+                raise ValueError('boom')
+
+    unterminated = path.read_text()
+    assert json.loads(unterminated.rstrip().rstrip(',') + ']')
+    tracer.close()
+    events = json.loads(path.read_text())
+    complete = [event for event in events if event['ph'] == 'X']
+    assert [event['name'] for event in complete] == [tracing.JUDGE_REQUEST, tracing.SEND]
+    assert complete[0]['cat'] == 'judge' and complete[0]['args'] == {'error': 'ValueError: boom'}
+    assert complete[1]['ts'] <= complete[0]['ts'] and complete[1]['dur'] >= complete[0]['dur']
+    assert any(event['ph'] == 'M' and event['name'] == 'thread_name' for event in events)
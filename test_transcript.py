@@ -0,0 +1,109 @@
+import gzip
+
+import pytest
+
+from copilot_chat_client import BotClient
+from latency import PROCESS_LATENCY, LatencyRecorder
+from replay import ReplayBotClient
+from transcript import FRAME, SEND, TranscriptRecorder, read_transcript
+
+MESSAGES = ['Hi', 'weather', 'Hyderabad']
+
+
+@pytest.fixture(scope="module")
+def emulator_options():
+    """Fixture for an emulator whose replies arrive in separate frames."""
+    return {'response_delay': 0.05}
+
+
+@pytest.fixture(scope="module")
+def recording(tmp_path_factory, emulator):
+    """Fixture that records one conversation with the emulator and returns the transcript and replies."""
+    path = str(tmp_path_factory.mktemp('transcripts') / 'weather.jsonl.gz')
+    replies = []
+    client = BotClient(emulator.token_endpoint, base_url=emulator.base_url, record_to=path)
+    client.connect()
+    for message in MESSAGES:
+        client.send(message)
+        replies.append(client.receive(timeout=5, quiet_period=0.2))
+    client.disconnect()
+    return path, replies
+
+
+def test_transcript_records_traffic(recording):
+    """Test that the transcript holds every sent activity and the fragmented frames."""
+    path, _ = recording
+    records = list(read_transcript(path))
+    sends = [record for record in records if record['k'] == SEND]
+    assert [record['a']['text'] for record in sends] == MESSAGES
+    assert all(record['id'] for record in sends)
+    assert sum(record['k'] == FRAME for record in records) > len(MESSAGES)
+
+
+def test_replay_reproduces_replies_and_latency(recording):
+    """Test that replaying at maximum speed returns the recorded replies with the recorded latencies."""
+    path, replies = recording
+    before = LatencyRecorder.from_dict(PROCESS_LATENCY.to_dict())
+    client = ReplayBotClient(path)
+    client.connect()
+    replayed = []
+    for message in MESSAGES:
+        client.send(message)
+        replayed.append(client.receive(timeout=5, quiet_period=0.2))
+    client.disconnect()
+
+    assert replayed == replies
+    first_activity = client.latency.summary()['turn.first_activity']
+    assert first_activity['count'] == len(MESSAGES)
+    assert first_activity['p50'] >= 0.05
+    assert not PROCESS_LATENCY.difference(before).histograms, "Replayed timings should not reach the process totals"
+
+
+def test_replay_past_end_of_recording(recording):
+    """Test that sending more messages than were recorded fails clearly."""
+    path, _ = recording
+    client = ReplayBotClient(path)
+    client.connect()
+    for message in MESSAGES:
+        client.send(message)
+    with pytest.raises(EOFError):
+        client.send('one more')
+
+
+def test_closed_replay_is_not_reconnected(recording):
+    """Test that a replay closed mid-conversation fails the turn instead of reconnecting to Direct Line."""
+    path, _ = recording
+    client = ReplayBotClient(path)
+    client.connect()
+    client.send(MESSAGES[0])
+    client.ws.close()
+    with pytest.raises(Exception, match='WebSocket connection closed'):
+        client.receive(timeout=5, quiet_period=0.2)
+    assert client.reconnects == 0 and not client.ws.connected
+
+
+def test_one_open_recorder_per_file(tmp_path):
+    """Test that a file cannot be recorded to by two clients at once, but can by one after another."""
+    path = str(tmp_path / 'shared.jsonl.gz')
+    first = TranscriptRecorder(path)
+    with pytest.raises(ValueError, match='already being recorded'):
+        TranscriptRecorder(path)
+    first.connect('a')
+    first.close()
+    second = TranscriptRecorder(path)
+    second.connect('b')
+    second.close()
+    assert [record['conversationId'] for record in read_transcript(path)] == ['a', 'b']
+
+
+def test_truncated_transcript_is_readable(recording, tmp_path):
+    """Test that an interrupted recording still yields the records before the cut."""
+    path, _ = recording
+    with open(path, 'rb') as f:
+        data = f.read()
+    truncated = tmp_path / 'truncated.jsonl.gz'
+    truncated.write_bytes(data[:len(data) // 2])
+    records = list(read_transcript(str(truncated)))
+    assert 0 < len(records) < len(list(read_transcript(path)))
+    with gzip.open(path, 'rt') as f:
+        assert f.readline().startswith('{"k":"c"')
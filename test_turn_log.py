@@ -0,0 +1,90 @@
+import gzip
+import os
+
+from activity import Activity
+from copilot_chat_client import BotClient
+from directline_emulator import DirectLineEmulator
+from turn_log import TurnLog, iter_turns
+
+
+def test_segments_rotate_and_read_back_in_order(tmp_path):
+    """Test that turns are spread over rotated segments and read back lazily in order."""
+    reply = [Activity(id='c|1', type='message', role='bot', text='x' * 200, reply_to_id='c|0')]
+    with TurnLog(str(tmp_path), segment_bytes=10_000) as log:
+        for n in range(500):
+            log.record_turn('c', f'message {n}', reply, {'turn.complete': 0.1}, score=0.9)
+
+    segments = sorted(os.listdir(tmp_path))
+    assert len(segments) > 5
+    assert all(name.endswith('.jsonl.gz') for name in segments)
+    turns = iter_turns(str(tmp_path))
+    first = next(turns)
+    assert first['sent'] == 'message 0'
+    assert first['activities'] == [{'id': 'c|1', 'type': 'message', 'role': 'bot', 'text': 'x' * 200,
+                                    'replyToId': 'c|0'}]
+    assert first['timings'] == {'turn.complete': 0.1} and first['score'] == 0.9
+    assert [turn['sent'] for turn in turns] == [f'message {n}' for n in range(1, 500)]
+
+
+def test_reopening_appends_new_segments(tmp_path):
+    """Test that a second run continues the segment numbering instead of overwriting."""
+    for run in range(2):
+        with TurnLog(str(tmp_path)) as log:
+            log.write({'run': run})
+    assert [turn['run'] for turn in iter_turns(str(tmp_path))] == [0, 1]
+
+
+def test_synced_turns_survive_a_crash(tmp_path):
+    """Test that a segment cut short after a sync still yields the synced turns."""
+    with TurnLog(str(tmp_path), fsync_interval=0.01) as log:
+        for n in range(50):
+            log.write({'n': n})
+    (segment,) = tmp_path.iterdir()
+    data = segment.read_bytes()
+    segment.write_bytes(data[:-8])  # Drop the gzip trailer, as a crash before close would
+    assert [turn['n'] for turn in iter_turns(str(tmp_path))] == list(range(50))
+    with gzip.open(segment) as f:
+        assert f.readline()
+
+
+def test_bot_client_streams_turns(tmp_path):
+    """Test that a client with a turn log writes each turn with its timings."""
+    with DirectLineEmulator() as emulator, TurnLog(str(tmp_path)) as log:
+        client = BotClient(emulator.token_endpoint, base_url=emulator.base_url, turn_log=log)
+        client.connect()
+        for message in ('hello', 'bye'):
+            client.send(message)
+            client.receive(timeout=5, quiet_period=0.1)
+        client.disconnect()
+
+    turns = list(iter_turns(str(tmp_path)))
+    assert [turn['sent'] for turn in turns] == ['hello', 'bye']
+    assert turns[1]['activities'][0]['text'] == 'You said: bye'
+    assert turns[1]['conversationId'] == client.conversation_id
+    assert set(turns[1]['timings']) == {'send.ack', 'turn.first_activity', 'turn.complete'}
+
+
+def test_unserializable_record_is_skipped(tmp_path):
+    """Test that a record json cannot serialize is counted and the records after it are still written."""
+    with TurnLog(str(tmp_path)) as log:
+        assert log.write({'n': object()})
+        assert log.write({'n': 1})
+    assert log.failed == 1 and log.written == 1
+    assert [turn['n'] for turn in iter_turns(str(tmp_path))] == [1]
+
+
+def test_writes_are_dropped_once_the_writer_stopped(tmp_path, monkeypatch):
+    """Test that a writer thread that died makes write() drop turns instead of blocking on the full queue."""
+    log = TurnLog(str(tmp_path), queue_size=2)
+
+    def fail(line):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(log, '_write_line', fail)
+    log.write({'n': 0})
+    log._thread.join(timeout=5)
+    assert not log._thread.is_alive()
+    assert not any(log.write({'n': n}) for n in range(5))
+    assert log.dropped == 5
+    log.close()
+    assert not log.write({'n': 6}) and log.dropped == 6
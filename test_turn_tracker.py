@@ -0,0 +1,45 @@
+from turn_tracker import TurnTracker
+
+
+def _bot(activity_type='message', reply_to='1', **fields):
+    return {'type': activity_type, 'from': {'id': 'bot', 'role': 'bot'}, 'replyToId': reply_to, **fields}
+
+
+def test_quiet_period_ends_multi_message_turn():
+    """Test that a turn with several replies ends only after the quiet period."""
+    tracker = TurnTracker('1', quiet_period=1.0)
+    tracker.observe({'activities': [_bot(text='first')]}, now=10.0)
+    assert tracker.wait_time(deadline=30.0, now=10.5) == 0.5
+    tracker.observe({'activities': [_bot(text='second')]}, now=10.8)
+    assert tracker.wait_time(deadline=30.0, now=11.0) > 0, "A second reply should extend the turn"
+    assert tracker.wait_time(deadline=30.0, now=11.8) <= 0
+    assert [a.text for a in tracker.activities] == ['first', 'second']
+
+
+def test_typing_keeps_turn_open_until_first_reply():
+    """Test that typing alone does not complete a turn and the hard deadline still applies."""
+    tracker = TurnTracker('1', quiet_period=1.0)
+    tracker.observe({'activities': [_bot('typing')]}, now=10.0)
+    assert not tracker.replied
+    assert tracker.wait_time(deadline=30.0, now=15.0) == 15.0
+
+
+def test_suggested_actions_and_end_of_conversation_complete_immediately():
+    """Test that prompts with suggested actions and endOfConversation end the turn without waiting."""
+    tracker = TurnTracker('1')
+    tracker.observe({'activities': [_bot(text='Pick one', suggestedActions={'actions': [{'title': 'A'}]})]})
+    assert tracker.complete
+    tracker = TurnTracker('1')
+    tracker.observe({'activities': [_bot('endOfConversation')]})
+    assert tracker.wait_time(deadline=float('inf')) == 0.0
+
+
+def test_ignores_user_echo_and_replies_to_other_turns():
+    """Test that the user's own echo and late replies to an earlier message are not attributed to this turn."""
+    tracker = TurnTracker('2')
+    tracker.observe({'activities': [
+        {'type': 'message', 'from': {'id': 'user1'}, 'text': 'hi', 'id': '2'},
+        _bot(text='late answer', reply_to='1'),
+        _bot(text='answer', reply_to='2'),
+    ]})
+    assert [a.text for a in tracker.activities] == ['answer']
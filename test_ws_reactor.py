@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from copilot_chat_client import BotClient
+from directline_emulator import DirectLineEmulator
+from reconnect import Backoff
+from ws_reactor import WebSocketReactor
+
+
+@pytest.fixture
+def reactor():
+    """Fixture for a reactor that pings often enough to be exercised by the tests."""
+    reactor = WebSocketReactor(ping_interval=0.1)
+    yield reactor
+    reactor.close()
+
+
+def test_many_clients_share_one_reactor(emulator, reactor):
+    """Test that synchronous clients in many threads receive their own replies through one reactor."""
+    errors = []
+
+    def converse(n):
+        client = BotClient(emulator.token_endpoint, base_url=emulator.base_url, reactor=reactor)
+        client.connect()
+        try:
+            client.send('Hi')
+            assert client.receive(timeout=5) == ['Hello, I am the weather bot.', 'What can I help with?',
+                                                 'Weather', 'Bye']
+            client.send(f'city {n}')
+            assert client.receive(timeout=5, quiet_period=0.3) == [f'You said: city {n}']
+        except AssertionError as e:
+            errors.append(e)
+        finally:
+            client.disconnect()
+
+    threads = [threading.Thread(target=converse, args=(n,)) for n in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert not reactor._channels
+
+
+def test_pings_are_answered(emulator, reactor):
+    """Test that the reactor keeps pinging an idle stream and sees the pongs."""
+    client = BotClient(emulator.token_endpoint, base_url=emulator.base_url, reactor=reactor)
+    client.connect()
+    started = client.ws._last_pong
+    threading.Event().wait(0.5)
+    assert client.ws.connected
+    assert client.ws._last_pong > started
+    client.disconnect()
+    assert not client.ws.connected
+
+
+def test_server_close_wakes_receiver(reactor):
+    """Test that a stream closed by the server ends a waiting receive() instead of timing out."""
+    with DirectLineEmulator() as server:
+        client = BotClient(server.token_endpoint, base_url=server.base_url, reactor=reactor,
+                           backoff=Backoff(max_attempts=0))
+        client.connect()
+    with pytest.raises(Exception, match='WebSocket connection closed'):
+        client.receive(timeout=5)
+    assert not client.ws.connected
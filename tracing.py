@@ -0,0 +1,237 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Span names used by the clients
+CONNECT = 'connect'
+CONNECT_TOKEN = 'connect.token'
+CONNECT_CONVERSATION = 'connect.conversation'
+CONNECT_WEBSOCKET = 'connect.websocket'
+CONNECT_RESUME = 'connect.resume'
+SEND = 'send'
+RECEIVE = 'receive'  # Waiting for the bot's reply to a turn
+JUDGE = 'judge'  # One semantic similarity verdict, cached or not
+JUDGE_REQUEST = 'judge.request'  # One call to Azure OpenAI
+JUDGE_BATCH = 'judge.batch'
+TEST = 'test'  # One pytest test, when tracing a test run
+
+# Attributes added to every span started in the current context, e.g. the conversation and turn.
+_context_attributes: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar('trace_attributes', default={})
+
+
+class Span:
+    """
+    One timed operation.
+
+    Attributes:
+        name (str): The operation, e.g. ``tracing.SEND``.
+        attributes (Dict[str, Any]): Details such as ``conversation_id`` and ``turn_index``.
+        start (float): The ``time.perf_counter()`` value when the span started.
+        end (float): The ``time.perf_counter()`` value when the span ended, or None while it runs.
+        thread_id (int): The thread the span ran on.
+    """
+
+    __slots__ = ('name', 'attributes', 'start', 'end', 'thread_id', '_tracer')
+
+    def __init__(self, tracer: 'Tracer', name: str, attributes: Dict[str, Any]):
+        self._tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.start = 0.0
+        self.end: Optional[float] = None
+        self.thread_id = threading.get_ident()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Add or replace one attribute, e.g. a result only known when the operation is done."""
+        self.attributes[key] = value
+
+    def __enter__(self) -> 'Span':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attributes['error'] = f'{exc_type.__name__}: {exc}'
+        self._tracer.exporter.export(self)
+
+
+class _NoopSpan:
+    """The span of the default tracer; every method does nothing."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class NoopTracer:
+    """The default tracer: records nothing, and every span is the same inert object."""
+
+    def span(self, name: str, attributes: Dict[str, Any]) -> _NoopSpan:
+        return _NOOP_SPAN
+
+    def close(self) -> None:
+        pass
+
+
+class Tracer:
+    """
+    Creates spans and hands the finished ones to an exporter.
+
+    Attributes:
+        exporter: Anything with ``export(span)`` and ``close()`` methods, e.g. a ``ChromeTraceExporter``.
+    """
+
+    def __init__(self, exporter):
+        """
+        Initialize the Tracer.
+
+        Args:
+            exporter: Receives every finished span.
+        """
+        self.exporter = exporter
+
+    def span(self, name: str, attributes: Dict[str, Any]) -> Span:
+        context = _context_attributes.get()
+        return Span(self, name, {**context, **attributes} if context else attributes)
+
+    def close(self) -> None:
+        """
+        Close the exporter.
+        """
+        self.exporter.close()
+
+
+class ChromeTraceExporter:
+    """
+    Writes spans to a file in the Chrome trace event format.
+
+    The file loads in Perfetto (https://ui.perfetto.dev) and ``chrome://tracing``; each thread gets
+    its own track with the spans nested by time. Events are streamed as a JSON array, one per line,
+    which the format allows to be left unterminated, so a run that crashes still leaves a
+    loadable trace.
+
+    Attributes:
+        path (str): The trace file.
+        exported (int): Spans written so far.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the ChromeTraceExporter, creating or truncating the trace file.
+
+        Args:
+            path (str): The trace file, conventionally ``*.json``.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.exported = 0
+        self._file = open(path, 'w', encoding='utf-8', buffering=1)  # Line buffered: every event reaches the file
+        self._file.write('[\n')
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._named_threads = set()
+
+    def export(self, span: Span) -> None:
+        """
+        Write one finished span as a complete ("X") event.
+
+        Args:
+            span (Span): The span.
+        """
+        event = {'name': span.name, 'cat': span.name.split('.', 1)[0], 'ph': 'X', 'pid': self._pid,
+                 'tid': span.thread_id, 'ts': round((span.start - self._origin) * 1e6, 3),
+                 'dur': round((span.end - span.start) * 1e6, 3), 'args': span.attributes}
+        line = json.dumps(event, separators=(',', ':'), default=str)
+        with self._lock:
+            if self._file.closed:
+                return
+            if span.thread_id not in self._named_threads:
+                self._named_threads.add(span.thread_id)
+                self._file.write(json.dumps({'name': 'thread_name', 'ph': 'M', 'pid': self._pid,
+                                             'tid': span.thread_id,
+                                             'args': {'name': threading.current_thread().name}}) + ',\n')
+            self._file.write(line + ',\n')
+            self.exported += 1
+
+    def close(self) -> None:
+        """
+        Terminate the JSON array and close the trace file.
+        """
+        with self._lock:
+            if self._file.closed:
+                return
+            # A final metadata event, so the array does not end with a trailing comma.
+            self._file.write(json.dumps({'name': 'process_name', 'ph': 'M', 'pid': self._pid,
+                                         'args': {'name': 'bot tests'}}) + '\n]\n')
+            self._file.close()
+        logger.info(f"Wrote {self.exported} trace spans to {self.path}.")
+
+
+_tracer = NoopTracer()
+
+
+def get_tracer():
+    """Return the process-wide tracer."""
+    return _tracer
+
+
+def set_tracer(tracer) -> None:
+    """
+    Replace the process-wide tracer, e.g. with ``Tracer(ChromeTraceExporter('trace.json'))``.
+
+    Args:
+        tracer: The new tracer, or None to go back to the no-op tracer.
+    """
+    global _tracer
+    _tracer = tracer if tracer is not None else NoopTracer()
+
+
+def span(name: str, **attributes: Any):
+    """
+    Start a span on the process-wide tracer, for use in a ``with`` statement.
+
+    Args:
+        name (str): The operation, e.g. ``tracing.SEND``.
+        **attributes: Details of the operation, e.g. ``conversation_id`` and ``turn_index``.
+
+    Returns:
+        The span; it is exported when the ``with`` block ends.
+    """
+    return _tracer.span(name, attributes)
+
+
+@contextmanager
+def attributes(**values: Any) -> Iterator[None]:
+    """
+    Add attributes to every span started in the current context, including work handed to other
+    threads with a copied context, such as deferred semantic judging.
+
+    Args:
+        **values: The attributes, e.g. ``conversation_id`` and ``turn_index``.
+    """
+    token = _context_attributes.set({**_context_attributes.get(), **values})
+    try:
+        yield
+    finally:
+        _context_attributes.reset(token)
@@ -0,0 +1,140 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Record kinds
+CONNECT = 'c'  # Conversation opened: {'k', 't', 'conversationId'}
+SEND = 's'  # Outgoing activity: {'k', 't', 'ack', 'id', 'a'}
+FRAME = 'f'  # Incoming WebSocket frame: {'k', 't', 'd'}
+
+# Compress this many records into one sync-flushed gzip block.
+FLUSH_EVERY = 64
+
+# Transcript files a recorder currently has open; interleaved gzip blocks of two would be unreadable.
+_open_paths: Set[str] = set()
+_open_lock = threading.Lock()
+
+
+class TranscriptRecorder:
+    """
+    Appends the Direct Line traffic of one conversation to a compressed transcript file.
+
+    A transcript is gzip-compressed JSON Lines. Each line is one record with a kind ``k`` and a
+    time ``t`` in seconds since the recording started; see ``CONNECT``, ``SEND`` and ``FRAME``.
+    The file is only ever appended to, and recordings made one after another may share one file:
+    every recording starts with its own ``CONNECT`` record. Only one recorder may have a file open
+    at a time, so concurrent clients (e.g. of a ``ConversationPool``) each need their own file.
+
+    Attributes:
+        path (str): The transcript file.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the TranscriptRecorder and open the file for appending.
+
+        Args:
+            path (str): The transcript file.
+
+        Raises:
+            ValueError: If another recorder has the file open.
+        """
+        self.path = path
+        self._key = os.path.realpath(path)
+        with _open_lock:
+            if self._key in _open_paths:
+                raise ValueError(f'{path} is already being recorded to; give each concurrent client its own file')
+            _open_paths.add(self._key)
+        try:
+            self._file = gzip.open(path, 'at', encoding='utf-8')
+        except BaseException:
+            with _open_lock:
+                _open_paths.discard(self._key)
+            raise
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._pending = 0
+
+    def elapsed(self, monotonic: Optional[float] = None) -> float:
+        """Seconds since the recording started, for a ``time.monotonic()`` value or now."""
+        return (time.monotonic() if monotonic is None else monotonic) - self._start
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(',', ':'), ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._pending += 1
+            if self._pending >= FLUSH_EVERY:
+                self._file.flush()
+                self._pending = 0
+
+    def connect(self, conversation_id: str) -> None:
+        """
+        Record that a conversation was opened.
+
+        Args:
+            conversation_id (str): The Direct Line conversation id.
+        """
+        self._write({'k': CONNECT, 't': round(self.elapsed(), 6), 'conversationId': conversation_id,
+                     'wall': time.time()})
+
+    def send(self, activity: Dict[str, Any], activity_id: Optional[str], sent_at: float, acked_at: float) -> None:
+        """
+        Record an outgoing activity.
+
+        Args:
+            activity (Dict[str, Any]): The activity payload that was posted.
+            activity_id (str): The id Direct Line assigned to it.
+            sent_at (float): The ``time.monotonic()`` value when the POST started.
+            acked_at (float): The ``time.monotonic()`` value when the POST returned.
+        """
+        self._write({'k': SEND, 't': round(self.elapsed(sent_at), 6), 'ack': round(acked_at - sent_at, 6),
+                     'id': activity_id, 'a': activity})
+
+    def frame(self, data: str, received_at: Optional[float] = None) -> None:
+        """
+        Record an incoming WebSocket frame.
+
+        Args:
+            data (str): The raw frame text.
+            received_at (float): The ``time.monotonic()`` value when it arrived. Defaults to now.
+        """
+        self._write({'k': FRAME, 't': round(self.elapsed(received_at), 6), 'd': data})
+
+    def close(self) -> None:
+        """
+        Flush and close the transcript file.
+        """
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+                with _open_lock:
+                    _open_paths.discard(self._key)
+
+
+def read_transcript(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the records of a transcript file.
+
+    A recording that was interrupted may end in a truncated gzip block; the records before it are
+    still returned.
+
+    Args:
+        path (str): The transcript file.
+
+    Yields:
+        Dict[str, Any]: The records in the order they were written.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if line.endswith('\n'):
+                    yield json.loads(line)
+        except EOFError:
+            logger.warning(f"Transcript {path} ends in a truncated block.")
@@ -0,0 +1,49 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+from activity import ActivitySet
+
+
+class Channel(ABC):
+    """
+    One conversation's incoming activity stream, as ``BotClient`` reads it.
+
+    A channel stands in for the ``websocket.WebSocket`` in ``BotClient.ws`` when something other
+    than the client's own thread reads the conversation: ``ws_reactor.ReactorChannel`` for a shared
+    WebSocket reactor, ``long_poll.PollingChannel`` for the long-poll GET fallback.
+    """
+
+    @property
+    @abstractmethod
+    def connected(self) -> bool:
+        """Whether the stream is still open."""
+
+    @abstractmethod
+    def get(self, timeout: Optional[float] = None) -> Tuple[float, str, List[ActivitySet]]:
+        """
+        Wait for the next frame of the stream.
+
+        Args:
+            timeout (float): The maximum time to wait in seconds, or None to wait indefinitely.
+
+        Returns:
+            Tuple[float, str, List[ActivitySet]]: The ``time.monotonic()`` arrival time, the raw
+            frame text and the activity sets it completed.
+
+        Raises:
+            websocket.WebSocketTimeoutException: If no frame arrived in time.
+            websocket.WebSocketConnectionClosedException: If the stream was closed.
+        """
+
+    @abstractmethod
+    def close(self) -> None:
+        """
+        Stop reading the stream and close it.
+        """
+
+    def sent(self) -> None:
+        """
+        Called after the client posted an activity, i.e. when replies are about to arrive.
+
+        Streams that push activities ignore it; polling ones use it to poll sooner.
+        """
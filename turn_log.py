@@ -0,0 +1,230 @@
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional
+
+from activity import Activity
+from transcript import read_transcript
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024  # Uncompressed bytes per segment before rotating
+DEFAULT_QUEUE_SIZE = 10_000  # Turns buffered for the writer thread
+DEFAULT_FSYNC_INTERVAL = 1.0  # Seconds between fsyncs of the current segment
+BATCH_SIZE = 256  # Turns written per wake-up of the writer thread
+WRITER_CHECK_INTERVAL = 0.5  # Seconds a blocked write() waits before checking the writer is still alive
+
+_STOP = object()
+
+
+class TurnLog:
+    """
+    A streaming sink for the turns of many conversations.
+
+    Each turn becomes one JSON line in gzip-compressed segment files named ``{prefix}-NNNNNN.jsonl.gz``,
+    rotated after ``segment_bytes`` of JSON. Turns are handed to a background writer thread through
+    a bounded queue, written in batches and fsynced every ``fsync_interval`` seconds, so memory
+    stays flat however long the run is and a crash loses at most the last interval. Read the log
+    back with ``iter_turns()``.
+
+    Attributes:
+        directory (str): The directory holding the segments.
+        prefix (str): The segment file name prefix.
+        written (int): Turns written so far.
+        dropped (int): Turns dropped because the queue was full (only when not blocking), the log was
+            closed or its writer thread had stopped.
+        failed (int): Records the writer could not serialize and skipped.
+    """
+
+    def __init__(self, directory: str, prefix: str = 'turns', segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, fsync_interval: float = DEFAULT_FSYNC_INTERVAL,
+                 block: bool = True):
+        """
+        Initialize the TurnLog and start its writer thread.
+
+        Args:
+            directory (str): The directory to write the segments to; created if missing.
+            prefix (str): The segment file name prefix.
+            segment_bytes (int): Uncompressed bytes per segment before rotating to a new one.
+            queue_size (int): The number of turns buffered for the writer thread.
+            fsync_interval (float): Seconds between fsyncs of the current segment.
+            block (bool): Whether a full queue makes writers wait; otherwise the turn is dropped and counted.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.block = block
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._closed = False
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._sequence = max((_segment_number(path) for path in _segments(directory, prefix)), default=-1) + 1
+        self._raw = None
+        self._file: Optional[gzip.GzipFile] = None
+        self._segment_size = 0
+        self._thread = threading.Thread(target=self._run, name='turn-log', daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> 'TurnLog':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def write(self, record: Dict[str, Any]) -> bool:
+        """
+        Queue one JSON-serializable record for writing.
+
+        Args:
+            record (Dict[str, Any]): The record.
+
+        Returns:
+            bool: Whether the record was queued (False if it was dropped).
+        """
+        while not self._closed and self._thread.is_alive():
+            try:
+                self._queue.put(record, block=self.block, timeout=WRITER_CHECK_INTERVAL)
+                return True
+            except queue.Full:
+                if not self.block:
+                    break
+        self.dropped += 1
+        return False
+
+    def record_turn(self, conversation_id: str, sent: Optional[str], activities: List[Activity],
+                    timings: Optional[Dict[str, float]] = None, score: Optional[float] = None) -> bool:
+        """
+        Queue one conversation turn.
+
+        Args:
+            conversation_id (str): The Direct Line conversation id.
+            sent (str): The user message of the turn.
+            activities (List[Activity]): The bot activities received for it.
+            timings (Dict[str, float]): The turn's latencies in seconds by metric name.
+            score (float): The semantic similarity score of the reply, if it was judged.
+
+        Returns:
+            bool: Whether the turn was queued (False if it was dropped).
+        """
+        return self.write({'conversationId': conversation_id, 'time': time.time(), 'sent': sent,
+                           'activities': [activity.to_dict() for activity in activities],
+                           'timings': timings or {}, 'score': score})
+
+    def close(self) -> None:
+        """
+        Write all queued turns, close the current segment and stop the writer thread.
+        """
+        self._closed = True
+        while self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=WRITER_CHECK_INTERVAL)
+                break
+            except queue.Full:
+                pass
+        self._thread.join()
+
+    def _run(self) -> None:
+        next_fsync = time.monotonic() + self.fsync_interval
+        stopping = False
+        try:
+            while not stopping:
+                try:
+                    batch = [self._queue.get(timeout=max(next_fsync - time.monotonic(), 0.01))]
+                except queue.Empty:
+                    batch = []
+                while batch and len(batch) < BATCH_SIZE:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                for position, record in enumerate(batch):
+                    if record is _STOP:
+                        stopping = True
+                        self.dropped += len(batch) - position - 1  # Queued after close()
+                        del batch[position:]
+                        break
+                for record in batch:
+                    try:
+                        line = json.dumps(record, separators=(',', ':'), ensure_ascii=False)
+                    except (TypeError, ValueError) as e:
+                        self.failed += 1
+                        logger.error(f"Turn log record skipped, it is not JSON-serializable: {e}")
+                        continue
+                    self._write_line(line)
+                if self._file is not None and (stopping or time.monotonic() >= next_fsync):
+                    self._sync()
+                    next_fsync = time.monotonic() + self.fsync_interval
+        except Exception:
+            logger.exception("Turn log writer failed; further turns are not written.")
+        finally:
+            self._close_segment()
+
+    def _write_line(self, line: str) -> None:
+        data = (line + '\n').encode('utf-8')
+        if self._file is None or self._segment_size + len(data) > self.segment_bytes and self._segment_size:
+            self._close_segment()
+            self._open_segment()
+        self._file.write(data)
+        self._segment_size += len(data)
+        self.written += 1
+
+    def _open_segment(self) -> None:
+        path = os.path.join(self.directory, f'{self.prefix}-{self._sequence:06d}.jsonl.gz')
+        self._sequence += 1
+        self._raw = open(path, 'ab')
+        self._file = gzip.GzipFile(fileobj=self._raw, mode='ab')
+        self._segment_size = 0
+
+    def _sync(self) -> None:
+        # A sync flush ends the compressed block, so everything written so far is readable after a crash.
+        self._file.flush(zlib.Z_SYNC_FLUSH)
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+
+    def _close_segment(self) -> None:
+        if self._file is None:
+            return
+        self._file.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+        self._file = self._raw = None
+
+
+def _segments(directory: str, prefix: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(glob.escape(directory), f'{glob.escape(prefix)}-*.jsonl.gz')),
+                  key=_segment_number)
+
+
+def _segment_number(path: str) -> int:
+    match = re.search(r'-(\d+)\.jsonl\.gz$', path)
+    return int(match.group(1)) if match else -1
+
+
+def iter_turns(directory: str, prefix: str = 'turns') -> Iterator[Dict[str, Any]]:
+    """
+    Lazily iterate over the turns of a turn log, segment by segment.
+
+    Only one segment is open at a time. A segment cut short by a crash yields the turns up to its
+    last sync.
+
+    Args:
+        directory (str): The directory holding the segments.
+        prefix (str): The segment file name prefix.
+
+    Yields:
+        Dict[str, Any]: The turn records in the order they were written.
+    """
+    for path in _segments(directory, prefix):
+        yield from read_transcript(path)
@@ -0,0 +1,103 @@
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from activity import Activity, ActivitySet
+
+# Constants
+DEFAULT_QUIET_PERIOD = 1.5  # Seconds of silence after a bot reply that end a turn
+
+
+class TurnTracker:
+    """
+    Decides when the bot has finished replying to one user activity.
+
+    A turn is complete when any of the following happens:
+
+    * the bot sends an ``endOfConversation`` activity;
+    * the bot sends a message that expects input (``inputHint == 'expectingInput'``) or offers
+      suggested actions, since it will not say anything else until the user answers;
+    * at least one reply has arrived and the bot stayed silent for ``quiet_period`` seconds.
+      ``typing`` activities count as the bot still talking.
+
+    Activities whose ``replyToId`` points at a different user activity (late replies to an earlier
+    turn) and activities not sent by the bot are ignored.
+
+    Attributes:
+        reply_to_id (str): The id of the user activity this turn answers, as returned by the send POST.
+        quiet_period (float): Seconds of silence after a reply that end the turn.
+        activities (List[Activity]): The bot activities that belong to this turn, in order.
+        first_reply_at (float): The monotonic arrival time of the first bot message of the turn.
+        last_reply_at (float): The monotonic arrival time of the last bot message of the turn.
+    """
+
+    def __init__(self, reply_to_id: Optional[str] = None, quiet_period: float = DEFAULT_QUIET_PERIOD):
+        """
+        Initialize the TurnTracker.
+
+        Args:
+            reply_to_id (str): The id of the user activity this turn answers. If omitted, every bot
+                activity is attributed to this turn.
+            quiet_period (float): Seconds of silence after a reply that end the turn.
+        """
+        self.reply_to_id = reply_to_id
+        self.quiet_period = quiet_period
+        self.activities: List[Activity] = []
+        self.replied = False
+        self.complete = False
+        self.first_reply_at: Optional[float] = None
+        self.last_reply_at: Optional[float] = None
+        self._last_seen: Optional[float] = None
+
+    def observe(self, data: Union[ActivitySet, Dict[str, Any]], now: Optional[float] = None) -> None:
+        """
+        Account for one decoded activity set.
+
+        Args:
+            data (ActivitySet): The activity set received from the stream, or its plain JSON form.
+            now (float): The monotonic arrival time. Defaults to ``time.monotonic()``.
+        """
+        now = time.monotonic() if now is None else now
+        if isinstance(data, dict):
+            data = ActivitySet.from_dict(data)
+        for activity in data.activities:
+            if activity.role != 'bot':
+                continue
+            reply_to = activity.reply_to_id
+            if self.reply_to_id and reply_to and reply_to != self.reply_to_id:
+                continue
+
+            activity_type = activity.type
+            if activity_type == 'typing':
+                self._last_seen = now
+            elif activity_type == 'endOfConversation':
+                self.complete = True
+            elif activity_type == 'message':
+                self.activities.append(activity)
+                if not self.replied:
+                    self.first_reply_at = now
+                self.replied = True
+                self.last_reply_at = self._last_seen = now
+                if activity.input_hint == 'expectingInput' or activity.suggested_actions:
+                    self.complete = True
+
+    def activity_set(self) -> ActivitySet:
+        """Return the bot activities of this turn as an activity set."""
+        return ActivitySet(self.activities)
+
+    def wait_time(self, deadline: float, now: Optional[float] = None) -> float:
+        """
+        Seconds to wait for the next frame before the turn should be considered over.
+
+        Args:
+            deadline (float): The monotonic time at which to give up waiting regardless.
+            now (float): The current monotonic time. Defaults to ``time.monotonic()``.
+
+        Returns:
+            float: The wait time; zero or less means the turn is over.
+        """
+        now = time.monotonic() if now is None else now
+        if self.complete:
+            return 0.0
+        if self.replied:
+            deadline = min(deadline, self._last_seen + self.quiet_period)
+        return deadline - now
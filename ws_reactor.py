@@ -0,0 +1,264 @@
+import logging
+import queue
+import selectors
+import socket
+import ssl
+import threading
+import time
+from typing import List, Optional, Set, Tuple
+
+import websocket
+from websocket import ABNF
+
+from activity import ActivitySet, parse_activity_set
+from frame_decoder import ActivityStreamDecoder
+from transport import Channel
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_PING_INTERVAL = 30.0  # Seconds between keep-alive pings on every stream
+PONG_GRACE = 2  # Ping intervals without a pong after which a stream is considered dead
+UNREGISTER_TIMEOUT = 5.0  # Seconds to wait for the reactor to close an unregistered stream
+
+_CLOSED = object()  # Queued after the last frame of a stream that was closed
+
+_lock = threading.Lock()
+_reactor: Optional['WebSocketReactor'] = None
+
+
+class ReactorChannel(Channel):
+    """
+    One conversation's stream as seen through a ``WebSocketReactor``.
+
+    The reactor reads and decodes the stream's frames and queues them here; the owning client
+    blocks only on this queue. The channel stands in for the ``websocket.WebSocket`` it wraps, so
+    ``connected`` and ``close()`` keep working for code that inspects ``BotClient.ws``.
+
+    Attributes:
+        ws (websocket.WebSocket): The underlying connection, owned by the reactor thread.
+    """
+
+    def __init__(self, reactor: 'WebSocketReactor', ws: websocket.WebSocket):
+        self.ws = ws
+        self._reactor = reactor
+        self._queue: queue.Queue = queue.Queue()
+        self._decoder = ActivityStreamDecoder(parse_activity_set)
+        self._closed = False
+        self._dropped = threading.Event()
+        self._last_pong = time.monotonic()
+
+    @property
+    def connected(self) -> bool:
+        return not self._closed
+
+    def get(self, timeout: Optional[float] = None) -> Tuple[float, str, List[ActivitySet]]:
+        """
+        Wait for the next frame of the stream.
+
+        Args:
+            timeout (float): The maximum time to wait in seconds, or None to wait indefinitely.
+
+        Returns:
+            Tuple[float, str, List[ActivitySet]]: The ``time.monotonic()`` arrival time, the raw
+            frame text and the activity sets it completed.
+
+        Raises:
+            websocket.WebSocketTimeoutException: If no frame arrived in time.
+            websocket.WebSocketConnectionClosedException: If the stream was closed.
+        """
+        try:
+            item = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            raise websocket.WebSocketTimeoutException('No frame within the timeout')
+        if item is _CLOSED:
+            self._queue.put(_CLOSED)
+            raise websocket.WebSocketConnectionClosedException('WebSocket connection closed')
+        return item
+
+    def close(self) -> None:
+        """
+        Stop watching the stream and close it.
+        """
+        self._reactor.unregister(self)
+
+
+class WebSocketReactor:
+    """
+    Watches many conversation WebSockets from a single thread.
+
+    All registered sockets are non-blocking and multiplexed with ``selectors`` (epoll on Linux).
+    Whenever one is readable, the reactor reads every complete frame, decodes the activity sets
+    and queues them on the conversation's ``ReactorChannel``. Pings are answered by the reactor,
+    each stream is pinged every ``ping_interval`` seconds, and streams that close or stop
+    answering pings have their channel closed, which wakes any waiting reader.
+
+    Attributes:
+        ping_interval (float): Seconds between keep-alive pings, or None to disable them.
+    """
+
+    def __init__(self, ping_interval: Optional[float] = DEFAULT_PING_INTERVAL):
+        """
+        Initialize the WebSocketReactor and start its thread.
+
+        Args:
+            ping_interval (float): Seconds between keep-alive pings, or None to disable them.
+        """
+        self.ping_interval = ping_interval
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._wakeup_recv.setblocking(False)
+        self._selector.register(self._wakeup_recv, selectors.EVENT_READ)
+        self._commands: queue.SimpleQueue = queue.SimpleQueue()
+        self._channels: Set[ReactorChannel] = set()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='websocket-reactor', daemon=True)
+        self._thread.start()
+
+    def register(self, ws: websocket.WebSocket) -> ReactorChannel:
+        """
+        Hand a connected WebSocket over to the reactor.
+
+        The caller must not read from ``ws`` afterwards.
+
+        Args:
+            ws (websocket.WebSocket): A connected WebSocket.
+
+        Returns:
+            ReactorChannel: The channel to receive the stream's frames from.
+        """
+        channel = ReactorChannel(self, ws)
+        ws.settimeout(0)
+        self._command(self._add, channel)
+        return channel
+
+    def unregister(self, channel: ReactorChannel) -> None:
+        """
+        Stop watching a channel's stream and close it, waiting for the reactor to do so.
+
+        Args:
+            channel (ReactorChannel): A channel returned by ``register()``.
+        """
+        channel._closed = True
+        if self._running:
+            self._command(self._drop, channel)
+            if threading.current_thread() is not self._thread:
+                channel._dropped.wait(UNREGISTER_TIMEOUT)
+
+    def close(self) -> None:
+        """
+        Close every stream and stop the reactor thread.
+        """
+        if not self._running:
+            return
+        self._running = False
+        self._wakeup_send.send(b'\0')
+        self._thread.join()
+
+    def _command(self, function, channel: ReactorChannel) -> None:
+        self._commands.put((function, channel))
+        self._wakeup_send.send(b'\0')
+
+    def _run(self) -> None:
+        next_ping = time.monotonic() + (self.ping_interval or 0)
+        try:
+            while self._running:
+                timeout = max(next_ping - time.monotonic(), 0) if self.ping_interval else None
+                for key, _ in self._selector.select(timeout):
+                    if key.data is None:
+                        self._drain_commands()
+                    else:
+                        self._read(key.data)
+                if self.ping_interval and time.monotonic() >= next_ping:
+                    self._ping_all()
+                    next_ping = time.monotonic() + self.ping_interval
+        finally:
+            self._drain_commands()
+            for channel in list(self._channels):
+                self._drop(channel)
+            self._selector.close()
+            self._wakeup_recv.close()
+            self._wakeup_send.close()
+
+    def _drain_commands(self) -> None:
+        try:
+            while True:
+                self._wakeup_recv.recv(4096)
+        except BlockingIOError:
+            pass
+        while not self._commands.empty():
+            function, channel = self._commands.get()
+            function(channel)
+
+    def _add(self, channel: ReactorChannel) -> None:
+        if channel._closed:
+            self._drop(channel)
+            return
+        self._channels.add(channel)
+        self._selector.register(channel.ws.sock, selectors.EVENT_READ, channel)
+        # TLS may already hold decrypted bytes that the selector will never report.
+        self._read(channel)
+
+    def _drop(self, channel: ReactorChannel) -> None:
+        channel._closed = True
+        if channel.ws.sock is None:
+            channel._dropped.set()
+            return
+        if channel in self._channels:
+            self._channels.remove(channel)
+            self._selector.unregister(channel.ws.sock)
+        try:
+            channel.ws.send_close()
+        except Exception:
+            pass
+        channel.ws.shutdown()
+        channel._queue.put(_CLOSED)
+        channel._dropped.set()
+
+    def _read(self, channel: ReactorChannel) -> None:
+        while not channel._closed:
+            try:
+                opcode, frame = channel.ws.recv_data_frame(control_frame=True)
+            except (BlockingIOError, ssl.SSLWantReadError):
+                return
+            except (websocket.WebSocketException, OSError) as e:
+                logger.warning(f"WebSocket stream failed: {e}")
+                self._drop(channel)
+                return
+
+            if opcode == ABNF.OPCODE_TEXT:
+                received_at = time.monotonic()
+                data = frame.data.decode('utf-8') if isinstance(frame.data, bytes) else frame.data
+                channel._queue.put((received_at, data, channel._decoder.feed(data)))
+            elif opcode == ABNF.OPCODE_PONG:
+                channel._last_pong = time.monotonic()
+            elif opcode == ABNF.OPCODE_CLOSE:
+                logger.info("WebSocket stream closed by the server.")
+                self._drop(channel)
+
+    def _ping_all(self) -> None:
+        stale_before = time.monotonic() - PONG_GRACE * self.ping_interval
+        for channel in list(self._channels):
+            if channel._last_pong < stale_before:
+                logger.warning("WebSocket stream stopped answering pings.")
+                self._drop(channel)
+                continue
+            try:
+                channel.ws.ping()
+            except (websocket.WebSocketException, OSError) as e:
+                logger.warning(f"WebSocket ping failed: {e}")
+                self._drop(channel)
+
+
+def get_reactor() -> WebSocketReactor:
+    """
+    Get the process-wide WebSocket reactor, starting it on first use.
+
+    Returns:
+        WebSocketReactor: The shared reactor.
+    """
+    global _reactor
+    with _lock:
+        if _reactor is None or not _reactor._running:
+            _reactor = WebSocketReactor()
+        return _reactor